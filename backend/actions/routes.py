@@ -1,20 +1,99 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database.connection import get_db
+from ..network_automation.backup import backup_configs
+from ..network_automation.deploy import deploy_configuration
+from ..network_automation.executor import select_devices, validate_commands
+from ..network_automation.schemas import (
+    ConfigBackupRequest, ConfigBackupResult, ConfigDeployRequest, ConfigDeploymentResult
+)
+from ..network_operations.audit import run_audit
+from ..network_operations.schemas import AuditRunRequest, AuditRunSummary
+from ..utils.exceptions import (
+    ConfigurationException, ConfigurationNotFoundException, NetworkOperationException, ValidationException
+)
+from ..utils.logger import log_api_request
 
 router = APIRouter()
 
-@router.post("/run-audit")
-def run_audit():
+@router.post("/run-audit", response_model=AuditRunSummary)
+async def run_config_audit(request: Optional[AuditRunRequest] = None, db: Session = Depends(get_db)):
+    """
+    Audit the latest backed up configuration of the selected devices, or of
+    every device, against the compliance rules
+    """
+    request = request or AuditRunRequest()
+    try:
+        device_ids = None
+        if request.selector is not None:
+            targets = await run_in_threadpool(select_devices, db, request.selector, None)
+            device_ids = [target.device_id for target in targets]
+        summary = await run_in_threadpool(run_audit, db, device_ids, request.rule_ids)
+    except ValidationException as e:
+        log_api_request("POST", "/actions/run-audit", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except (ConfigurationException, NetworkOperationException) as e:
+        log_api_request("POST", "/actions/run-audit", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    log_api_request("POST", "/actions/run-audit", status.HTTP_200_OK)
+    return summary
+
+@router.post("/deploy-config", response_model=ConfigDeploymentResult)
+async def deploy_config(request: ConfigDeployRequest, db: Session = Depends(get_db)):
     """
-    Trigger a network audit. (Placeholder)
+    Deploy a validated configuration to the selected devices in waves,
+    stopping when too many devices fail
     """
-    return {"message": "Network audit started successfully"}
+    try:
+        checks = validate_commands(request.checks) if request.checks else request.checks
+        targets = None
+        if request.selector is not None:
+            targets = await run_in_threadpool(select_devices, db, request.selector, None)
+        result = await deploy_configuration(
+            request.configuration_id,
+            targets,
+            wave_size=request.wave_size,
+            canary_size=request.canary_size,
+            concurrency=request.concurrency,
+            failure_threshold=request.failure_threshold,
+            checks=checks,
+            save=request.save,
+            device_timeout=request.device_timeout
+        )
+    except ValidationException as e:
+        log_api_request("POST", "/actions/deploy-config", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ConfigurationNotFoundException as e:
+        log_api_request("POST", "/actions/deploy-config", status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ConfigurationException as e:
+        log_api_request("POST", "/actions/deploy-config", status.HTTP_409_CONFLICT)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
-@router.post("/deploy-config")
-def deploy_config():
+    log_api_request("POST", "/actions/deploy-config", status.HTTP_200_OK)
+    return result
+
+@router.post("/backup-configs", response_model=ConfigBackupResult)
+async def backup_device_configs(request: Optional[ConfigBackupRequest] = None, db: Session = Depends(get_db)):
     """
-    Deploy a network configuration. (Placeholder)
+    Back up the running-config of the selected devices, or of every device.
+    A new configuration is stored only for devices whose configuration changed.
     """
-    return {"message": "Configuration deployment initiated"}
+    request = request or ConfigBackupRequest()
+    try:
+        targets = await run_in_threadpool(select_devices, db, request.selector, None)
+    except ValidationException as e:
+        log_api_request("POST", "/actions/backup-configs", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    result = await backup_configs(targets, request.concurrency, request.device_timeout)
+    log_api_request("POST", "/actions/backup-configs", status.HTTP_200_OK)
+    return result
 
 @router.post("/check-health")
 def check_health():
@@ -1,64 +1,129 @@
-from crewai import Agent, Task, Crew
+import time
+from typing import AsyncIterator, Dict, List, Tuple
+
+try:
+    from crewai import Agent, Task, Crew
+except ImportError:
+    Agent = Task = Crew = None
+
 from .llm_manager import llm_manager
 
+# Agent definitions shared by the crewAI crew and the streamed run
+AGENT_PROFILES = {
+    "config_generator": {
+        "role": 'Network Configuration Generator',
+        "goal": 'Generate technically accurate and complete network configurations based on given requirements.',
+        "backstory": 'An expert in Cisco IOS, IOS-XE, and IOS-XR network device configurations with a deep understanding of routing, switching, and security best practices.',
+    },
+    "config_validator": {
+        "role": 'Configuration Validator',
+        "goal": 'Validate network configurations for syntax errors, security vulnerabilities, and adherence to best practices.',
+        "backstory": 'A meticulous network engineer who specializes in auditing configurations to ensure they are secure, efficient, and compliant with network policies.',
+    },
+    # In a real-world scenario, this agent would have tools to connect to devices.
+    "config_deployer": {
+        "role": 'Configuration Deployer',
+        "goal": 'Deploy validated configurations to network devices safely and efficiently.',
+        "backstory": 'A seasoned network operations specialist with expertise in deploying changes to live environments with minimal disruption, using pre-check and post-check validations.',
+    },
+}
+
 class NetworkAutomationCrew:
     """Manages the crew of AI agents for network automation tasks."""
     def __init__(self):
         # Use the globally managed LLM provider
         self.llm = llm_manager.current_provider
 
-        # Define Agents
-        self.config_generator = Agent(
-            role='Network Configuration Generator',
-            goal='Generate technically accurate and complete network configurations based on given requirements.',
-            backstory='An expert in Cisco IOS, IOS-XE, and IOS-XR network device configurations with a deep understanding of routing, switching, and security best practices.',
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False
-        )
-
-        self.config_validator = Agent(
-            role='Configuration Validator',
-            goal='Validate network configurations for syntax errors, security vulnerabilities, and adherence to best practices.',
-            backstory='A meticulous network engineer who specializes in auditing configurations to ensure they are secure, efficient, and compliant with network policies.',
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False
-        )
+    def _agent(self, name: str):
+        if Agent is None:
+            raise ImportError("crewAI library is not installed. Please install it with 'pip install crewai'.")
+        return Agent(**AGENT_PROFILES[name], llm=self.llm, verbose=True, allow_delegation=False)
 
-        # In a real-world scenario, this agent would have tools to connect to devices.
-        self.config_deployer = Agent(
-            role='Configuration Deployer',
-            goal='Deploy validated configurations to network devices safely and efficiently.',
-            backstory='A seasoned network operations specialist with expertise in deploying changes to live environments with minimal disruption, using pre-check and post-check validations.',
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False
-        )
+    @staticmethod
+    def _config_tasks(requirements: str, device_type: str) -> List[Dict[str, str]]:
+        """Tasks to generate and validate a configuration, each working from the previous output."""
+        return [
+            {
+                "name": "generate",
+                "agent": "config_generator",
+                "description": f"Generate a complete Cisco {device_type} configuration based on the following requirements: {requirements}",
+                "expected_output": f"A complete, ready-to-use Cisco {device_type} configuration script.",
+            },
+            {
+                "name": "validate",
+                "agent": "config_validator",
+                "description": "Validate the generated configuration for correctness, security, and best practices. Provide a report of findings and the final, validated configuration.",
+                "expected_output": "A JSON object with two keys: 'validation_report' (a string detailing the findings) and 'validated_config' (the final configuration script).",
+            },
+        ]
 
     def generate_and_validate_config(self, requirements: str, device_type: str):
         """Creates and runs a crew to generate and validate a configuration."""
 
         # Define Tasks
-        generate_task = Task(
-            description=f"Generate a complete Cisco {device_type} configuration based on the following requirements: {requirements}",
-            agent=self.config_generator,
-            expected_output=f"A complete, ready-to-use Cisco {device_type} configuration script."
-        )
-
-        validate_task = Task(
-            description="Validate the generated configuration for correctness, security, and best practices. Provide a report of findings and the final, validated configuration.",
-            agent=self.config_validator,
-            expected_output="A JSON object with two keys: 'validation_report' (a string detailing the findings) and 'validated_config' (the final configuration script).",
-            context=[generate_task]
-        )
+        agents = {}
+        tasks = []
+        for spec in self._config_tasks(requirements, device_type):
+            if spec["agent"] not in agents:
+                agents[spec["agent"]] = self._agent(spec["agent"])
+            tasks.append(Task(
+                description=spec["description"],
+                agent=agents[spec["agent"]],
+                expected_output=spec["expected_output"],
+                context=tasks[-1:] or None
+            ))
 
         # Assemble and run the crew
         config_crew = Crew(
-            agents=[self.config_generator, self.config_validator],
-            tasks=[generate_task, validate_task],
+            agents=list(agents.values()),
+            tasks=tasks,
             verbose=2
         )
 
         result = config_crew.kickoff()
         return result
+
+    @staticmethod
+    def _task_prompt(spec: Dict[str, str], context: List[str]) -> str:
+        profile = AGENT_PROFILES[spec["agent"]]
+        prompt = (
+            f"You are {profile['role']}.\n{profile['backstory']}\n\nYour personal goal is: {profile['goal']}\n\n"
+            f"Current Task: {spec['description']}\n\n"
+            f"This is the expected criteria for your final answer: {spec['expected_output']}"
+        )
+        if context:
+            prompt += "\n\nThis is the context you're working with:\n" + "\n\n".join(context)
+        return prompt
+
+    async def stream_generate_and_validate_config(self, requirements: str, device_type: str) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Run the generate and validate tasks in order, yielding (event, data) pairs:
+        crew_start, then per task agent_start, token for each piece of the answer
+        and task_end, then crew_end with the final answer.
+
+        crewAI only reports finished steps, so the tasks are run here against the
+        provider's streaming API with the same agents and task definitions,
+        through the response cache and request coalescing like the other
+        generation paths. The prompts are built here to resemble crewAI's but
+        are not the ones a crewAI run would send: crewAI adds its own tool and
+        formatting instructions and may take several steps per task, so the
+        two paths can answer differently and do not share cache entries.
+        """
+        specs = self._config_tasks(requirements, device_type)
+        started = time.monotonic()
+        yield "crew_start", {"tasks": [{"name": spec["name"], "agent": AGENT_PROFILES[spec["agent"]]["role"]} for spec in specs]}
+
+        context: List[str] = []
+        for spec in specs:
+            agent = AGENT_PROFILES[spec["agent"]]["role"]
+            task_started = time.monotonic()
+            yield "agent_start", {"task": spec["name"], "agent": agent}
+            parts = []
+            async for token in self.llm.astream_cached_text(self._task_prompt(spec, context)):
+                parts.append(token)
+                yield "token", {"task": spec["name"], "text": token}
+            output = "".join(parts)
+            context = [output]
+            yield "task_end", {"task": spec["name"], "agent": agent, "output": output, "duration": time.monotonic() - task_started}
+
+        yield "crew_end", {"result": context[-1] if context else "", "duration": time.monotonic() - started}
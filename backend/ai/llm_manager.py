@@ -1,14 +1,26 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..utils.config import config
+from ..utils.exceptions import LLMException
 from .llm_providers import LLMProvider, LLMFactory
+from .response_cache import llm_response_cache
+from .schemas import LLMProviderStats, LLMRoutingStats
 
 class LLMSettings:
     """Data class for holding LLM provider settings."""
     def __init__(self, provider: str, api_key: str, model: str, 
-                 temperature: float = 0.7, max_tokens: int = 2000):
+                 temperature: float = 0.7, max_tokens: int = 2000, base_url: str = None):
         self.provider = provider
         self.api_key = api_key
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.base_url = base_url
     
     def to_dict(self):
         """Convert settings to a dictionary for provider instantiation."""
@@ -16,14 +28,330 @@ class LLMSettings:
             "api_key": self.api_key,
             "model": self.model,
             "temperature": self.temperature,
-            "max_tokens": self.max_tokens
+            "max_tokens": self.max_tokens,
+            "base_url": self.base_url
         }
 
+class ProviderHealth:
+    """
+    Rolling latency and outcome window of one provider.
+
+    Besides the window's percentiles, an exponentially weighted average
+    follows the latest requests, so a provider that starts stalling loses
+    its rank within a few requests; a failure counts in that average as a
+    request that took the router's timeout. A provider that fails ``max_failures``
+    times in a row is put aside for ``cooldown`` seconds; it is still tried,
+    but only after every other one. One left unused for ``cooldown`` seconds
+    is ranked as new again, so a recovered provider gets probed.
+    """
+    # Weight of the newest sample in the recent latency average
+    RECENT_WEIGHT = 0.3
+
+    def __init__(self, window: Optional[int] = None, max_failures: Optional[int] = None, cooldown: Optional[float] = None):
+        window = window or config.LLM_ROUTING_WINDOW
+        self.max_failures = max_failures or config.LLM_ROUTING_MAX_FAILURES
+        self.cooldown = cooldown if cooldown is not None else config.LLM_ROUTING_COOLDOWN
+        self._latencies: "deque[float]" = deque(maxlen=window)
+        self._outcomes: "deque[bool]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.recent_latency: Optional[float] = None
+        self.last_used = 0.0
+
+    def mark_used(self):
+        now = time.monotonic()
+        if now - self.last_used > self.cooldown:
+            # Start the average over from the probe's answer
+            self.recent_latency = None
+        self.last_used = now
+
+    def _add_latency(self, latency: float):
+        self._latencies.append(latency)
+        if self.recent_latency is None:
+            self.recent_latency = latency
+        else:
+            self.recent_latency += self.RECENT_WEIGHT * (latency - self.recent_latency)
+
+    def record_success(self, latency: Optional[float] = None):
+        with self._lock:
+            self.requests += 1
+            self._outcomes.append(True)
+            if latency is not None:
+                self._add_latency(latency)
+            self.consecutive_failures = 0
+
+    def record_failure(self, penalty: Optional[float] = None):
+        """Record a failed request, adding ``penalty`` seconds to the recent latency average."""
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self._outcomes.append(False)
+            if penalty is not None:
+                # Only the average: the percentiles describe answers actually received
+                if self.recent_latency is None:
+                    self.recent_latency = penalty
+                else:
+                    self.recent_latency += self.RECENT_WEIGHT * (penalty - self.recent_latency)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.max_failures:
+                self.down_until = time.monotonic() + self.cooldown
+
+    def record_latency(self, latency: float):
+        """Record how long an abandoned request had run, a lower bound of its latency."""
+        with self._lock:
+            self._add_latency(latency)
+
+    def percentile(self, share: float) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, max(0, int(share * len(ordered) + 0.5) - 1))]
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def score(self) -> Tuple[bool, float]:
+        """
+        Sort key, lower is better: expected seconds to a good answer (recent
+        latency over success rate) behind availability. Providers without
+        any requests score zero, so new ones are tried.
+        """
+        recent = self.recent_latency
+        if time.monotonic() - self.last_used > self.cooldown:
+            # Figures this old say little about the provider now
+            recent = None
+        return not self.available, (recent or 0.0) / max(0.1, 1.0 - self.error_rate)
+
+class LLMRouter(LLMProvider):
+    """
+    Provider that spreads requests over every registered provider.
+
+    Each request goes to the provider with the best rolling latency and error
+    rate and fails over to the next one on an error or after ``timeout``
+    seconds. With ``hedge`` on, an async request still unanswered after the
+    chosen provider's p95 latency (``LLM_HEDGE_DELAY`` until it has enough
+    samples) is also sent to the runner-up and the first answer wins, which
+    bounds tail latency by the healthier of the two. Blocking calls run on a
+    thread pool so they can be given up after ``timeout`` as well; they fail
+    over but do not hedge, and streams only fail over before their first piece.
+    """
+    # Latency samples needed before the p95 replaces LLM_HEDGE_DELAY
+    MIN_HEDGE_SAMPLES = 5
+
+    def __init__(self, providers: Dict[str, LLMProvider], hedge: Optional[bool] = None, timeout: Optional[float] = None):
+        # Shared with the manager, so providers added later join the rotation
+        self.providers = providers
+        self.hedge = hedge if hedge is not None else config.LLM_HEDGE_ENABLED
+        self.timeout = timeout or config.LLM_ROUTING_TIMEOUT
+        self.health: Dict[str, ProviderHealth] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def _health(self, name: str) -> ProviderHealth:
+        if name not in self.health:
+            self.health[name] = ProviderHealth()
+        return self.health[name]
+
+    def ranked(self) -> List[Tuple[str, LLMProvider]]:
+        """Registered providers, best first."""
+        providers = list(self.providers.items())
+        if not providers:
+            raise LLMException("No LLM providers registered")
+        return sorted(providers, key=lambda item: self._health(item[0]).score())
+
+    def _hedge_delay(self, name: str) -> float:
+        health = self._health(name)
+        if health.samples < self.MIN_HEDGE_SAMPLES:
+            return config.LLM_HEDGE_DELAY
+        return health.percentile(0.95)
+
+    def _cache_key(self, prompt: str) -> Optional[bytes]:
+        # Any registered provider may answer, so the key covers all of them
+        members = sorted(self.providers.items())
+        temperatures = [getattr(provider, "default_params", {}).get("temperature") for _, provider in members]
+        return llm_response_cache.key(
+            prompt,
+            "router",
+            ",".join(f"{name}:{getattr(provider, 'model', '')}" for name, provider in members),
+            None if None in temperatures else max(temperatures, default=None)
+        )
+
+    def _submit(self, fn, *args, **kwargs) -> concurrent.futures.Future:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=config.LLM_ROUTING_THREADS, thread_name_prefix="llm-router"
+                )
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def generate_text(self, prompt: str, **kwargs) -> str:
+        errors = []
+        for index, (name, provider) in enumerate(self.ranked()):
+            if index:
+                self.failovers += 1
+            health = self._health(name)
+            begun = threading.Event()
+            started = [0.0]
+
+            def call(provider=provider):
+                started[0] = time.monotonic()
+                begun.set()
+                return provider.generate_text(prompt, **kwargs)
+
+            future = self._submit(call)
+            # The timeout covers the call itself, not the wait for a free thread
+            if not begun.wait(self.timeout) and future.cancel():
+                # The provider was never asked, so it is not to blame; another one would queue as well
+                raise LLMException(f"All {config.LLM_ROUTING_THREADS} LLM routing threads stayed busy for {self.timeout}s")
+            begun.wait()
+            health.mark_used()
+            try:
+                answer = future.result(max(0.0, started[0] + self.timeout - time.monotonic()))
+            except concurrent.futures.TimeoutError:
+                # The thread cannot be stopped; it ends with the provider's own request timeout
+                health.record_failure(self.timeout)
+                errors.append(f"{name}: no answer within {self.timeout}s")
+                continue
+            except Exception as e:
+                health.record_failure(self.timeout)
+                errors.append(f"{name}: {str(e)}")
+                continue
+            health.record_success(time.monotonic() - started[0])
+            return answer
+        raise LLMException("All LLM providers failed: " + "; ".join(errors))
+
+    async def _attempt(self, name: str, provider: LLMProvider, prompt: str, kwargs: dict) -> str:
+        health = self._health(name)
+        health.mark_used()
+        started = time.monotonic()
+        try:
+            answer = await asyncio.wait_for(provider.agenerate_text(prompt, **kwargs), self.timeout)
+        except asyncio.CancelledError:
+            health.record_latency(time.monotonic() - started)
+            raise
+        except asyncio.TimeoutError:
+            health.record_failure(self.timeout)
+            raise LLMException(f"{name}: no answer within {self.timeout}s")
+        except Exception as e:
+            health.record_failure(self.timeout)
+            raise LLMException(f"{name}: {str(e)}")
+        health.record_success(time.monotonic() - started)
+        return answer
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> str:
+        candidates = iter(self.ranked())
+        running: Dict[asyncio.Future, str] = {}
+        errors = []
+        hedge_from = None
+
+        def launch() -> bool:
+            for name, provider in candidates:
+                running[asyncio.ensure_future(self._attempt(name, provider, prompt, kwargs))] = name
+                return True
+            return False
+
+        launch()
+        try:
+            while running:
+                delay = None
+                if self.hedge and hedge_from is None and len(running) == 1:
+                    delay = self._hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_from = next(iter(running.values()))
+                    if launch():
+                        self.hedged += 1
+                    continue
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        answer = task.result()
+                    except LLMException as e:
+                        errors.append(str(e))
+                        continue
+                    if hedge_from is not None and name != hedge_from:
+                        self.hedge_wins += 1
+                    return answer
+                if not running and launch():
+                    self.failovers += 1
+            raise LLMException("All LLM providers failed: " + "; ".join(errors))
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        errors = []
+        for index, (name, provider) in enumerate(self.ranked()):
+            if index:
+                self.failovers += 1
+            health = self._health(name)
+            health.mark_used()
+            streamed = False
+            try:
+                async for piece in provider.astream_text(prompt, **kwargs):
+                    streamed = True
+                    yield piece
+            except Exception as e:
+                health.record_failure(self.timeout)
+                if streamed:
+                    raise LLMException(f"{name}: {str(e)}")
+                errors.append(f"{name}: {str(e)}")
+                continue
+            # Stream lengths vary too much for their duration to rank providers
+            health.record_success()
+            return
+        raise LLMException("All LLM providers failed: " + "; ".join(errors))
+
+    def stats(self) -> List[LLMProviderStats]:
+        """
+        Return rolling latency and error figures per registered provider
+        """
+        ranked = [name for name, _ in self.ranked()] if self.providers else []
+        stats = []
+        for name, provider in self.providers.items():
+            health = self._health(name)
+            stats.append(LLMProviderStats(
+                name=name,
+                provider=getattr(provider, "name", type(provider).__name__),
+                model=getattr(provider, "model", None),
+                rank=ranked.index(name) + 1,
+                requests=health.requests,
+                failures=health.failures,
+                error_rate=health.error_rate,
+                samples=health.samples,
+                p50=health.percentile(0.5),
+                p95=health.percentile(0.95),
+                recent_latency=health.recent_latency,
+                consecutive_failures=health.consecutive_failures,
+                available=health.available
+            ))
+        return stats
+
 class LLMManager:
     """Manages the lifecycle and switching of LLM providers."""
     def __init__(self):
         self._providers = {}
         self._current_provider = None
+        self._router: Optional[LLMRouter] = None
 
     def add_provider(self, name: str, settings: LLMSettings):
         """Adds and instantiates a new provider based on settings."""
@@ -40,9 +368,39 @@ class LLMManager:
         else:
             raise ValueError(f"Provider '{name}' not found. Please add it first.")
 
+    def enable_routing(self, hedge: Optional[bool] = None):
+        """Route requests across all providers instead of using only the current one."""
+        self._router = LLMRouter(self._providers, hedge=hedge)
+
+    def disable_routing(self):
+        """Go back to sending every request to the current provider."""
+        self._router = None
+
+    @property
+    def routing(self) -> bool:
+        return self._router is not None
+
+    def routing_stats(self) -> LLMRoutingStats:
+        """Returns routing counters and per-provider health."""
+        router = self._router
+        current = next((name for name, provider in self._providers.items() if provider is self._current_provider), None)
+        if router is None:
+            return LLMRoutingStats(enabled=False, current=current)
+        return LLMRoutingStats(
+            enabled=True,
+            hedge=router.hedge,
+            current=current,
+            hedged=router.hedged,
+            hedge_wins=router.hedge_wins,
+            failovers=router.failovers,
+            providers=router.stats()
+        )
+
     @property
     def current_provider(self) -> LLMProvider:
-        """Returns the currently active LLM provider."""
+        """Returns the currently active LLM provider, or the router when routing is enabled."""
+        if self._router is not None and self._providers:
+            return self._router
         if self._current_provider is None:
             raise ValueError("No active LLM provider. Please add and switch to a provider.")
         return self._current_provider
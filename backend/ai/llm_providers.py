@@ -1,4 +1,10 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import time
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 # Placeholder imports - we will manage dependencies later
 try:
@@ -16,6 +22,66 @@ try:
 except ImportError:
     OpenRouter = None
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from ..utils.config import config
+from ..utils.exceptions import LLMException
+from .response_cache import llm_response_cache
+from .singleflight import llm_single_flight
+
+class AsyncHTTPClientPool:
+    """
+    Shared keep-alive HTTP clients for the async provider calls, so concurrent
+    generations reuse a bounded set of connections instead of opening one each.
+
+    Each API base URL gets ``LLM_HTTP_CLIENTS`` clients used in turn, which
+    split ``LLM_MAX_CONNECTIONS`` between them: httpx scans every connection of
+    a client on each request, so one client with hundreds of connections costs
+    more CPU than the requests themselves. Clients belong to the event loop
+    that created them and are replaced when used from another loop.
+    """
+    def __init__(self):
+        self._clients: Dict[str, Tuple[asyncio.AbstractEventLoop, List["httpx.AsyncClient"], Iterator[int]]] = {}
+
+    @staticmethod
+    def _create_client(base_url: str, clients: int) -> "httpx.AsyncClient":
+        return httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max(1, -(-config.LLM_MAX_CONNECTIONS // clients)),
+                max_keepalive_connections=max(1, -(-config.LLM_MAX_KEEPALIVE_CONNECTIONS // clients)),
+                keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(config.LLM_REQUEST_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT)
+        )
+
+    def client(self, base_url: str) -> "httpx.AsyncClient":
+        if httpx is None:
+            raise ImportError("httpx library is not installed. Please install it with 'pip install httpx'.")
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(base_url)
+        if entry is None or entry[0] is not loop or any(client.is_closed for client in entry[1]):
+            count = max(1, config.LLM_HTTP_CLIENTS)
+            entry = (loop, [self._create_client(base_url, count) for _ in range(count)], itertools.count())
+            self._clients[base_url] = entry
+        _, clients, turn = entry
+        return clients[next(turn) % len(clients)]
+
+    async def aclose(self):
+        """Close the clients opened on the running event loop."""
+        loop = asyncio.get_running_loop()
+        entries, self._clients = self._clients, {}
+        for client_loop, clients, _ in entries.values():
+            if client_loop is loop:
+                for client in clients:
+                    await client.aclose()
+
+# Global instance shared by all providers
+http_client_pool = AsyncHTTPClientPool()
+
 class LLMProvider(ABC):
     """Abstract base class for all LLM providers."""
 
@@ -24,58 +90,165 @@ class LLMProvider(ABC):
         """Generate a text response from a prompt."""
         pass
 
+    async def agenerate_text(self, prompt: str, **kwargs) -> str:
+        """Generate a text response without blocking the event loop."""
+        return await asyncio.to_thread(self.generate_text, prompt, **kwargs)
+
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Generate a text response, yielding it in pieces as they arrive."""
+        yield await self.agenerate_text(prompt, **kwargs)
+
+    @staticmethod
+    def _config_prompt(requirements: str, device_type: str) -> str:
+        return f"Generate a Cisco {device_type} configuration for the following requirements: {requirements}"
+
+    @staticmethod
+    def _validation_prompt(config: str, requirements: str) -> str:
+        return f"Validate the following configuration against these requirements. Requirements: {requirements}\n\nConfiguration:\n{config}"
+
+    @staticmethod
+    def _troubleshooting_prompt(issue_description: str, device_info: dict) -> str:
+        return f"Troubleshoot the following network issue. Issue: {issue_description}\n\nDevice Info: {device_info}"
+
+    def _cache_key(self, prompt: str) -> Optional[bytes]:
+        """Response cache key for a prompt, or None when answers are not cached."""
+        return None
+
+    def _generate_cached(self, prompt: str) -> str:
+        key = self._cache_key(prompt)
+        if key is not None:
+            answer = llm_response_cache.get(key)
+            if answer is not None:
+                return answer
+        started = time.monotonic()
+        answer = self.generate_text(prompt)
+        if key is not None:
+            llm_response_cache.put(key, answer, time.monotonic() - started)
+        return answer
+
+    async def _agenerate_cached(self, prompt: str) -> str:
+        key = self._cache_key(prompt)
+        if key is not None:
+            # The SQLite tier blocks, so it is read and written off the event loop
+            answer = llm_response_cache.get_memory(key)
+            if answer is None:
+                answer = await asyncio.to_thread(llm_response_cache.get_disk, key)
+            if answer is not None:
+                return answer
+        started = time.monotonic()
+        answer = await self.agenerate_text(prompt)
+        if key is not None:
+            latency = time.monotonic() - started
+            llm_response_cache.put_memory(key, answer, latency)
+            await asyncio.to_thread(llm_response_cache.put_disk, key, answer, latency)
+        return answer
+
+    async def astream_cached_text(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream a text response through the response cache: a cached answer is
+        yielded in one piece, a streamed one is cached once it is complete.
+        """
+        key = self._cache_key(prompt)
+        if key is not None:
+            answer = llm_response_cache.get_memory(key)
+            if answer is None:
+                answer = await asyncio.to_thread(llm_response_cache.get_disk, key)
+            if answer is not None:
+                yield answer
+                return
+        started = time.monotonic()
+        parts = []
+        async for piece in self.astream_text(prompt):
+            parts.append(piece)
+            yield piece
+        if key is not None:
+            answer = "".join(parts)
+            latency = time.monotonic() - started
+            llm_response_cache.put_memory(key, answer, latency)
+            await asyncio.to_thread(llm_response_cache.put_disk, key, answer, latency)
+
     def generate_config(self, requirements: str, device_type: str) -> str:
         """Generate a network configuration."""
-        prompt = f"Generate a Cisco {device_type} configuration for the following requirements: {requirements}"
-        return self.generate_text(prompt)
+        return self._generate_cached(self._config_prompt(requirements, device_type))
 
     def validate_config(self, config: str, requirements: str) -> dict:
         """Validate a network configuration."""
-        prompt = f"Validate the following configuration against these requirements. Requirements: {requirements}\n\nConfiguration:\n{config}"
         # This would likely return a structured JSON in a real scenario
-        return {"validation_report": self.generate_text(prompt)}
+        return {"validation_report": self._generate_cached(self._validation_prompt(config, requirements))}
 
     def troubleshoot_issue(self, issue_description: str, device_info: dict) -> str:
         """Provide troubleshooting steps for a network issue."""
-        prompt = f"Troubleshoot the following network issue. Issue: {issue_description}\n\nDevice Info: {device_info}"
-        return self.generate_text(prompt)
+        return self.generate_text(self._troubleshooting_prompt(issue_description, device_info))
 
-class OpenAIProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "gpt-4", **kwargs):
-        if OpenAI is None:
-            raise ImportError("OpenAI library is not installed. Please install it with 'pip install openai'.")
-        self.client = OpenAI(api_key=api_key)
+    async def agenerate_config(self, requirements: str, device_type: str) -> str:
+        """Generate a network configuration without blocking the event loop."""
+        return await self._agenerate_cached(self._config_prompt(requirements, device_type))
+
+    async def avalidate_config(self, config: str, requirements: str) -> dict:
+        """Validate a network configuration without blocking the event loop."""
+        return {"validation_report": await self._agenerate_cached(self._validation_prompt(config, requirements))}
+
+    async def atroubleshoot_issue(self, issue_description: str, device_info: dict) -> str:
+        """Provide troubleshooting steps without blocking the event loop."""
+        return await self.agenerate_text(self._troubleshooting_prompt(issue_description, device_info))
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Provider speaking the OpenAI chat completions API.
+
+    Blocking calls use the vendor SDK, created on first use. Async calls post
+    to ``{base_url}/chat/completions`` through the shared HTTP client pool, so
+    they need only httpx and work against any compatible server. Identical
+    requests made while one is in flight share its answer.
+    """
+    name = "openai"
+    default_base_url = "https://api.openai.com/v1"
+
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None, **kwargs):
+        self.api_key = api_key
         self.model = model
+        self.base_url = (base_url or self.default_base_url).rstrip("/")
         # Store common LLM parameters, filtering out None values
         self.default_params = {
             key: kwargs.get(key) for key in ["temperature", "max_tokens"] if kwargs.get(key) is not None
         }
+        self._client = None
 
-    def generate_text(self, prompt: str, **kwargs) -> str:
-        request_params = self.default_params.copy()
-        request_params.update(kwargs)
+    @abstractmethod
+    def _create_client(self):
+        """Create the vendor SDK client."""
+        pass
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            **request_params
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _cache_key(self, prompt: str) -> Optional[bytes]:
+        return llm_response_cache.key(
+            prompt, self.name, self.model, self.default_params.get("temperature"), self.default_params.get("max_tokens")
         )
-        return response.choices[0].message.content
 
-class GroqProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "llama3-70b-8192", **kwargs):
-        if Groq is None:
-            raise ImportError("Groq library is not installed. Please install it with 'pip install groq'.")
-        self.client = Groq(api_key=api_key)
-        self.model = model
-        self.default_params = {
-            key: kwargs.get(key) for key in ["temperature", "max_tokens"] if kwargs.get(key) is not None
-        }
+    def _request_key(self, prompt: str, request_params: dict) -> bytes:
+        material = json.dumps([self.base_url, self.model, sorted(request_params.items()), prompt], default=str)
+        return hashlib.blake2b(material.encode("utf-8"), digest_size=20).digest()
 
     def generate_text(self, prompt: str, **kwargs) -> str:
         request_params = self.default_params.copy()
         request_params.update(kwargs)
+        return llm_single_flight.do(
+            self._request_key(prompt, request_params), lambda: self._complete(prompt, request_params)
+        )
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> str:
+        request_params = self.default_params.copy()
+        request_params.update(kwargs)
+        return await llm_single_flight.ado(
+            self._request_key(prompt, request_params), lambda: self._acomplete(prompt, request_params)
+        )
 
+    def _complete(self, prompt: str, request_params: dict) -> str:
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
@@ -83,26 +256,96 @@ class GroqProvider(LLMProvider):
         )
         return response.choices[0].message.content
 
-class OpenRouterProvider(LLMProvider):
-    def __init__(self, api_key: str, model: str = "openai/gpt-4", **kwargs):
-        if OpenRouter is None:
-            raise ImportError("OpenRouter library is not installed. Please install it with 'pip install openrouter-py'.")
-        self.client = OpenRouter(api_key=api_key)
-        self.model = model
-        self.default_params = {
-            key: kwargs.get(key) for key in ["temperature", "max_tokens"] if kwargs.get(key) is not None
-        }
+    async def _acomplete(self, prompt: str, request_params: dict) -> str:
+        client = http_client_pool.client(self.base_url)
+        try:
+            response = await client.post(
+                "/chat/completions",
+                json={"model": self.model, "messages": [{"role": "user", "content": prompt}], **request_params},
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        except httpx.HTTPError as e:
+            raise LLMException(f"{self.name} request failed: {type(e).__name__}: {str(e)}")
+        if response.status_code >= 400:
+            raise LLMException(f"{self.name} returned HTTP {response.status_code}: {response.text[:500]}")
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise LLMException(f"{self.name} returned an unexpected response: {str(e)}")
 
-    def generate_text(self, prompt: str, **kwargs) -> str:
+    async def astream_text(self, prompt: str, **kwargs) -> AsyncIterator[str]:
         request_params = self.default_params.copy()
         request_params.update(kwargs)
+        async for piece in llm_single_flight.astream(
+            self._request_key(prompt, {**request_params, "stream": True}), lambda: self._astream(prompt, request_params)
+        ):
+            yield piece
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            **request_params
-        )
-        return response.choices[0].message.content
+    async def _astream(self, prompt: str, request_params: dict) -> AsyncIterator[str]:
+        client = http_client_pool.client(self.base_url)
+        try:
+            async with client.stream(
+                "POST",
+                "/chat/completions",
+                json={"model": self.model, "messages": [{"role": "user", "content": prompt}], **request_params, "stream": True},
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise LLMException(f"{self.name} returned HTTP {response.status_code}: {response.text[:500]}")
+                # Server-sent events: one "data: {chunk}" line per delta, then "data: [DONE]"
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data)["choices"]
+                        content = choices[0]["delta"].get("content") if choices else None
+                    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                        raise LLMException(f"{self.name} returned an unexpected stream chunk: {str(e)}")
+                    if content:
+                        yield content
+        except httpx.HTTPError as e:
+            raise LLMException(f"{self.name} request failed: {type(e).__name__}: {str(e)}")
+
+class OpenAIProvider(OpenAICompatibleProvider):
+    name = "openai"
+    default_base_url = "https://api.openai.com/v1"
+
+    def __init__(self, api_key: str, model: str = "gpt-4", **kwargs):
+        super().__init__(api_key, model, **kwargs)
+
+    def _create_client(self):
+        if OpenAI is None:
+            raise ImportError("OpenAI library is not installed. Please install it with 'pip install openai'.")
+        return OpenAI(api_key=self.api_key, base_url=self.base_url)
+
+class GroqProvider(OpenAICompatibleProvider):
+    name = "groq"
+    default_base_url = "https://api.groq.com/openai/v1"
+
+    def __init__(self, api_key: str, model: str = "llama3-70b-8192", **kwargs):
+        super().__init__(api_key, model, **kwargs)
+
+    def _create_client(self):
+        if Groq is None:
+            raise ImportError("Groq library is not installed. Please install it with 'pip install groq'.")
+        # The Groq SDK adds /openai/v1 to its base URL itself
+        return Groq(api_key=self.api_key, base_url=self.base_url.rsplit("/openai/v1", 1)[0])
+
+class OpenRouterProvider(OpenAICompatibleProvider):
+    name = "openrouter"
+    default_base_url = "https://openrouter.ai/api/v1"
+
+    def __init__(self, api_key: str, model: str = "openai/gpt-4", **kwargs):
+        super().__init__(api_key, model, **kwargs)
+
+    def _create_client(self):
+        if OpenRouter is None:
+            raise ImportError("OpenRouter library is not installed. Please install it with 'pip install openrouter-py'.")
+        return OpenRouter(api_key=self.api_key)
 
 class LLMFactory:
     @staticmethod
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..utils.config import config
+from .schemas import LLMCacheStats
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM answers keyed by provider, model, temperature,
+    max_tokens and the whitespace-normalised prompt.
+
+    Lookups go to a bounded in-memory LRU first, then to a SQLite file shared
+    across restarts; disk hits are promoted to memory. Entries expire after
+    ``ttl`` seconds in both tiers, and the file is trimmed to ``max_disk_bytes``
+    of answers, least recently used first. Requests with a temperature above
+    ``max_temperature`` are meant to vary and are never cached.
+
+    ``get`` and ``put`` cover both tiers; the ``_memory`` and ``_disk``
+    variants let async callers keep the SQLite work off the event loop.
+    """
+    def __init__(self, max_size: Optional[int] = None, path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_disk_bytes: Optional[int] = None, max_temperature: Optional[float] = None):
+        self.max_size = max_size or config.LLM_CACHE_SIZE
+        self.path = path if path is not None else config.LLM_CACHE_PATH
+        self.ttl = ttl if ttl is not None else config.LLM_CACHE_TTL
+        self.max_disk_bytes = max_disk_bytes or config.LLM_CACHE_MAX_BYTES
+        self.max_temperature = max_temperature if max_temperature is not None else config.LLM_CACHE_MAX_TEMPERATURE
+        # key -> (expires_at, answer, seconds the answer took to generate)
+        self._entries: "OrderedDict[bytes, Tuple[float, str, float]]" = OrderedDict()
+        # The memory tier never waits for the disk tier
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        return " ".join(prompt.split())
+
+    def key(self, prompt: str, provider: str, model: str, temperature: Optional[float] = None,
+            max_tokens: Optional[int] = None) -> Optional[bytes]:
+        """
+        Cache key for a request, or None when the request must not be cached.
+        A missing temperature means the provider default, which is 1.0 for the
+        OpenAI-compatible APIs.
+        """
+        if (1.0 if temperature is None else temperature) > self.max_temperature:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        material = json.dumps([provider, model, temperature, max_tokens, self.normalize_prompt(prompt)])
+        return hashlib.blake2b(material.encode("utf-8"), digest_size=20).digest()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key BLOB PRIMARY KEY, answer TEXT NOT NULL, size INTEGER NOT NULL, latency REAL NOT NULL, "
+                "expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS ix_responses_used_at ON responses (used_at)")
+            db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._disk_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def _remember(self, key: bytes, expires_at: float, answer: str, latency: float):
+        self._entries[key] = (expires_at, answer, latency)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_memory(self, key: bytes) -> Optional[str]:
+        """
+        Return the answer held in memory for a key, or None; never touches the disk
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            # Answering from memory takes no measurable time
+            self.saved_seconds += entry[2]
+            return entry[1]
+
+    def get_disk(self, key: bytes) -> Optional[str]:
+        """
+        Look a key up in the SQLite tier, promoting a hit to memory. Blocking:
+        async callers run it in a thread.
+        """
+        started = time.monotonic()
+        now = time.time()
+        with self._disk_lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT expires_at, answer, latency FROM responses WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone() if db is not None else None
+            if row is not None:
+                db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, *row)
+            self.disk_hits += 1
+            # What answering from the cache saved, against generating the answer again
+            self.saved_seconds += max(0.0, row[2] - (time.monotonic() - started))
+            return row[1]
+
+    def get(self, key: bytes) -> Optional[str]:
+        """
+        Return the cached answer for a key, or None on a miss
+        """
+        answer = self.get_memory(key)
+        return answer if answer is not None else self.get_disk(key)
+
+    def put_memory(self, key: bytes, answer: str, latency: float):
+        """
+        Store an answer in the memory tier only
+        """
+        with self._lock:
+            self._remember(key, time.time() + self.ttl, answer, latency)
+
+    def put_disk(self, key: bytes, answer: str, latency: float):
+        """
+        Store an answer in the SQLite tier. Blocking: async callers run it in a thread.
+        """
+        now = time.time()
+        size = len(answer.encode("utf-8"))
+        if size > self.max_disk_bytes:
+            return
+        with self._disk_lock:
+            db = self._connect()
+            if db is None:
+                return
+            previous = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, answer, size, latency, expires_at, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, answer, size, latency, now + self.ttl, now)
+            )
+            self._disk_bytes += size - (previous[0] if previous else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._trim(db, now)
+
+    def put(self, key: bytes, answer: str, latency: float):
+        """
+        Store an answer along with how many seconds it took to generate
+        """
+        self.put_memory(key, answer, latency)
+        self.put_disk(key, answer, latency)
+
+    def _trim(self, db: sqlite3.Connection, now: float):
+        # Expired answers go first, then the least recently used ones
+        self._disk_bytes -= db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires_at < ?", (now,)
+        ).fetchone()[0]
+        self.disk_evictions += db.execute("DELETE FROM responses WHERE expires_at < ?", (now,)).rowcount
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = db.execute("SELECT key, size FROM responses ORDER BY used_at LIMIT 100").fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            doomed = []
+            for key, size in rows:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+                doomed.append((key,))
+                self._disk_bytes -= size
+            db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self.disk_evictions += len(doomed)
+
+    def clear(self):
+        """
+        Drop every entry from both tiers
+        """
+        with self._lock:
+            self._entries.clear()
+        with self._disk_lock:
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+            self._disk_bytes = 0
+
+    def stats(self) -> LLMCacheStats:
+        """
+        Return tier sizes, hit/miss counters and the generation time saved
+        """
+        with self._disk_lock:
+            db = self._connect()
+            disk_entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if db is not None else 0
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return LLMCacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                disk_entries=disk_entries,
+                disk_bytes=self._disk_bytes,
+                max_disk_bytes=self.max_disk_bytes,
+                ttl=self.ttl,
+                max_temperature=self.max_temperature,
+                hits=hits,
+                memory_hits=self.memory_hits,
+                disk_hits=self.disk_hits,
+                misses=self.misses,
+                bypassed=self.bypassed,
+                hit_ratio=hits / lookups if lookups else 0.0,
+                evictions=self.evictions,
+                disk_evictions=self.disk_evictions,
+                saved_seconds=self.saved_seconds
+            )
+
+# Global instance to be used across the application
+llm_response_cache = LLMResponseCache()
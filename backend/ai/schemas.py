@@ -0,0 +1,71 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+class GeneratedConfig(BaseModel):
+    """
+    Schema for a generated configuration and its validation report
+    """
+    configuration: str
+    validation_report: str
+    duration: float
+
+class LLMCacheStats(BaseModel):
+    """
+    Schema for LLM response cache statistics
+    """
+    size: int
+    max_size: int
+    disk_entries: int
+    disk_bytes: int
+    max_disk_bytes: int
+    ttl: float
+    max_temperature: float
+    hits: int
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    bypassed: int
+    hit_ratio: float
+    evictions: int
+    disk_evictions: int
+    saved_seconds: float
+
+class LLMProviderStats(BaseModel):
+    """
+    Schema for the rolling health of one routed LLM provider
+    """
+    name: str
+    provider: str
+    model: Optional[str] = None
+    rank: int
+    requests: int
+    failures: int
+    error_rate: float
+    samples: int
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    recent_latency: Optional[float] = None
+    consecutive_failures: int
+    available: bool
+
+class LLMRoutingStats(BaseModel):
+    """
+    Schema for LLM provider routing statistics
+    """
+    enabled: bool
+    hedge: bool = False
+    current: Optional[str] = None
+    hedged: int = 0
+    hedge_wins: int = 0
+    failovers: int = 0
+    providers: List[LLMProviderStats] = []
+
+class LLMCoalescingStats(BaseModel):
+    """
+    Schema for statistics of identical LLM requests coalesced while in flight
+    """
+    in_flight: int
+    calls: int
+    coalesced: int
+    coalesced_ratio: float
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .schemas import LLMCoalescingStats
+
+class _Call:
+    """One blocking call in flight and the callers waiting for it."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class _AsyncCall:
+    """One coroutine in flight, run as a task shared by its callers."""
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class _AsyncStream:
+    """One stream in flight, read by a task that keeps every piece for its callers."""
+    def __init__(self):
+        self.pieces: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key is running,
+    later callers with the same key wait for it and get its result (or its
+    exception) instead of making their own.
+
+    ``do`` serves blocking callers from any thread. ``ado`` serves coroutines;
+    the call runs as its own task, so one caller being cancelled does not
+    cancel it for the others, and it is only cancelled once every caller is
+    gone. ``astream`` does the same for async iterators: a caller joining a
+    stream first gets the pieces already read, then the rest as they arrive.
+    Results are not kept after the call finishes.
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _AsyncCall] = {}
+        self._streams: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _AsyncStream] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Return fn(), or the result of the call for ``key`` already running
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return await fn(), or the result of the call for ``key`` already running
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            call = self._async_calls.get(flight_key)
+            if call is None:
+                call = self._async_calls[flight_key] = _AsyncCall(loop.create_task(fn()))
+                call.task.add_done_callback(lambda _: self._forget(flight_key, call))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if not call.task.done():
+                with self._lock:
+                    call.waiters -= 1
+                    abandoned = call.waiters == 0
+                    # Callers arriving from now on start a new call instead of joining a cancelled one
+                    if abandoned and self._async_calls.get(flight_key) is call:
+                        del self._async_calls[flight_key]
+                if abandoned:
+                    call.task.cancel()
+            raise
+
+    async def astream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Yield the pieces of fn(), or of the stream for ``key`` already running
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            stream = self._streams.get(flight_key)
+            if stream is None:
+                stream = self._streams[flight_key] = _AsyncStream()
+                stream.task = loop.create_task(self._read_stream(flight_key, stream, fn))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+            stream.waiters += 1
+
+        index = 0
+        try:
+            while True:
+                while index < len(stream.pieces):
+                    yield stream.pieces[index]
+                    index += 1
+                if stream.finished:
+                    if stream.error is not None:
+                        raise stream.error
+                    return
+                await stream.changed.wait()
+        finally:
+            # Also reached when the caller stops reading early
+            with self._lock:
+                stream.waiters -= 1
+                abandoned = stream.waiters == 0 and not stream.finished
+                if abandoned and self._streams.get(flight_key) is stream:
+                    del self._streams[flight_key]
+            if abandoned:
+                stream.task.cancel()
+
+    async def _read_stream(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], stream: _AsyncStream,
+                           fn: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for piece in fn():
+                stream.pieces.append(piece)
+                stream.notify()
+        except asyncio.CancelledError:
+            stream.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            stream.error = e
+        finally:
+            stream.finished = True
+            with self._lock:
+                if self._streams.get(flight_key) is stream:
+                    del self._streams[flight_key]
+            stream.notify()
+
+    def _forget(self, flight_key: Tuple[asyncio.AbstractEventLoop, Hashable], call: _AsyncCall):
+        with self._lock:
+            if self._async_calls.get(flight_key) is call:
+                del self._async_calls[flight_key]
+
+    def stats(self) -> LLMCoalescingStats:
+        """
+        Return calls made, calls coalesced into them and calls running
+        """
+        with self._lock:
+            requested = self.calls + self.coalesced
+            return LLMCoalescingStats(
+                in_flight=len(self._calls) + len(self._async_calls) + len(self._streams),
+                calls=self.calls,
+                coalesced=self.coalesced,
+                coalesced_ratio=self.coalesced / requested if requested else 0.0
+            )
+
+# Global instance shared by all providers
+llm_single_flight = SingleFlight()
@@ -7,6 +7,8 @@ from backend.settings.routes import router as settings_router
 from backend.users.routes import router as users_router
 from backend.actions.routes import router as actions_router
 from backend.api.v1.endpoints.genai import router as genai_router
+from backend.network_automation.routes import router as network_automation_router
+from backend.network_operations.routes import router as network_operations_router
 
 # Create main API router
 api_router = APIRouter()
@@ -18,6 +20,8 @@ api_router.include_router(settings_router, prefix="/v1/settings", tags=["setting
 api_router.include_router(users_router, prefix="/v1/users", tags=["users"])
 api_router.include_router(actions_router, prefix="/v1/actions", tags=["actions"])
 api_router.include_router(genai_router, prefix="/v1/genai", tags=["genai"])
+api_router.include_router(network_automation_router, prefix="/v1/network-automation", tags=["network-automation"])
+api_router.include_router(network_operations_router, prefix="/v1/network-operations", tags=["network-operations"])
 
 
 @api_router.get("/network-operations/status")
@@ -1,19 +1,79 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-
+import asyncio
+import json
 import time
-from fastapi import APIRouter
+from typing import AsyncIterator, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-# from backend.ai.crew import NetworkAutomationCrew
-# from backend.ai.llm_manager import llm_manager
+from backend.ai.crew import NetworkAutomationCrew
+from backend.ai.llm_manager import llm_manager
+from backend.ai.response_cache import llm_response_cache
+from backend.ai.schemas import GeneratedConfig, LLMCacheStats, LLMCoalescingStats, LLMRoutingStats
+from backend.ai.singleflight import llm_single_flight
+from backend.utils.config import config
+from backend.utils.exceptions import LLMException
+from backend.utils.logger import log_api_request
 
 router = APIRouter()
 
+# Seconds between checks for a disconnected client while the model is quiet
+DISCONNECT_POLL_INTERVAL = 1.0
+
 class GenerateConfigRequest(BaseModel):
     requirements: str
     device_type: str
 
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def sse_stream(events: AsyncIterator[Tuple[str, dict]], request: Request) -> AsyncIterator[str]:
+    """
+    Relay (event, data) pairs as Server-Sent Events.
+
+    While no event is ready the client connection is checked every second and
+    a keep-alive comment is sent every GENAI_STREAM_HEARTBEAT seconds; when the
+    client goes away (or the response is cancelled) the pending work is
+    cancelled, which also closes the upstream provider request.
+    """
+    iterator = events.__aiter__()
+    pending = None
+    last_sent = time.monotonic()
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=DISCONNECT_POLL_INTERVAL)
+            if not done:
+                if await request.is_disconnected():
+                    break
+                if time.monotonic() - last_sent >= config.GENAI_STREAM_HEARTBEAT:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                continue
+            try:
+                event, data = pending.result()
+            except StopAsyncIteration:
+                pending = None
+                break
+            except LLMException as e:
+                pending = None
+                yield format_sse("error", {"detail": str(e)})
+                break
+            pending = None
+            last_sent = time.monotonic()
+            yield format_sse(event, data)
+    finally:
+        # Starlette cancels a disconnected response through an anyio cancel
+        # scope, which would interrupt this cleanup too
+        with anyio.CancelScope(shield=True):
+            if pending is not None:
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+            await iterator.aclose()
+
 @router.post("/config/generate")
 def generate_config(request: GenerateConfigRequest):
     """
@@ -21,11 +81,11 @@ def generate_config(request: GenerateConfigRequest):
     """
     try:
         # Initialize the crew
-        network_crew = NetworkAutomationCrew(device_type=request.device_type)
-        
+        network_crew = NetworkAutomationCrew()
+
         # Kick off the task
-        result = network_crew.kickoff(requirements=request.requirements)
-        
+        result = network_crew.generate_and_validate_config(request.requirements, request.device_type)
+
         return {"result": result}
     except Exception as e:
         # Log the exception for debugging
@@ -35,3 +95,79 @@ def generate_config(request: GenerateConfigRequest):
             status_code=500,
             detail=f"An error occurred while generating the configuration: {str(e)}"
         )
+
+@router.post("/config/generate/async", response_model=GeneratedConfig)
+async def generate_config_async(request: GenerateConfigRequest):
+    """
+    Generates and validates a network configuration on the event loop, with
+    one provider call per step instead of a crew run. Answers go through the
+    LLM response cache and identical requests in flight share one call.
+    """
+    try:
+        provider = llm_manager.current_provider
+    except ValueError as e:
+        log_api_request("POST", "/genai/config/generate/async", status.HTTP_503_SERVICE_UNAVAILABLE)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    started = time.monotonic()
+    try:
+        configuration = await provider.agenerate_config(request.requirements, request.device_type)
+        validation = await provider.avalidate_config(configuration, request.requirements)
+    except LLMException as e:
+        log_api_request("POST", "/genai/config/generate/async", status.HTTP_502_BAD_GATEWAY)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+    log_api_request("POST", "/genai/config/generate/async", status.HTTP_200_OK)
+    return GeneratedConfig(
+        configuration=configuration,
+        validation_report=validation["validation_report"],
+        duration=time.monotonic() - started
+    )
+
+@router.post("/config/generate/stream")
+async def stream_generate_config(request: GenerateConfigRequest, http_request: Request):
+    """
+    Generates and validates a network configuration, streaming Server-Sent Events:
+    crew_start, agent_start, token, task_end and crew_end, or error on failure.
+    """
+    try:
+        network_crew = NetworkAutomationCrew()
+    except ValueError as e:
+        log_api_request("POST", "/genai/config/generate/stream", status.HTTP_503_SERVICE_UNAVAILABLE)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    events = network_crew.stream_generate_and_validate_config(request.requirements, request.device_type)
+    log_api_request("POST", "/genai/config/generate/stream", status.HTTP_200_OK)
+    return StreamingResponse(
+        sse_stream(events, http_request),
+        media_type="text/event-stream",
+        # No caching or proxy buffering, so each event reaches the client as it is produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats", response_model=LLMCacheStats)
+def read_llm_cache_stats():
+    """
+    Retrieve LLM response cache statistics, including generation time saved by hits
+    """
+
+    log_api_request("GET", "/genai/cache/stats", status.HTTP_200_OK)
+    return llm_response_cache.stats()
+
+@router.get("/providers/stats", response_model=LLMRoutingStats)
+def read_llm_routing_stats():
+    """
+    Retrieve LLM provider routing statistics with rolling latency and error rate per provider
+    """
+
+    log_api_request("GET", "/genai/providers/stats", status.HTTP_200_OK)
+    return llm_manager.routing_stats()
+
+@router.get("/coalescing/stats", response_model=LLMCoalescingStats)
+def read_llm_coalescing_stats():
+    """
+    Retrieve statistics of identical LLM requests that shared one in-flight call
+    """
+
+    log_api_request("GET", "/genai/coalescing/stats", status.HTTP_200_OK)
+    return llm_single_flight.stats()
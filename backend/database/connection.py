@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -35,9 +36,52 @@ def get_db():
     finally:
         db.close()
 
+def upgrade_schema(bind=engine):
+    """
+    Bring tables created by an earlier release up to the models: add missing
+    columns and indexes, which create_all leaves out for existing tables.
+    New columns are nullable, so existing rows need no backfill.
+    """
+    from .models import Base as ModelBase
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    with bind.begin() as connection:
+        if bind.dialect.name == "postgresql":
+            # The configuration search indexes need trigram support
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for table in ModelBase.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    connection.execute(text(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                        f"{preparer.format_column(column)} {column.type.compile(dialect=bind.dialect)}"
+                    ))
+            for index in table.indexes:
+                try:
+                    index.create(connection, checkfirst=True)
+                except IntegrityError as e:
+                    # Existing rows break a new unique index; they have to be cleaned up by hand
+                    raise RuntimeError(
+                        f"Cannot create unique index {index.name} on {table.name}: duplicate "
+                        f"{', '.join(column.name for column in index.columns)} values exist. "
+                        f"Remove the duplicates and initialize the database again."
+                    ) from e
+
+def missing_tables(names, bind=engine):
+    """
+    Names of the given tables that do not exist in the database
+    """
+    inspector = inspect(bind)
+    return [name for name in names if not inspector.has_table(name)]
+
 def init_db():
     """
-    Initialize the database by creating all tables
+    Initialize the database by creating all tables and upgrading existing ones
     """
-    from . import models  # Import models to register them
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    # The models are declared on their own base, not on Base above
+    from .models import Base as ModelBase
+    ModelBase.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, Index, DDL, event
 from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
 from datetime import datetime, timezone
 from typing import List, Optional
@@ -26,7 +26,7 @@ class Device(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    ip_address = Column(String, index=True)
+    ip_address = Column(String)  # unique, see uq_devices_ip_address
     device_type = Column(String)  # ios, iosxr, iosxe
     username = Column(String)
     hashed_password = Column(String)
@@ -40,14 +40,72 @@ class Device(Base):
     # Relationships
     owner = relationship("User", back_populates="devices")
     configurations = relationship("Configuration", back_populates="device")
+    poll_samples = relationship("DevicePollSample", cascade="all, delete-orphan", passive_deletes=True)
+    poll_rollups = relationship("DevicePollRollup", cascade="all, delete-orphan", passive_deletes=True)
+    
+    # Composite indexes backing keyset pagination and the list filters
+    __table_args__ = (
+        # Devices are identified by IP address, which bulk imports upsert on
+        Index("uq_devices_ip_address", "ip_address", unique=True),
+        Index("ix_devices_name_id", "name", "id"),
+        Index("ix_devices_status_id", "status", "id"),
+        Index("ix_devices_device_type_id", "device_type", "id"),
+        Index("ix_devices_protocol_id", "protocol", "id"),
+        Index("ix_devices_owner_id_id", "owner_id", "id"),
+    )
+
+class DevicePollSample(Base):
+    __tablename__ = 'device_poll_samples'
+    
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
+    timestamp = Column(DateTime, nullable=False, index=True)  # naive UTC
+    reachable = Column(Boolean, nullable=False)
+    response_time = Column(Float)  # RTT in milliseconds
+    
+    __table_args__ = (
+        Index("ix_device_poll_samples_device_timestamp", "device_id", "timestamp"),
+    )
+
+class DevicePollRollup(Base):
+    __tablename__ = 'device_poll_rollups'
+    
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    tier = Column(String, primary_key=True)  # 1m, 1h, 1d
+    bucket_start = Column(DateTime, primary_key=True, index=True)  # naive UTC
+    sample_count = Column(Integer, nullable=False)
+    up_count = Column(Integer, nullable=False)
+    rtt_count = Column(Integer, nullable=False, default=0)
+    rtt_sum = Column(Float)
+    rtt_min = Column(Float)
+    rtt_max = Column(Float)
+
+class PollLease(Base):
+    __tablename__ = 'poll_leases'
+
+    shard_id = Column(Integer, primary_key=True)  # devices with id % shard count == shard_id
+    owner = Column(String, index=True)  # worker id, NULL when free
+    expires_at = Column(DateTime)  # naive UTC
+    heartbeat_at = Column(DateTime)  # naive UTC
+
+class PollWorker(Base):
+    __tablename__ = 'poll_workers'
+
+    worker_id = Column(String, primary_key=True)
+    heartbeat_at = Column(DateTime, nullable=False)  # naive UTC
+    expires_at = Column(DateTime, nullable=False, index=True)  # naive UTC
 
 class Configuration(Base):
     __tablename__ = 'configurations'
     
     id = Column(Integer, primary_key=True, index=True)
     device_id = Column(Integer, ForeignKey("devices.id"))
-    content = Column(Text)
-    status = Column(String, default="draft")  # draft, validated, deployed
+    version = Column(Integer)  # per device and status, starting at 1
+    content = Column(Text)  # full text on snapshots and on the latest version, NULL otherwise
+    delta = Column(Text)  # JSON line delta from the previous version
+    is_snapshot = Column(Boolean, default=False)
+    content_hash = Column(String(64))  # sha256 of the normalized content
+    status = Column(String, default="draft")  # draft, validated, deploying, deployed, failed, backup
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     validated_at = Column(DateTime)
     deployed_at = Column(DateTime)
@@ -55,6 +113,59 @@ class Configuration(Base):
     # Relationships
     device = relationship("Device", back_populates="configurations")
 
+    __table_args__ = (
+        # Version history of a given status per device
+        Index("ix_configurations_device_id_status_version", "device_id", "status", "version", unique=True),
+        # Trigram indexes for configuration search; other databases use an in-process index
+        Index(
+            "ix_configurations_content_trgm", "content",
+            postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_configurations_delta_trgm", "delta",
+            postgresql_using="gin", postgresql_ops={"delta": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
+event.listen(
+    Configuration.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+class AuditRun(Base):
+    __tablename__ = 'audit_runs'
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, default="running")  # running, completed, failed
+    started_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime)
+    device_count = Column(Integer, default=0)
+    rule_count = Column(Integer, default=0)
+    missing_configs = Column(Integer, default=0)
+    passed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    failed_devices = Column(Integer, default=0)
+
+    results = relationship("AuditResult", cascade="all, delete-orphan", passive_deletes=True)
+
+class AuditResult(Base):
+    __tablename__ = 'audit_results'
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("audit_runs.id", ondelete="CASCADE"), nullable=False)
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
+    rule_id = Column(String, nullable=False)
+    severity = Column(String)
+    passed = Column(Boolean, nullable=False)
+    details = Column(Text)
+
+    __table_args__ = (
+        # Results of a run per device and per rule
+        Index("ix_audit_results_run_device", "run_id", "device_id"),
+        Index("ix_audit_results_run_rule_passed", "run_id", "rule_id", "passed"),
+    )
+
 class ChatMessage(Base):
     __tablename__ = 'chat_messages'
     
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..utils.config import config
+from ..utils.logger import log_network_activity
+from .poller import poll_fleet
+from .schemas import DevicePollResult
+
+class DevicePollState:
+    """
+    Polling state kept for one device between polls
+    """
+    def __init__(self):
+        self.confirmed_status = None
+        self.candidate_status = None
+        self.candidate_count = 0
+        self.consecutive_offline = 0
+        self.transitions = deque()
+        self.flapping = False
+
+    @property
+    def pending_confirmation(self) -> bool:
+        return self.candidate_status is not None
+
+class AdaptivePollPolicy:
+    """
+    Turns raw probe outcomes into trusted device status and per-device poll intervals.
+
+    - A status change is only accepted after ``confirm_count`` consecutive
+      probes agree; until then the previous status is kept and the device is
+      re-probed after ``confirm_interval`` seconds.
+    - A device that stays offline is polled exponentially less often, from
+      ``base_interval`` up to ``max_interval``.
+    - A device with ``flap_threshold`` accepted transitions inside
+      ``flap_window`` seconds is flagged as flapping until it settles; its
+      status stays the last confirmed one.
+    """
+    def __init__(self, base_interval: Optional[float] = None, max_interval: Optional[float] = None,
+                 confirm_interval: Optional[float] = None, confirm_count: Optional[int] = None,
+                 flap_window: Optional[float] = None, flap_threshold: Optional[int] = None):
+        self.base_interval = base_interval or config.DEFAULT_POLLING_INTERVAL
+        self.max_interval = max_interval or config.POLL_BACKOFF_MAX
+        self.confirm_interval = confirm_interval or config.POLL_CONFIRM_INTERVAL
+        self.confirm_count = confirm_count or config.POLL_CONFIRM_COUNT
+        self.flap_window = flap_window or config.POLL_FLAP_WINDOW
+        self.flap_threshold = flap_threshold or config.POLL_FLAP_THRESHOLD
+        self._states: Dict[int, DevicePollState] = {}
+        self._lock = threading.Lock()
+
+    def state(self, device_id: int) -> DevicePollState:
+        with self._lock:
+            return self._states.setdefault(device_id, DevicePollState())
+
+    def forget(self, device_ids: Iterable[int]):
+        """
+        Drop state for devices that no longer exist
+        """
+        with self._lock:
+            for device_id in device_ids:
+                self._states.pop(device_id, None)
+
+    def known_devices(self) -> List[int]:
+        with self._lock:
+            return list(self._states)
+
+    def _accept(self, state: DevicePollState, status: str, now: float):
+        if state.confirmed_status is not None:
+            state.transitions.append(now)
+        state.confirmed_status = status
+        state.candidate_status = None
+        state.candidate_count = 0
+
+    def observe(self, result: DevicePollResult, now: Optional[float] = None) -> Tuple[DevicePollResult, float]:
+        """
+        Record a probe outcome. Returns the result to publish and the number
+        of seconds until the device should be polled again.
+        """
+        if result.status == "error":
+            # An error says nothing about the device itself
+            return result, self.base_interval
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._states.setdefault(result.device_id, DevicePollState())
+
+            if state.confirmed_status is None:
+                self._accept(state, result.status, now)
+            elif result.status == state.confirmed_status:
+                state.candidate_status = None
+                state.candidate_count = 0
+            else:
+                if state.candidate_status == result.status:
+                    state.candidate_count += 1
+                else:
+                    state.candidate_status = result.status
+                    state.candidate_count = 1
+                if state.candidate_count >= self.confirm_count:
+                    log_network_activity("status-change", str(result.device_id), result.status, result.device_id)
+                    self._accept(state, result.status, now)
+
+            while state.transitions and state.transitions[0] < now - self.flap_window:
+                state.transitions.popleft()
+            state.flapping = len(state.transitions) >= self.flap_threshold
+
+            if state.confirmed_status == "offline" and not state.pending_confirmation:
+                state.consecutive_offline += 1
+            elif state.confirmed_status == "online":
+                state.consecutive_offline = 0
+
+            if state.pending_confirmation:
+                interval = self.confirm_interval
+                message = f"Device is {state.confirmed_status} (probe reported {state.candidate_status}, awaiting confirmation)"
+            elif state.consecutive_offline > 1:
+                interval = min(self.base_interval * 2 ** (state.consecutive_offline - 1), self.max_interval)
+                message = result.message
+            else:
+                interval = self.base_interval
+                message = result.message
+
+            status = state.confirmed_status
+            flapping = state.flapping
+            if flapping:
+                message = f"Device is flapping: changed state {len(state.transitions)} times in the last {int(self.flap_window)}s"
+
+        published = result.model_copy(update={"status": status, "message": message, "flapping": flapping})
+        return published, interval
+
+    def needs_confirmation(self, device_id: int) -> bool:
+        """
+        Whether the device has an unconfirmed status change
+        """
+        with self._lock:
+            state = self._states.get(device_id)
+            return state is not None and state.pending_confirmation
+
+async def poll_with_confirmation(targets: Iterable[Tuple[int, str, int]],
+                                 policy: Optional[AdaptivePollPolicy] = None) -> Dict[int, DevicePollResult]:
+    """
+    Poll devices through the adaptive policy, re-probing devices whose status
+    changed right away instead of waiting for the confirmation interval.
+    Used by on-demand polls where the caller waits for the answer.
+    """
+    policy = policy or adaptive_policy
+    pending = list(targets)
+    results: Dict[int, DevicePollResult] = {}
+    for _ in range(policy.confirm_count):
+        for device_id, result in (await poll_fleet(pending)).items():
+            results[device_id], _ = policy.observe(result)
+        pending = [target for target in pending if policy.needs_confirmation(target[0])]
+        if not pending:
+            break
+    return results
+
+# Global instance shared by manual polls and the background scheduler
+adaptive_policy = AdaptivePollPolicy()
@@ -0,0 +1,228 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database.models import Device
+from ..utils.config import config
+from ..utils.exceptions import ValidationException
+from ..utils.logger import log_db_operation
+from .cache import device_cache
+from .schemas import DeviceCreate, DeviceImportError, DeviceImportResult
+from .service import hash_device_password
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Dialects with INSERT ... ON CONFLICT, which upserts on the unique IP address index
+UPSERT_DIALECTS = {"postgresql": postgresql, "sqlite": sqlite}
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a byte stream into text lines without buffering the whole body
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (row number, field dict) pairs from CSV lines; the first line is the header
+    """
+    header = None
+    row_number = 0
+    pending = ""
+    max_size = config.DEVICE_IMPORT_MAX_RECORD_SIZE
+    async for line in lines:
+        # A quoted field may span several physical lines
+        pending = f"{pending}\n{line}" if pending else line
+        if len(pending) > max_size:
+            # Most likely a stray quote; drop the record rather than buffer the rest of the body
+            pending = ""
+            row_number += 1
+            yield row_number, ValidationException(f"record exceeds {max_size} characters")
+            continue
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ValidationException(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells fall back to the schema defaults
+        yield row_number, {key: value for key, value in zip(header, values) if value != ""}
+    if pending:
+        yield row_number + 1, ValidationException("unterminated quoted field")
+
+async def _iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yield (row number, object) pairs from newline-delimited JSON
+    """
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValidationException(f"invalid JSON: {str(e)}")
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+    )
+
+def upsert_devices(db: Session, devices: List[DeviceCreate]) -> Tuple[int, int]:
+    """
+    Insert or update a chunk of devices keyed on IP address.
+    On PostgreSQL and SQLite this is one multi-row INSERT ... ON CONFLICT on
+    the unique IP index, so concurrent imports cannot create duplicates;
+    elsewhere existing IPs are updated with one executemany UPDATE and new
+    ones inserted. Returns ``(inserted, updated)``.
+    """
+    # Later rows for the same IP win
+    by_ip: Dict[str, DeviceCreate] = {device.ip_address: device for device in devices}
+    existing = dict(
+        db.query(Device.ip_address, Device.id).filter(Device.ip_address.in_(list(by_ip))).all()
+    )
+
+    rows = [
+        {
+            "name": device.name,
+            "ip_address": ip_address,
+            "device_type": device.device_type,
+            "username": device.username,
+            "hashed_password": hash_device_password(device.password),
+            "port": device.port,
+            "protocol": device.protocol,
+        }
+        for ip_address, device in by_ip.items()
+    ]
+    dialect = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(Device).values(rows)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[Device.ip_address],
+            set_={column: statement.excluded[column] for column in rows[0] if column != "ip_address"}
+        ))
+    else:
+        updates = [{"id": existing[row["ip_address"]], **row} for row in rows if row["ip_address"] in existing]
+        inserts = [row for row in rows if row["ip_address"] not in existing]
+        if updates:
+            db.execute(update(Device), updates)
+        if inserts:
+            db.execute(insert(Device), inserts)
+    db.commit()
+
+    # Counted against the IPs known before the write; a concurrent import may have added some since
+    inserted = len(by_ip) - len(existing)
+    device_cache.invalidate(device_ids=list(existing.values()), ip_addresses=list(by_ip))
+    log_db_operation("UPSERT", "devices", f"import:{inserted}+{len(existing)}")
+    # Duplicate IPs inside the chunk were applied as updates of the earlier row
+    return inserted, len(devices) - inserted
+
+def upsert_devices_one_by_one(db: Session, devices: List[DeviceCreate]) -> Tuple[int, int, Dict[int, str]]:
+    """
+    Upsert devices one at a time, after a chunk failed as a whole, to find
+    the rows at fault. Returns ``(inserted, updated, errors by index)``.
+    """
+    inserted = updated = 0
+    errors: Dict[int, str] = {}
+    for index, device in enumerate(devices):
+        try:
+            row_inserted, row_updated = upsert_devices(db, [device])
+        except SQLAlchemyError as e:
+            db.rollback()
+            errors[index] = f"database error: {str(getattr(e, 'orig', None) or e)}"
+            continue
+        inserted += row_inserted
+        updated += row_updated
+    return inserted, updated, errors
+
+async def import_devices_stream(db: Session, chunks: AsyncIterator[bytes], format: str = "csv",
+                                chunk_size: Optional[int] = None) -> DeviceImportResult:
+    """
+    Import devices from a streamed CSV or NDJSON body.
+    Rows are validated with ``DeviceCreate`` and written in chunks, so memory
+    use depends on the chunk size rather than on the size of the upload.
+    """
+    if format not in IMPORT_FORMATS:
+        raise ValidationException(f"Unsupported import format: {format}")
+    chunk_size = chunk_size or config.DEVICE_IMPORT_CHUNK_SIZE
+    max_errors = config.DEVICE_IMPORT_MAX_ERRORS
+
+    parse = _iter_csv_records if format == "csv" else _iter_ndjson_records
+    total_rows = inserted = updated = failed = 0
+    errors: List[DeviceImportError] = []
+    batch: List[DeviceCreate] = []
+    batch_rows: List[int] = []
+
+    def reject(row_number: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < max_errors:
+            errors.append(DeviceImportError(row=row_number, error=message))
+
+    async def flush():
+        nonlocal inserted, updated
+        try:
+            chunk_inserted, chunk_updated = await run_in_threadpool(upsert_devices, db, batch)
+        except SQLAlchemyError:
+            # The chunk is rolled back as a whole; its rows are retried alone to find the bad ones
+            await run_in_threadpool(db.rollback)
+            chunk_inserted, chunk_updated, chunk_errors = await run_in_threadpool(upsert_devices_one_by_one, db, batch)
+            for index, message in chunk_errors.items():
+                reject(batch_rows[index], message)
+        inserted += chunk_inserted
+        updated += chunk_updated
+        batch.clear()
+        batch_rows.clear()
+
+    async for row_number, record in parse(_iter_lines(chunks)):
+        total_rows += 1
+        if isinstance(record, Exception):
+            reject(row_number, str(record))
+            continue
+        if not isinstance(record, dict):
+            reject(row_number, "row must be an object")
+            continue
+        try:
+            batch.append(DeviceCreate(**record))
+        except ValidationError as e:
+            reject(row_number, _validation_message(e))
+            continue
+        batch_rows.append(row_number)
+        if len(batch) >= chunk_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    return DeviceImportResult(
+        total_rows=total_rows,
+        inserted=inserted,
+        updated=updated,
+        failed=failed,
+        errors=errors,
+        errors_truncated=failed > len(errors)
+    )
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from ..utils.config import config
+from .schemas import Device, DeviceCacheStats
+
+class DeviceInventoryCache:
+    """
+    Process-local read-through cache of device records.
+
+    Entries are read-only ``Device`` schema snapshots keyed by id, with a
+    secondary IP address index. The cache is bounded (least recently used
+    entries are evicted first) and entries expire after ``ttl`` seconds.
+    Writers must call ``invalidate`` so readers never see stale rows for
+    longer than the TTL.
+    """
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size or config.DEVICE_CACHE_MAX_SIZE
+        self.ttl = ttl if ttl is not None else config.DEVICE_CACHE_TTL
+        self._entries: "OrderedDict[int, Tuple[float, Device]]" = OrderedDict()
+        self._ids_by_ip: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, device_id: Optional[int]) -> Optional[Device]:
+        entry = self._entries.get(device_id) if device_id is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, device = entry
+        if expires_at < time.monotonic():
+            self._remove(device_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(device_id)
+        self.hits += 1
+        return device
+
+    def _remove(self, device_id: int):
+        _, device = self._entries.pop(device_id)
+        if self._ids_by_ip.get(device.ip_address) == device_id:
+            del self._ids_by_ip[device.ip_address]
+
+    def get(self, device_id: int) -> Optional[Device]:
+        """
+        Return the cached device with this id, or None on a miss
+        """
+        with self._lock:
+            return self._lookup(device_id)
+
+    def get_by_ip(self, ip_address: str) -> Optional[Device]:
+        """
+        Return the cached device with this IP address, or None on a miss
+        """
+        with self._lock:
+            return self._lookup(self._ids_by_ip.get(ip_address))
+
+    def put(self, device: Device):
+        """
+        Store a device snapshot
+        """
+        with self._lock:
+            if device.id in self._entries:
+                self._remove(device.id)
+            self._entries[device.id] = (time.monotonic() + self.ttl, device)
+            self._ids_by_ip[device.ip_address] = device.id
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, device_ids: Iterable[int] = (), ip_addresses: Iterable[str] = ()):
+        """
+        Drop entries by id and/or IP address
+        """
+        with self._lock:
+            for ip_address in ip_addresses:
+                device_id = self._ids_by_ip.pop(ip_address, None)
+                if device_id in self._entries:
+                    self._remove(device_id)
+                    self.invalidations += 1
+            for device_id in device_ids:
+                if device_id in self._entries:
+                    self._remove(device_id)
+                    self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop every entry
+        """
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._ids_by_ip.clear()
+
+    def stats(self) -> DeviceCacheStats:
+        """
+        Return cache size and hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return DeviceCacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                ttl=self.ttl,
+                hits=self.hits,
+                misses=self.misses,
+                hit_ratio=self.hits / lookups if lookups else 0.0,
+                evictions=self.evictions,
+                invalidations=self.invalidations
+            )
+
+# Global instance to be used across the application
+device_cache = DeviceInventoryCache()
@@ -0,0 +1,308 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, insert
+from sqlalchemy.orm import Session
+
+from ..database.connection import SessionLocal, missing_tables
+from ..database.models import DevicePollSample, DevicePollRollup
+from ..utils.config import config
+from ..utils.logger import log_db_operation, db_logger
+from .schemas import DevicePollResult, DeviceHistory, DeviceHistoryPoint
+
+# Rollup tiers from finest to coarsest: (name, bucket width, source tier)
+ROLLUP_TIERS = [
+    ("1m", timedelta(minutes=1), "raw"),
+    ("1h", timedelta(hours=1), "1m"),
+    ("1d", timedelta(days=1), "1h"),
+]
+
+TIER_WIDTHS = {tier: width for tier, width, _ in ROLLUP_TIERS}
+TIER_SOURCES = {tier: source_tier for tier, _, source_tier in ROLLUP_TIERS}
+
+# Upper bound on buckets rolled up per tier in one maintenance pass
+MAX_BUCKETS_PER_PASS = 1440
+
+# Raw samples reach the database through the write-back buffer, so a minute
+# is only rolled up once late samples for it can no longer arrive
+RAW_SETTLE_DELAY = timedelta(seconds=30)
+
+def _retention(tier: str) -> timedelta:
+    hours = {
+        "raw": config.POLL_HISTORY_RAW_RETENTION,
+        "1m": config.POLL_HISTORY_1M_RETENTION,
+        "1h": config.POLL_HISTORY_1H_RETENTION,
+        "1d": config.POLL_HISTORY_1D_RETENTION,
+    }[tier]
+    return timedelta(hours=hours)
+
+def _utc_naive(value: datetime) -> datetime:
+    """
+    History timestamps are stored as naive UTC
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _floor(value: datetime, width: timedelta) -> datetime:
+    epoch = datetime(1970, 1, 1)
+    return epoch + ((value - epoch) // width) * width
+
+def record_poll_samples(db: Session, results: Iterable[DevicePollResult]) -> int:
+    """
+    Append poll outcomes to the raw history tier with a single multi-row INSERT.
+    Results with status "error" carry no reachability information and are skipped.
+    """
+    rows = [
+        {
+            "device_id": result.device_id,
+            "timestamp": _utc_naive(result.timestamp),
+            # The published status may be held back for confirmation; history keeps what the probe saw
+            "reachable": result.reachable if result.reachable is not None else result.status == "online",
+            "response_time": result.response_time,
+        }
+        for result in results if result.status != "error"
+    ]
+    if rows:
+        db.execute(insert(DevicePollSample), rows)
+        log_db_operation("INSERT", "device_poll_samples", f"bulk:{len(rows)}")
+    return len(rows)
+
+def _aggregate_raw(db: Session, bucket_start: datetime, bucket_end: datetime):
+    return db.query(
+        DevicePollSample.device_id,
+        func.count(),
+        func.sum(case((DevicePollSample.reachable, 1), else_=0)),
+        func.count(DevicePollSample.response_time),
+        func.sum(DevicePollSample.response_time),
+        func.min(DevicePollSample.response_time),
+        func.max(DevicePollSample.response_time),
+    ).filter(
+        DevicePollSample.timestamp >= bucket_start,
+        DevicePollSample.timestamp < bucket_end
+    ).group_by(DevicePollSample.device_id).all()
+
+def _aggregate_rollups(db: Session, source_tier: str, bucket_start: datetime, bucket_end: datetime):
+    return db.query(
+        DevicePollRollup.device_id,
+        func.sum(DevicePollRollup.sample_count),
+        func.sum(DevicePollRollup.up_count),
+        func.sum(DevicePollRollup.rtt_count),
+        func.sum(DevicePollRollup.rtt_sum),
+        func.min(DevicePollRollup.rtt_min),
+        func.max(DevicePollRollup.rtt_max),
+    ).filter(
+        DevicePollRollup.tier == source_tier,
+        DevicePollRollup.bucket_start >= bucket_start,
+        DevicePollRollup.bucket_start < bucket_end
+    ).group_by(DevicePollRollup.device_id).all()
+
+def _next_source_timestamp(db: Session, source_tier: str, after: Optional[datetime]) -> Optional[datetime]:
+    """
+    Oldest source row at or after ``after``, used to skip over gaps without data
+    """
+    if source_tier == "raw":
+        query = db.query(func.min(DevicePollSample.timestamp))
+        if after is not None:
+            query = query.filter(DevicePollSample.timestamp >= after)
+    else:
+        query = db.query(func.min(DevicePollRollup.bucket_start)).filter(DevicePollRollup.tier == source_tier)
+        if after is not None:
+            query = query.filter(DevicePollRollup.bucket_start >= after)
+    return query.scalar()
+
+def _next_bucket(db: Session, tier: str, width: timedelta) -> Optional[datetime]:
+    last_bucket = db.query(func.max(DevicePollRollup.bucket_start)).filter(DevicePollRollup.tier == tier).scalar()
+    return last_bucket + width if last_bucket is not None else None
+
+def _complete_until(db: Session, tier: str, now: datetime) -> datetime:
+    """
+    Time before which ``tier`` holds all the data it will ever have: raw samples
+    once they settled, rollups once every closed bucket has been rolled up
+    """
+    if tier == "raw":
+        return now - RAW_SETTLE_DELAY
+    width = TIER_WIDTHS[tier]
+    complete = _floor(_complete_until(db, TIER_SOURCES[tier], now), width)
+    # Source data in a closed bucket that is not rolled up yet means the tier is catching up
+    pending = _next_source_timestamp(db, TIER_SOURCES[tier], _next_bucket(db, tier, width))
+    if pending is not None and _floor(pending, width) < complete:
+        return _floor(pending, width)
+    return complete
+
+def rollup_tier(db: Session, tier: str, width: timedelta, source_tier: str, now: datetime) -> int:
+    """
+    Aggregate every closed bucket of ``tier`` that has not been rolled up yet
+    """
+    next_start = _next_bucket(db, tier, width)
+
+    # A bucket is closed once its source tier is complete up to the bucket's end,
+    # so 1h buckets wait for their last minute to settle and be rolled up as well.
+    horizon = _complete_until(db, source_tier, now)
+
+    written = 0
+    for _ in range(MAX_BUCKETS_PER_PASS):
+        source_timestamp = _next_source_timestamp(db, source_tier, next_start)
+        if source_timestamp is None:
+            break
+        bucket_start = _floor(source_timestamp, width)
+        bucket_end = bucket_start + width
+        if bucket_end > horizon:
+            break
+        if source_tier == "raw":
+            aggregates = _aggregate_raw(db, bucket_start, bucket_end)
+        else:
+            aggregates = _aggregate_rollups(db, source_tier, bucket_start, bucket_end)
+        rows = [
+            {
+                "device_id": device_id,
+                "tier": tier,
+                "bucket_start": bucket_start,
+                "sample_count": sample_count,
+                "up_count": up_count or 0,
+                "rtt_count": rtt_count or 0,
+                "rtt_sum": rtt_sum,
+                "rtt_min": rtt_min,
+                "rtt_max": rtt_max,
+            }
+            for device_id, sample_count, up_count, rtt_count, rtt_sum, rtt_min, rtt_max in aggregates
+        ]
+        if rows:
+            db.execute(insert(DevicePollRollup), rows)
+            written += len(rows)
+        next_start = bucket_end
+    if written:
+        log_db_operation("INSERT", "device_poll_rollups", f"{tier}:{written}")
+    return written
+
+def purge_expired_history(db: Session, now: datetime) -> int:
+    """
+    Delete samples and rollups older than the retention of their tier
+    """
+    removed = db.execute(
+        delete(DevicePollSample).where(DevicePollSample.timestamp < now - _retention("raw"))
+    ).rowcount or 0
+    for tier, _, _ in ROLLUP_TIERS:
+        removed += db.execute(
+            delete(DevicePollRollup).where(
+                DevicePollRollup.tier == tier,
+                DevicePollRollup.bucket_start < now - _retention(tier)
+            )
+        ).rowcount or 0
+    if removed:
+        log_db_operation("DELETE", "device_poll_history", f"expired:{removed}")
+    return removed
+
+def maintain_history(db: Session, now: Optional[datetime] = None):
+    """
+    Roll up closed buckets for every tier and apply retention
+    """
+    now = _utc_naive(now or datetime.now(timezone.utc))
+    for tier, width, source_tier in ROLLUP_TIERS:
+        rollup_tier(db, tier, width, source_tier, now)
+        db.commit()
+    purge_expired_history(db, now)
+    db.commit()
+
+async def run_history_maintenance(interval: Optional[float] = None, session_factory: Callable = SessionLocal,
+                                  should_run: Optional[Callable[[], bool]] = None):
+    """
+    Run history maintenance periodically until cancelled.
+    ``should_run`` lets only one of several poll workers do the work.
+    """
+    interval = interval or config.POLL_HISTORY_ROLLUP_INTERVAL
+
+    def maintain() -> bool:
+        db = session_factory()
+        try:
+            maintain_history(db)
+        except Exception as e:
+            db.rollback()
+            missing = missing_tables([DevicePollSample.__tablename__, DevicePollRollup.__tablename__], db.get_bind())
+            if missing:
+                db_logger.error(f"Poll history maintenance stopped: missing tables {', '.join(missing)}")
+                return False
+            db_logger.error(f"Poll history maintenance failed: {str(e)}")
+        finally:
+            db.close()
+        return True
+
+    while True:
+        if should_run is None or should_run():
+            if not await asyncio.to_thread(maintain):
+                return
+        await asyncio.sleep(interval)
+
+def _select_tier(start: datetime, end: datetime, max_points: int, now: datetime) -> str:
+    """
+    Pick the tier to read: the finest one that still retains ``start`` and
+    returns at most ``max_points`` points, otherwise the coarsest tier.
+    """
+    span = end - start
+    candidates = [("raw", timedelta(seconds=config.DEFAULT_POLLING_INTERVAL))]
+    candidates += [(tier, width) for tier, width, _ in ROLLUP_TIERS]
+    for tier, width in candidates:
+        if start >= now - _retention(tier) and span / width <= max_points:
+            return tier
+    return ROLLUP_TIERS[-1][0]
+
+def get_device_history(db: Session, device_id: int, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None, max_points: Optional[int] = None) -> DeviceHistory:
+    """
+    Get availability and RTT for a device over a time range.
+    Defaults to the last 24 hours.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    end = _utc_naive(end) if end else now
+    start = _utc_naive(start) if start else end - timedelta(hours=24)
+    max_points = max_points or config.POLL_HISTORY_MAX_POINTS
+    tier = _select_tier(start, end, max_points, now)
+
+    log_db_operation("SELECT", "device_poll_history", f"{device_id}:{tier}")
+    points: List[DeviceHistoryPoint] = []
+    total_samples = total_up = 0
+    if tier == "raw":
+        samples = db.query(DevicePollSample).filter(
+            DevicePollSample.device_id == device_id,
+            DevicePollSample.timestamp >= start,
+            DevicePollSample.timestamp < end
+        ).order_by(DevicePollSample.timestamp).all()
+        for sample in samples:
+            total_samples += 1
+            total_up += 1 if sample.reachable else 0
+            points.append(DeviceHistoryPoint(
+                timestamp=sample.timestamp,
+                samples=1,
+                uptime_percent=100.0 if sample.reachable else 0.0,
+                rtt_min=sample.response_time,
+                rtt_avg=sample.response_time,
+                rtt_max=sample.response_time
+            ))
+    else:
+        rollups = db.query(DevicePollRollup).filter(
+            DevicePollRollup.device_id == device_id,
+            DevicePollRollup.tier == tier,
+            DevicePollRollup.bucket_start >= _floor(start, TIER_WIDTHS[tier]),
+            DevicePollRollup.bucket_start < end
+        ).order_by(DevicePollRollup.bucket_start).all()
+        for rollup in rollups:
+            total_samples += rollup.sample_count
+            total_up += rollup.up_count
+            points.append(DeviceHistoryPoint(
+                timestamp=rollup.bucket_start,
+                samples=rollup.sample_count,
+                uptime_percent=100.0 * rollup.up_count / rollup.sample_count,
+                rtt_min=rollup.rtt_min,
+                rtt_avg=rollup.rtt_sum / rollup.rtt_count if rollup.rtt_count else None,
+                rtt_max=rollup.rtt_max
+            ))
+
+    return DeviceHistory(
+        device_id=device_id,
+        tier=tier,
+        start=start,
+        end=end,
+        uptime_percent=100.0 * total_up / total_samples if total_samples else None,
+        points=points
+    )
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from ..utils.config import config
+from ..utils.logger import log_network_activity
+from .probe import ProbeEngine, probe_engine
+from .schemas import DevicePollResult
+
+async def poll_fleet(targets: Iterable[Tuple[int, str, int]],
+                     device_timeout: Optional[float] = None,
+                     sweep_deadline: Optional[float] = None,
+                     engine: Optional[ProbeEngine] = None) -> Dict[int, DevicePollResult]:
+    """
+    Poll many devices concurrently.
+
+    ``targets`` is an iterable of ``(device_id, ip_address, port)`` tuples.
+    All targets are probed as one batch by the probe engine; each probe is
+    bounded by ``device_timeout`` and the whole sweep by ``sweep_deadline``.
+    Devices that were not polled before the deadline are reported with
+    status "error".
+    """
+    device_timeout = device_timeout or config.POLL_DEVICE_TIMEOUT
+    sweep_deadline = sweep_deadline or config.POLL_SWEEP_DEADLINE
+    engine = engine or probe_engine
+
+    targets = list(targets)
+    if not targets:
+        return {}
+
+    try:
+        ping_results = await engine.probe(
+            [(ip_address, port) for _, ip_address, port in targets],
+            timeout=device_timeout,
+            deadline=sweep_deadline
+        )
+    except Exception as e:
+        ping_results = {}
+        failure = f"Polling failed: {str(e)}"
+    else:
+        failure = "Polling skipped: sweep deadline exceeded"
+
+    results = {}
+    for device_id, ip_address, _ in targets:
+        ping_result = ping_results.get(ip_address)
+        if ping_result is None:
+            log_network_activity("poll", ip_address, "error", device_id)
+            results[device_id] = DevicePollResult(
+                device_id=device_id,
+                status="error",
+                message=failure,
+                timestamp=datetime.now(timezone.utc)
+            )
+            continue
+
+        status = "online" if ping_result.reachable else "offline"
+        log_network_activity("poll", ip_address, status, device_id)
+        results[device_id] = DevicePollResult(
+            device_id=device_id,
+            status=status,
+            message="Device is online" if ping_result.reachable else "Device is offline",
+            timestamp=datetime.now(timezone.utc),
+            response_time=ping_result.response_time,
+            reachable=ping_result.reachable
+        )
+    return results
@@ -0,0 +1,245 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..utils.config import config
+from ..utils.logger import network_logger, log_network_activity
+from .schemas import DevicePingResult
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+MAX_SEQUENCE = 0xFFFF
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+SEND_BURST = 64  # echo requests sent before yielding to the reply reader
+
+def _checksum(data: bytes) -> int:
+    """
+    RFC 1071 internet checksum
+    """
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _build_echo_request(identifier: int, sequence: int) -> bytes:
+    """
+    Build an ICMP echo request packet
+    """
+    payload = b"netauto-probe".ljust(16, b"\x00")
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence) + payload
+
+def _is_ipv4(address: str) -> bool:
+    try:
+        return isinstance(ipaddress.ip_address(address), ipaddress.IPv4Address)
+    except ValueError:
+        return False
+
+class ProbeEngine:
+    """
+    Batch reachability prober.
+
+    Echo requests for a whole batch of targets are sent over a single ICMP
+    socket and replies are matched back by identifier/sequence, so RTTs are
+    measured from send to receive without any process startup in between.
+    A raw socket is used when the process is privileged, otherwise an
+    unprivileged datagram ICMP socket. If neither is available (or the target
+    is not an IPv4 address) a TCP connect to the management port is used.
+    """
+    def __init__(self, timeout: float = 2.0, tcp_concurrency: Optional[int] = None):
+        self.timeout = timeout
+        self.tcp_concurrency = tcp_concurrency or config.MAX_CONCURRENT_CONNECTIONS
+        self._icmp_mode = None  # "raw", "dgram" or "tcp" once detected
+
+    def _open_icmp_socket(self) -> Tuple[Optional[socket.socket], str]:
+        """
+        Open the best ICMP socket the process is allowed to use
+        """
+        if self._icmp_mode != "tcp":
+            for mode, sock_type in (("raw", socket.SOCK_RAW), ("dgram", socket.SOCK_DGRAM)):
+                if self._icmp_mode not in (None, mode):
+                    continue
+                try:
+                    sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+                except OSError:
+                    continue
+                sock.setblocking(False)
+                try:
+                    # Replies for a large batch arrive in a burst
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+                except OSError:
+                    pass
+                if mode == "dgram":
+                    # The kernel rewrites the echo identifier to the socket's local port
+                    sock.bind(("0.0.0.0", 0))
+                if self._icmp_mode is None:
+                    network_logger.info(f"Probe engine using {mode} ICMP sockets")
+                self._icmp_mode = mode
+                return sock, mode
+            network_logger.info("Probe engine falling back to TCP connect probes")
+            self._icmp_mode = "tcp"
+        return None, "tcp"
+
+    async def probe(self, targets: Iterable[Tuple[str, int]],
+                    timeout: Optional[float] = None,
+                    deadline: Optional[float] = None) -> Dict[str, DevicePingResult]:
+        """
+        Probe ``(ip_address, port)`` targets and return results keyed by IP address.
+
+        ``timeout`` bounds each individual probe. When ``deadline`` is given,
+        targets that could not be probed within that many seconds are left
+        out of the result.
+        """
+        timeout = timeout or self.timeout
+        started_at = time.monotonic()
+        targets = list(dict(targets).items())  # de-duplicate by IP address
+
+        icmp_targets = [target for target in targets if _is_ipv4(target[0])]
+        tcp_targets = [target for target in targets if not _is_ipv4(target[0])]
+        results = {}
+
+        sock, mode = self._open_icmp_socket() if icmp_targets else (None, "tcp")
+        if sock is None:
+            tcp_targets.extend(icmp_targets)
+        else:
+            try:
+                # Sequence numbers are 16 bits wide, so very large batches go out in chunks
+                for start in range(0, len(icmp_targets), MAX_SEQUENCE):
+                    chunk = [ip for ip, _ in icmp_targets[start:start + MAX_SEQUENCE]]
+                    icmp_timeout = timeout if deadline is None else min(timeout, deadline - (time.monotonic() - started_at))
+                    if icmp_timeout <= 0:
+                        break
+                    results.update(await self._probe_icmp(sock, mode, chunk, icmp_timeout))
+            finally:
+                sock.close()
+
+        if tcp_targets:
+            remaining = None if deadline is None else max(0, deadline - (time.monotonic() - started_at))
+            results.update(await self._probe_tcp(tcp_targets, timeout, remaining))
+
+        for ip_address, result in results.items():
+            log_network_activity("ping", ip_address, "success" if result.reachable else "failure")
+        return results
+
+    async def _probe_icmp(self, sock: socket.socket, mode: str, addresses: List[str],
+                          timeout: float) -> Dict[str, DevicePingResult]:
+        """
+        Send one echo request per address over ``sock`` and collect the replies
+        """
+        loop = asyncio.get_running_loop()
+        if mode == "dgram":
+            identifier = sock.getsockname()[1]
+        else:
+            identifier = (os.getpid() ^ id(sock)) & 0xFFFF
+
+        pending = {}  # sequence -> (ip_address, send time, future)
+
+        def on_readable():
+            while True:
+                try:
+                    packet, (source, _) = sock.recvfrom(1024)
+                except (BlockingIOError, InterruptedError):
+                    return
+                except OSError:
+                    return
+                received_at = time.perf_counter()
+                if mode == "raw":
+                    packet = packet[(packet[0] & 0x0F) * 4:]  # strip the IP header
+                if len(packet) < 8:
+                    continue
+                icmp_type, _, _, reply_id, sequence = struct.unpack("!BBHHH", packet[:8])
+                if icmp_type != ICMP_ECHO_REPLY or (mode == "raw" and reply_id != identifier):
+                    continue
+                entry = pending.get(sequence)
+                if entry is None or entry[0] != source or entry[2].done():
+                    continue
+                entry[2].set_result((received_at - entry[1]) * 1000)  # in milliseconds
+
+        loop.add_reader(sock.fileno(), on_readable)
+        try:
+            for sequence, ip_address in enumerate(addresses):
+                future = loop.create_future()
+                pending[sequence] = (ip_address, time.perf_counter(), future)
+                try:
+                    await loop.sock_sendto(sock, _build_echo_request(identifier, sequence), (ip_address, 0))
+                except OSError as e:
+                    future.set_exception(e)
+                if sequence % SEND_BURST == SEND_BURST - 1:
+                    await asyncio.sleep(0)
+
+            futures = [entry[2] for entry in pending.values()]
+            if futures:
+                await asyncio.wait(futures, timeout=timeout)
+        finally:
+            loop.remove_reader(sock.fileno())
+
+        results = {}
+        for ip_address, _, future in pending.values():
+            if future.done() and future.exception() is None:
+                results[ip_address] = DevicePingResult(
+                    ip_address=ip_address,
+                    reachable=True,
+                    response_time=future.result(),
+                    message="Device is reachable via ICMP."
+                )
+            else:
+                if not future.done():
+                    future.cancel()
+                    reason = f"no echo reply within {timeout}s"
+                else:
+                    reason = str(future.exception())
+                results[ip_address] = DevicePingResult(
+                    ip_address=ip_address,
+                    reachable=False,
+                    response_time=None,
+                    message=f"Device not reachable. Reason: {reason}"
+                )
+        return results
+
+    async def _probe_tcp(self, targets: List[Tuple[str, int]], timeout: float,
+                         deadline: Optional[float] = None) -> Dict[str, DevicePingResult]:
+        """
+        Probe targets by opening a TCP connection to their management port
+        """
+        semaphore = asyncio.Semaphore(self.tcp_concurrency)
+
+        async def connect(ip_address: str, port: int) -> DevicePingResult:
+            async with semaphore:
+                start_time = time.perf_counter()
+                try:
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(ip_address, port), timeout)
+                    writer.close()
+                except ConnectionRefusedError:
+                    # A reset still proves the host is up
+                    pass
+                except (asyncio.TimeoutError, OSError) as e:
+                    return DevicePingResult(
+                        ip_address=ip_address,
+                        reachable=False,
+                        response_time=None,
+                        message=f"Device not reachable. Reason: {str(e) or 'TCP connect timed out'}"
+                    )
+                return DevicePingResult(
+                    ip_address=ip_address,
+                    reachable=True,
+                    response_time=(time.perf_counter() - start_time) * 1000,
+                    message=f"Device is reachable via TCP port {port}."
+                )
+
+        tasks = [asyncio.ensure_future(connect(ip_address, port)) for ip_address, port in targets]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        return {task.result().ip_address: task.result() for task in done}
+
+# Global instance to be used across the application
+probe_engine = ProbeEngine(timeout=config.POLL_DEVICE_TIMEOUT)
@@ -1,25 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 from ..database.connection import get_db
 from ..utils.logger import log_api_request
-from ..utils.exceptions import DeviceNotFoundException, DeviceConnectionException
-from .schemas import Device, DeviceCreate, DeviceUpdate, DeviceTestConnection, DevicePingResult, DevicePollResult, DevicesPollResult
-from .service import get_device, get_devices, create_device, update_device, delete_device, ping_device_for_endpoint, poll_device, poll_all_devices
+from ..utils.exceptions import DeviceNotFoundException, DeviceConnectionException, ValidationException
+from .schemas import Device, DeviceCreate, DeviceUpdate, DeviceTestConnection, DevicePingResult, DevicePollResult, DevicesPollResult, DeviceHistory, DeviceFilter, DevicePage, DeviceImportResult, DeviceCacheStats
+from .service import get_device, get_device_cached, get_devices, get_devices_page, create_device, update_device, delete_device, ping_device, ping_device_for_endpoint, poll_device, poll_all_devices
+from .history import get_device_history
+from .bulk_import import import_devices_stream
+from .cache import device_cache
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Device])
-def read_devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_devices(skip: int = 0, limit: int = 100, filters: DeviceFilter = Depends(), db: Session = Depends(get_db)):
     """
     Retrieve all devices
     """
 
-    devices = get_devices(db, skip=skip, limit=limit)
+    devices = get_devices(db, skip=skip, limit=limit, filters=filters)
     log_api_request("GET", "/devices/", status.HTTP_200_OK)
     return devices
 
+@router.get("/page", response_model=DevicePage)
+def read_devices_page(limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None, order_by: str = "id",
+                      filters: DeviceFilter = Depends(), db: Session = Depends(get_db)):
+    """
+    Retrieve one page of devices using cursor-based pagination
+    """
+
+    try:
+        page = get_devices_page(db, limit=limit, cursor=cursor, order_by=order_by, filters=filters)
+        log_api_request("GET", "/devices/page", status.HTTP_200_OK)
+        return page
+    except ValidationException as e:
+        log_api_request("GET", "/devices/page", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/cache/stats", response_model=DeviceCacheStats)
+def read_device_cache_stats():
+    """
+    Retrieve device inventory cache statistics
+    """
+
+    log_api_request("GET", "/devices/cache/stats", status.HTTP_200_OK)
+    return device_cache.stats()
+
 @router.get("/{device_id}", response_model=Device)
 def read_device(device_id: int, db: Session = Depends(get_db)):
     """
@@ -27,7 +55,7 @@ def read_device(device_id: int, db: Session = Depends(get_db)):
     """
 
     try:
-        device = get_device(db, device_id)
+        device = get_device_cached(db, device_id)
         log_api_request("GET", f"/devices/{device_id}", status.HTTP_200_OK, device_id)
         return device
     except DeviceNotFoundException as e:
@@ -48,6 +76,39 @@ def create_new_device(device: DeviceCreate, db: Session = Depends(get_db)):
         log_api_request("POST", "/devices/", status.HTTP_400_BAD_REQUEST)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+@router.get("/{device_id}/history", response_model=DeviceHistory)
+def read_device_history(device_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        max_points: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Retrieve availability and RTT history for a device
+    """
+
+    try:
+        get_device_cached(db, device_id)
+        history = get_device_history(db, device_id, start=start, end=end, max_points=max_points)
+        log_api_request("GET", f"/devices/{device_id}/history", status.HTTP_200_OK, device_id)
+        return history
+    except DeviceNotFoundException as e:
+        log_api_request("GET", f"/devices/{device_id}/history", status.HTTP_404_NOT_FOUND, device_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.post("/import", response_model=DeviceImportResult)
+async def import_devices(request: Request, format: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Bulk import devices from a streamed CSV or NDJSON body, upserting on IP address
+    """
+
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    try:
+        result = await import_devices_stream(db, request.stream(), format=format)
+        log_api_request("POST", "/devices/import", status.HTTP_200_OK)
+        return result
+    except ValidationException as e:
+        log_api_request("POST", "/devices/import", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 @router.put("/{device_id}", response_model=Device)
 def update_existing_device(device_id: int, device: DeviceUpdate, db: Session = Depends(get_db)):
     """
@@ -99,19 +160,6 @@ def poll_multiple_devices(db: Session = Depends(get_db)):
     Poll all devices to check their status
     """
 
-@router.post("/{device_id}/ping", response_model=DevicePingResult)
-def ping_single_device(device_id: int, db: Session = Depends(get_db)):
-    """
-    Ping a single device to check its reachability
-    """
-    try:
-        result = ping_device_for_endpoint(db, device_id)
-        log_api_request("POST", f"/devices/{device_id}/ping", status.HTTP_200_OK, device_id)
-        return result
-    except DeviceNotFoundException as e:
-        log_api_request("POST", f"/devices/{device_id}/ping", status.HTTP_404_NOT_FOUND, device_id)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
-
     try:
         results = poll_all_devices(db)
         successful_polls = sum(1 for result in results if result.status == "online")
@@ -130,6 +178,19 @@ def ping_single_device(device_id: int, db: Session = Depends(get_db)):
         log_api_request("POST", "/devices/poll", status.HTTP_500_INTERNAL_SERVER_ERROR)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.post("/{device_id}/ping", response_model=DevicePingResult)
+def ping_single_device(device_id: int, db: Session = Depends(get_db)):
+    """
+    Ping a single device to check its reachability
+    """
+    try:
+        result = ping_device_for_endpoint(db, device_id)
+        log_api_request("POST", f"/devices/{device_id}/ping", status.HTTP_200_OK, device_id)
+        return result
+    except DeviceNotFoundException as e:
+        log_api_request("POST", f"/devices/{device_id}/ping", status.HTTP_404_NOT_FOUND, device_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
 @router.post("/ping", response_model=DevicePingResult)
 def ping_single_device(ping_request: DeviceTestConnection):
     """
@@ -151,8 +212,8 @@ def test_device_connection(device_id: int, db: Session = Depends(get_db)):
     """
 
     try:
-        device = get_device(db, device_id)
-        result = ping_device(device.ip_address)
+        device = get_device_cached(db, device_id)
+        result = ping_device(device.ip_address, port=device.port)
         log_api_request("POST", f"/devices/{device_id}/test-connection", status.HTTP_200_OK, device_id)
         return result
     except DeviceNotFoundException as e:
@@ -0,0 +1,274 @@
+import asyncio
+import heapq
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..database.connection import SessionLocal, missing_tables
+from ..database.models import Device, DevicePollRollup, DevicePollSample, PollLease, PollWorker
+from ..utils.config import config
+from ..utils.logger import log_db_operation, network_logger
+from .adaptive import AdaptivePollPolicy, adaptive_policy
+from .history import run_history_maintenance
+from .poller import poll_fleet
+from .schemas import DevicePollResult
+from .sharding import ShardLeaseManager
+from .writeback import StatusWriteBack, status_writeback
+
+class PollScheduler:
+    """
+    Background scheduler that keeps device status fresh.
+
+    Every device has a next-due time in a min-heap. Due devices are polled in
+    batches through the fleet poller, with at most ``max_in_flight`` devices
+    being probed at any moment, and rescheduled after the interval chosen by
+    the adaptive policy (backed off for dead devices, short for devices
+    awaiting confirmation of a status change) with random jitter so polls
+    stay spread out instead of bunching up.
+    Results are handed to subscribers and buffered in the status write-back,
+    which flushes them to the database in bulk.
+
+    With sharding enabled, several scheduler processes split the inventory
+    through shard leases and each one only polls devices in the shards it
+    currently holds.
+    """
+    def __init__(self, interval: Optional[float] = None, jitter: Optional[float] = None,
+                 max_in_flight: Optional[int] = None, refresh_interval: Optional[float] = None,
+                 session_factory: Callable = SessionLocal, writeback: Optional[StatusWriteBack] = None,
+                 policy: Optional[AdaptivePollPolicy] = None, sharding: Optional[bool] = None,
+                 leases: Optional[ShardLeaseManager] = None):
+        self.interval = interval or config.DEFAULT_POLLING_INTERVAL
+        self.jitter = config.POLL_SCHEDULER_JITTER if jitter is None else jitter
+        self.max_in_flight = max_in_flight or config.POLL_SCHEDULER_MAX_IN_FLIGHT
+        self.refresh_interval = refresh_interval or config.POLL_INVENTORY_REFRESH
+        self.session_factory = session_factory
+        self.writeback = writeback or status_writeback
+        # The shared policy is based on the configured interval; a scheduler with its own interval gets its own
+        self.policy = policy or (adaptive_policy if interval is None else AdaptivePollPolicy(base_interval=self.interval))
+        self.sharding = config.POLL_SHARDING_ENABLED if sharding is None else sharding
+        self.leases = leases
+
+        self.latest_results: Dict[int, DevicePollResult] = {}
+        self._subscribers: List[Callable[[List[DevicePollResult]], None]] = []
+        self._inventory: Dict[int, Tuple[str, int]] = {}  # device id -> (ip address, port)
+        self._heap: List[Tuple[float, int]] = []
+        self._scheduled = set()
+        self._slots = None
+        self._batches = set()
+        self._task = None
+        self._writeback_task = None
+        self._history_task = None
+
+    def subscribe(self, callback: Callable[[List[DevicePollResult]], None]):
+        """
+        Register a callback that receives every batch of poll results
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[List[DevicePollResult]], None]):
+        """
+        Remove a previously registered callback
+        """
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """
+        Start the scheduler on the running event loop
+        """
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+            network_logger.info(f"Poll scheduler started with a {self.interval}s interval")
+
+    async def stop(self):
+        """
+        Stop the scheduler and wait for in-flight batches to be cancelled
+        """
+        tasks = list(self._batches)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._history_task is not None:
+            self._history_task.cancel()
+            await asyncio.gather(self._history_task, return_exceptions=True)
+        if self._writeback_task is not None:
+            # Cancelling the write-back makes it flush what is still buffered
+            self._writeback_task.cancel()
+            await asyncio.gather(self._writeback_task, return_exceptions=True)
+        if self.leases is not None:
+            await asyncio.to_thread(self.leases.release_all)
+        self._task = None
+        self._writeback_task = None
+        self._history_task = None
+        network_logger.info("Poll scheduler stopped")
+
+    def _next_due(self, now: float, interval: Optional[float] = None) -> float:
+        interval = interval or self.interval
+        spread = interval * self.jitter
+        return now + interval + random.uniform(-spread, spread)
+
+    def _runs_maintenance(self) -> bool:
+        # With sharding, the holder of shard 0 maintains the shared history tables
+        return self.leases is None or 0 in self.leases.owned_shards
+
+    def _missing_tables(self) -> List[str]:
+        models = [Device, DevicePollSample, DevicePollRollup]
+        if self.sharding:
+            models += [PollLease, PollWorker]
+        db = self.session_factory()
+        try:
+            return missing_tables([model.__tablename__ for model in models], db.get_bind())
+        finally:
+            db.close()
+
+    def _load_inventory(self) -> Dict[int, Tuple[str, int]]:
+        db = self.session_factory()
+        try:
+            log_db_operation("SELECT", "devices", "scheduler")
+            query = db.query(Device.id, Device.ip_address, Device.port)
+            if self.leases is not None:
+                shards = self.leases.owned_shards
+                if not shards:
+                    return {}
+                query = query.filter((Device.id % self.leases.shard_count).in_(shards))
+            rows = query.all()
+            return {device_id: (ip_address, port) for device_id, ip_address, port in rows}
+        finally:
+            db.close()
+
+    async def refresh_inventory(self):
+        """
+        Reload the device list, scheduling new devices at a random offset within one interval
+        """
+        self._inventory = await asyncio.to_thread(self._load_inventory)
+        self.policy.forget([device_id for device_id in self.policy.known_devices() if device_id not in self._inventory])
+        now = time.monotonic()
+        for device_id in self._inventory:
+            if device_id not in self._scheduled:
+                heapq.heappush(self._heap, (now + random.uniform(0, self.interval), device_id))
+                self._scheduled.add(device_id)
+
+    async def _poll_batch(self, targets: List[Tuple[int, str, int]]):
+        intervals: Dict[int, float] = {}
+        try:
+            results = []
+            for result in (await poll_fleet(targets)).values():
+                result, intervals[result.device_id] = self.policy.observe(result)
+                results.append(result)
+            self.publish(results)
+            await self.writeback.submit_async(results)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            network_logger.error(f"Scheduled poll batch failed: {str(e)}")
+        finally:
+            now = time.monotonic()
+            for device_id, _, _ in targets:
+                if device_id in self._inventory:
+                    heapq.heappush(self._heap, (self._next_due(now, intervals.get(device_id)), device_id))
+                else:
+                    self._scheduled.discard(device_id)
+            self._slots.release(len(targets))
+
+    def publish(self, results: List[DevicePollResult]):
+        """
+        Record results and notify subscribers
+        """
+        for result in results:
+            self.latest_results[result.device_id] = result
+        for callback in list(self._subscribers):
+            try:
+                callback(results)
+            except Exception as e:
+                network_logger.error(f"Poll result subscriber failed: {str(e)}")
+
+    async def run(self):
+        """
+        Main scheduling loop
+        """
+        # Without its tables every poll and maintenance run would fail, once per interval
+        missing = await asyncio.to_thread(self._missing_tables)
+        if missing:
+            network_logger.error(
+                f"Poll scheduler not started: missing tables {', '.join(missing)}; run init_db.py to create them"
+            )
+            return
+        self._slots = _CountingSlots(self.max_in_flight)
+        if self.sharding and self.leases is None:
+            # Created here rather than at import so every worker process gets its own id
+            self.leases = ShardLeaseManager(session_factory=self.session_factory)
+        self._writeback_task = asyncio.get_running_loop().create_task(self.writeback.run())
+        self._history_task = asyncio.get_running_loop().create_task(
+            run_history_maintenance(session_factory=self.session_factory, should_run=self._runs_maintenance)
+        )
+        next_refresh = 0.0
+        next_lease_sync = 0.0
+        while True:
+            now = time.monotonic()
+            if self.leases is not None and now >= next_lease_sync:
+                if await asyncio.to_thread(self.leases.sync):
+                    # Pick up newly claimed shards and drop released ones right away
+                    next_refresh = now
+                next_lease_sync = now + self.leases.heartbeat_interval
+            if now >= next_refresh:
+                try:
+                    await self.refresh_inventory()
+                except Exception as e:
+                    network_logger.error(f"Poll scheduler could not load devices: {str(e)}")
+                next_refresh = now + self.refresh_interval
+
+            batch = []
+            while self._heap and self._heap[0][0] <= now and self._slots.available > len(batch):
+                _, device_id = heapq.heappop(self._heap)
+                target = self._inventory.get(device_id)
+                if target is None or (self.leases is not None and not self.leases.owns(device_id)):
+                    # Device was deleted or its shard was handed over since it was scheduled
+                    self._scheduled.discard(device_id)
+                    continue
+                batch.append((device_id, target[0], target[1]))
+
+            if batch:
+                self._slots.take(len(batch))
+                task = asyncio.get_running_loop().create_task(self._poll_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+
+            if self._heap and self._heap[0][0] <= now and self._slots.available:
+                continue
+            sleep_until = next_refresh
+            if self.leases is not None:
+                sleep_until = min(sleep_until, next_lease_sync)
+            if self._heap:
+                sleep_until = min(sleep_until, self._heap[0][0])
+            await self._slots.wait(max(0.05, sleep_until - time.monotonic()))
+
+class _CountingSlots:
+    """
+    Counts free in-flight slots and wakes the scheduler when some are released
+    """
+    def __init__(self, total: int):
+        self.available = total
+        self._released = asyncio.Event()
+
+    def take(self, count: int):
+        self.available -= count
+
+    def release(self, count: int):
+        self.available += count
+        self._released.set()
+
+    async def wait(self, timeout: float):
+        self._released.clear()
+        try:
+            await asyncio.wait_for(self._released.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+# Global instance started from the application startup hook
+poll_scheduler = PollScheduler()
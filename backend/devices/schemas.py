@@ -49,6 +49,33 @@ class Device(DeviceInDBBase):
     """
     pass
 
+class DeviceFilter(BaseModel):
+    """
+    Schema for server-side device list filters
+    """
+    status: Optional[str] = Field(None, example="online")
+    device_type: Optional[str] = Field(None, example="ios")
+    protocol: Optional[str] = Field(None, example="ssh")
+    owner_id: Optional[int] = Field(None, example=1)
+    name_prefix: Optional[str] = Field(None, example="Router R1")
+    ip_prefix: Optional[str] = Field(None, example="192.168.1.")
+
+class DeviceCountEstimate(BaseModel):
+    """
+    Schema for an estimated row count
+    """
+    value: int
+    exact: bool
+
+class DevicePage(BaseModel):
+    """
+    Schema for one page of a keyset-paginated device listing
+    """
+    items: List[Device]
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to fetch the next page; null on the last page")
+    total_estimate: int
+    total_is_exact: bool = False
+
 class DeviceInDB(DeviceInDBBase):
     """
     Schema for device information in database with hashed password
@@ -82,6 +109,9 @@ class DevicePollResult(BaseModel):
     status: str
     message: str
     timestamp: datetime
+    response_time: Optional[float] = None
+    reachable: Optional[bool] = None
+    flapping: bool = False  # changed state too often lately; status is the last confirmed one
 
 class DevicesPollResult(BaseModel):
     """
@@ -96,4 +126,57 @@ class DeviceStatusUpdate(BaseModel):
     """
     Schema for updating device status
     """
-    status: str = Field(..., example="online", description="Device status: online, offline, error")
\ No newline at end of file
+    status: str = Field(..., example="online", description="Device status: online, offline, error")
+
+class DeviceImportError(BaseModel):
+    """
+    Schema for a row rejected by a bulk import
+    """
+    row: int = Field(..., description="1-based data row number, not counting the CSV header")
+    error: str
+
+class DeviceImportResult(BaseModel):
+    """
+    Schema for the outcome of a bulk device import
+    """
+    total_rows: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[DeviceImportError]
+    errors_truncated: bool = False
+
+class DeviceCacheStats(BaseModel):
+    """
+    Schema for device inventory cache statistics
+    """
+    size: int
+    max_size: int
+    ttl: float
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+class DeviceHistoryPoint(BaseModel):
+    """
+    Schema for one point of a device availability series
+    """
+    timestamp: datetime
+    samples: int
+    uptime_percent: float
+    rtt_min: Optional[float] = None
+    rtt_avg: Optional[float] = None
+    rtt_max: Optional[float] = None
+
+class DeviceHistory(BaseModel):
+    """
+    Schema for device availability over a time range
+    """
+    device_id: int
+    tier: str = Field(..., example="1h", description="Resolution the series was read from: raw, 1m, 1h, 1d")
+    start: datetime
+    end: datetime
+    uptime_percent: Optional[float] = None
+    points: List[DeviceHistoryPoint]
\ No newline at end of file
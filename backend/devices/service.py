@@ -1,12 +1,20 @@
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
-from typing import List, Optional
-import subprocess
-import time
+from typing import Iterable, List, Optional
+import asyncio
+import base64
+import json
 import socket
+from datetime import datetime, timezone
 from ..database.models import Device
 from ..utils.logger import log_db_operation, log_network_activity
-from ..utils.exceptions import DeviceNotFoundException, DeviceConnectionException
-from .schemas import DeviceCreate, DeviceUpdate, DevicePingResult, DevicePollResult
+from ..utils.exceptions import DeviceNotFoundException, DeviceConnectionException, ValidationException
+from .schemas import Device as DeviceSchema, DeviceCreate, DeviceUpdate, DevicePingResult, DevicePollResult, DeviceFilter, DevicePage, DeviceCountEstimate
+from .adaptive import poll_with_confirmation
+from .probe import probe_engine
+from .writeback import bulk_update_status, known_device_results
+from .history import record_poll_samples
+from .cache import device_cache
 from ..utils.config import config
 import hashlib
 
@@ -20,6 +28,26 @@ def get_device(db: Session, device_id: int) -> Device:
         raise DeviceNotFoundException(f"Device with ID {device_id} not found")
     return device
 
+def get_device_cached(db: Session, device_id: int) -> DeviceSchema:
+    """
+    Get a read-only device snapshot by ID through the inventory cache
+    """
+    device = device_cache.get(device_id)
+    if device is None:
+        device = DeviceSchema.model_validate(get_device(db, device_id))
+        device_cache.put(device)
+    return device
+
+def get_device_by_ip_cached(db: Session, ip_address: str) -> DeviceSchema:
+    """
+    Get a read-only device snapshot by IP address through the inventory cache
+    """
+    device = device_cache.get_by_ip(ip_address)
+    if device is None:
+        device = DeviceSchema.model_validate(get_device_by_ip(db, ip_address))
+        device_cache.put(device)
+    return device
+
 def get_device_by_ip(db: Session, ip_address: str) -> Device:
     """
     Get a device by IP address
@@ -30,19 +58,130 @@ def get_device_by_ip(db: Session, ip_address: str) -> Device:
         raise DeviceNotFoundException(f"Device with IP {ip_address} not found")
     return device
 
-def get_devices(db: Session, skip: int = 0, limit: int = 100) -> List[Device]:
+def _prefix_upper_bound(prefix: str) -> str:
+    """
+    Smallest string greater than every string starting with ``prefix``
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def filter_devices(query, filters: Optional[DeviceFilter] = None):
+    """
+    Apply server-side device filters to a query.
+    Prefix filters are expressed as ranges so they can use plain b-tree indexes.
+    """
+    if filters is None:
+        return query
+    if filters.status is not None:
+        query = query.filter(Device.status == filters.status)
+    if filters.device_type is not None:
+        query = query.filter(Device.device_type == filters.device_type)
+    if filters.protocol is not None:
+        query = query.filter(Device.protocol == filters.protocol)
+    if filters.owner_id is not None:
+        query = query.filter(Device.owner_id == filters.owner_id)
+    if filters.name_prefix:
+        query = query.filter(Device.name >= filters.name_prefix, Device.name < _prefix_upper_bound(filters.name_prefix))
+    if filters.ip_prefix:
+        query = query.filter(Device.ip_address >= filters.ip_prefix, Device.ip_address < _prefix_upper_bound(filters.ip_prefix))
+    return query
+
+def get_devices(db: Session, skip: int = 0, limit: int = 100, filters: Optional[DeviceFilter] = None) -> List[Device]:
     """
     Get all devices with pagination
     """
     log_db_operation("SELECT", "devices", "all")
-    return db.query(Device).offset(skip).limit(limit).all()
+    query = filter_devices(db.query(Device), filters)
+    return query.order_by(Device.id).offset(skip).limit(limit).all()
+
+def _encode_cursor(order_by: str, device: Device) -> str:
+    # A device without a name is encoded with a null key; such devices sort after all named ones
+    key = device.name if order_by == "name" else None
+    payload = json.dumps([order_by, key, device.id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def _decode_cursor(cursor: str, order_by: str):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, key, device_id = json.loads(payload)
+    except (ValueError, TypeError) as e:
+        raise ValidationException(f"Invalid cursor: {str(e)}")
+    if cursor_order != order_by:
+        raise ValidationException("Cursor was issued for a different sort order")
+    return key, int(device_id)
+
+def estimate_device_count(db: Session, query) -> DeviceCountEstimate:
+    """
+    Estimate how many devices a query matches without a full COUNT(*).
+    PostgreSQL answers from planner statistics, explaining the query with
+    its filter values passed as bound parameters; other databases count at
+    most DEVICE_COUNT_ESTIMATE_CAP rows.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        statement = query.statement.compile(db.get_bind(), compile_kwargs={"render_postcompile": True})
+        plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", statement.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return DeviceCountEstimate(value=int(plan[0]["Plan"]["Plan Rows"]), exact=False)
+
+    cap = config.DEVICE_COUNT_ESTIMATE_CAP
+    bounded = query.with_entities(Device.id).order_by(None).limit(cap + 1).subquery()
+    count = db.query(func.count()).select_from(bounded).scalar()
+    return DeviceCountEstimate(value=min(count, cap), exact=count <= cap)
+
+def get_devices_page(db: Session, limit: int = 100, cursor: Optional[str] = None, order_by: str = "id",
+                     filters: Optional[DeviceFilter] = None) -> DevicePage:
+    """
+    Get one page of devices using keyset pagination.
+    Pages are ordered by ``id`` or by ``(name, id)`` with unnamed devices
+    last, and continue after the row encoded in ``cursor``, so deep pages
+    cost the same as the first one.
+    """
+    if order_by not in ("id", "name"):
+        raise ValidationException(f"Unsupported sort order: {order_by}")
+
+    log_db_operation("SELECT", "devices", "page")
+    query = filter_devices(db.query(Device), filters)
+    total = estimate_device_count(db, query)
+
+    if cursor:
+        key, last_id = _decode_cursor(cursor, order_by)
+        if order_by == "name" and key is None:
+            query = query.filter(Device.name.is_(None), Device.id > last_id)
+        elif order_by == "name":
+            query = query.filter(or_(
+                Device.name > key, and_(Device.name == key, Device.id > last_id), Device.name.is_(None)
+            ))
+        else:
+            query = query.filter(Device.id > last_id)
+    if order_by == "name":
+        # NULLS LAST is PostgreSQL's default ascending order, so ix_devices_name_id still serves it
+        query = query.order_by(Device.name.asc().nulls_last(), Device.id)
+    else:
+        query = query.order_by(Device.id)
+
+    # Fetch one extra row to know whether another page follows
+    devices = query.limit(limit + 1).all()
+    next_cursor = _encode_cursor(order_by, devices[limit - 1]) if len(devices) > limit else None
+
+    return DevicePage(
+        items=devices[:limit],
+        next_cursor=next_cursor,
+        total_estimate=total.value,
+        total_is_exact=total.exact
+    )
+
+def hash_device_password(password: str) -> str:
+    """
+    Hash a device password for storage
+    """
+    return hashlib.sha256(password.encode()).hexdigest()
 
 def create_device(db: Session, device: DeviceCreate) -> Device:
     """
     Create a new device
     """
     # Hash the password
-    hashed_password = hashlib.sha256(device.password.encode()).hexdigest()
+    hashed_password = hash_device_password(device.password)
     
     # Create device object
     db_device = Device(
@@ -60,6 +199,7 @@ def create_device(db: Session, device: DeviceCreate) -> Device:
     db.commit()
     db.refresh(db_device)
     
+    device_cache.invalidate(ip_addresses=[db_device.ip_address])
     log_db_operation("INSERT", "devices", db_device.id)
     
     return db_device
@@ -69,6 +209,7 @@ def update_device(db: Session, device_id: int, device: DeviceUpdate) -> Device:
     Update a device
     """
     db_device = get_device(db, device_id)
+    previous_ip = db_device.ip_address
     
     # Update fields if provided
     if device.name is not None:
@@ -81,7 +222,7 @@ def update_device(db: Session, device_id: int, device: DeviceUpdate) -> Device:
         db_device.username = device.username
     if device.password is not None:
         # Hash the new password
-        db_device.hashed_password = hashlib.sha256(device.password.encode()).hexdigest()
+        db_device.hashed_password = hash_device_password(device.password)
     if device.port is not None:
         db_device.port = device.port
     if device.protocol is not None:
@@ -91,6 +232,7 @@ def update_device(db: Session, device_id: int, device: DeviceUpdate) -> Device:
     db.commit()
     db.refresh(db_device)
     
+    device_cache.invalidate(device_ids=[device_id], ip_addresses=[previous_ip, db_device.ip_address])
     log_db_operation("UPDATE", "devices", device_id)
     
     return db_device
@@ -105,44 +247,20 @@ def delete_device(db: Session, device_id: int) -> bool:
     db.delete(db_device)
     db.commit()
     
+    device_cache.invalidate(device_ids=[device_id], ip_addresses=[db_device.ip_address])
+    
     log_db_operation("DELETE", "devices", device_id)
     
     return True
 
-def ping_device(ip_address: str, timeout: int = 2) -> DevicePingResult:
+def ping_device(ip_address: str, timeout: int = 2, port: Optional[int] = None) -> DevicePingResult:
     """
     Ping a device to check connectivity using ICMP.
+    Falls back to a TCP connect on the management port when ICMP sockets are unavailable.
     """
     try:
-        start_time = time.time()
-        # The command uses -c 1 for a single packet and -W for timeout in seconds.
-        command = ['ping', '-c', '1', '-W', str(timeout), ip_address]
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-        response_time = (time.time() - start_time) * 1000  # in milliseconds
-
-        if result.returncode == 0:
-            log_network_activity("ping", ip_address, "success")
-            return DevicePingResult(
-                ip_address=ip_address,
-                reachable=True,
-                response_time=response_time,
-                message="Device is reachable via ICMP."
-            )
-        else:
-            log_network_activity("ping", ip_address, "failure")
-            return DevicePingResult(
-                ip_address=ip_address,
-                reachable=False,
-                response_time=None,
-                message=f"Device not reachable. Reason: {result.stderr or result.stdout}"
-            )
-    except FileNotFoundError:
-        log_network_activity("ping", ip_address, "error")
-        return DevicePingResult(
-            ip_address=ip_address,
-            reachable=False,
-            message="Ping command not found. Please ensure ICMP is supported."
-        )
+        results = asyncio.run(probe_engine.probe([(ip_address, port or config.DEFAULT_SSH_PORT)], timeout=timeout))
+        return results[ip_address]
     except Exception as e:
         log_network_activity("ping", ip_address, "error")
         return DevicePingResult(
@@ -155,39 +273,23 @@ def poll_device(db: Session, device_id: int) -> DevicePollResult:
     """
     Poll a device to check its status
     """
+    device = get_device_cached(db, device_id)
     try:
-        # Get device from database
-        device = get_device(db, device_id)
-        
-        # Ping the device
-        ping_result = ping_device(device.ip_address)
+        # Probe the device, re-probing at once if its status looks changed
+        results = asyncio.run(poll_with_confirmation([(device_id, device.ip_address, device.port)]))
+        result = results[device_id]
         
         # Update device status
-        if ping_result.reachable:
-            device.status = "online"
-            message = "Device is online"
-        else:
-            device.status = "offline"
-            message = "Device is offline"
+        apply_poll_results(db, [result])
         
-        device.last_polled = time.time()
-        db.commit()
-        
-        log_network_activity("poll", device.ip_address, device.status, device_id)
-        
-        return DevicePollResult(
-            device_id=device_id,
-            status=device.status,
-            message=message,
-            timestamp=device.last_polled
-        )
+        return result
     except Exception as e:
-        log_network_activity("poll", str(device_id), "error", device_id)
+        log_network_activity("poll", device.ip_address, "error", device_id)
         return DevicePollResult(
             device_id=device_id,
             status="error",
             message=f"Polling failed: {str(e)}",
-            timestamp=time.time()
+            timestamp=datetime.now(timezone.utc)
         )
 
 def ping_device_for_endpoint(db: Session, device_id: int) -> DevicePingResult:
@@ -195,18 +297,30 @@ def ping_device_for_endpoint(db: Session, device_id: int) -> DevicePingResult:
     Pings a specific device by its ID and returns the result.
     This is intended to be called from an API endpoint.
     """
-    device = get_device(db, device_id)
-    return ping_device(device.ip_address)
+    device = get_device_cached(db, device_id)
+    return ping_device(device.ip_address, port=device.port)
+
+def apply_poll_results(db: Session, results: Iterable[DevicePollResult]) -> int:
+    """
+    Persist poll outcomes with batched bulk UPDATEs and append them to the poll history.
+    Results with status "error" are skipped so those devices keep their last known status,
+    and outcomes for devices deleted meanwhile are dropped.
+    """
+    results = known_device_results(db, results)
+    record_poll_samples(db, results)
+    written = bulk_update_status(db, results)
+    db.commit()
+    return written
 
 def poll_all_devices(db: Session) -> List[DevicePollResult]:
     """
-    Poll all devices to check their status
+    Poll all devices to check their status.
+    Devices are probed concurrently and the status changes are written back in bulk.
     """
-    devices = get_devices(db)
-    results = []
+    log_db_operation("SELECT", "devices", "poll")
+    targets = db.query(Device.id, Device.ip_address, Device.port).order_by(Device.id).all()
+    results = asyncio.run(poll_with_confirmation(targets))
     
-    for device in devices:
-        result = poll_device(db, device.id)
-        results.append(result)
+    apply_poll_results(db, results.values())
     
-    return results
\ No newline at end of file
+    return [results[device_id] for device_id, _, _ in targets]
@@ -0,0 +1,175 @@
+import math
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Set
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database.connection import SessionLocal
+from ..database.models import PollLease, PollWorker
+from ..utils.config import config
+from ..utils.logger import log_db_operation, network_logger
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class ShardLeaseManager:
+    """
+    Splits the device inventory between poll workers through leases in the database.
+
+    Devices belong to shard ``id % shard_count``. Every worker registers
+    itself in ``poll_workers`` and, on each ``sync``, renews its leases,
+    gives back shards above its fair share and claims free or expired
+    shards up to that share with ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+    concurrent workers never claim the same shard. When a worker dies its
+    registration and leases expire after ``lease_ttl`` seconds and the
+    remaining workers pick its shards up.
+
+    Expiry uses the wall clock of each worker, so nodes need synchronised
+    clocks. A worker stops treating its leases as valid halfway through the
+    TTL if it could not renew them, well before another worker may take them.
+    """
+    def __init__(self, worker_id: Optional[str] = None, shard_count: Optional[int] = None,
+                 lease_ttl: Optional[float] = None, session_factory: Callable = SessionLocal):
+        self.worker_id = worker_id or config.POLL_WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+        self.shard_count = shard_count or config.POLL_SHARD_COUNT
+        self.lease_ttl = lease_ttl or config.POLL_LEASE_TTL
+        self.session_factory = session_factory
+        self._owned: Set[int] = set()
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return self.lease_ttl / 3
+
+    @property
+    def owned_shards(self) -> Set[int]:
+        """
+        Shards this worker may poll right now
+        """
+        with self._lock:
+            if time.monotonic() > self._valid_until:
+                return set()
+            return set(self._owned)
+
+    def shard_of(self, device_id: int) -> int:
+        return device_id % self.shard_count
+
+    def owns(self, device_id: int) -> bool:
+        return self.shard_of(device_id) in self.owned_shards
+
+    def _ensure_shards(self, db: Session):
+        existing = {shard_id for shard_id, in db.query(PollLease.shard_id).all()}
+        missing = [{"shard_id": shard_id} for shard_id in range(self.shard_count) if shard_id not in existing]
+        if not missing:
+            return
+        try:
+            db.execute(insert(PollLease), missing)
+            db.commit()
+        except IntegrityError:
+            # Another worker created them first
+            db.rollback()
+
+    def _heartbeat(self, db: Session, now: datetime, expires_at: datetime):
+        # Re-insert our own row; another worker may already have removed it as expired
+        db.execute(delete(PollWorker).where(or_(PollWorker.worker_id == self.worker_id, PollWorker.expires_at < now)))
+        db.add(PollWorker(worker_id=self.worker_id, heartbeat_at=now, expires_at=expires_at))
+
+    def _sync(self, db: Session) -> Set[int]:
+        now = _utc_now()
+        expires_at = now + timedelta(seconds=self.lease_ttl)
+
+        self._heartbeat(db, now, expires_at)
+        db.flush()
+        live_workers = db.query(PollWorker).filter(PollWorker.expires_at >= now).count()
+        fair_share = math.ceil(self.shard_count / max(live_workers, 1))
+
+        # Renew what is still ours; a lease that expired may already belong to someone else
+        db.execute(
+            update(PollLease)
+            .where(PollLease.owner == self.worker_id, PollLease.expires_at >= now)
+            .values(expires_at=expires_at, heartbeat_at=now)
+        )
+        owned = [
+            shard_id for shard_id, in db.query(PollLease.shard_id)
+            .filter(PollLease.owner == self.worker_id, PollLease.expires_at >= now)
+            .order_by(PollLease.shard_id).all()
+        ]
+
+        if len(owned) > fair_share:
+            # Hand shards back so newly started workers get their share
+            released = owned[fair_share:]
+            owned = owned[:fair_share]
+            # Stop polling them before another worker can claim them
+            with self._lock:
+                self._owned.difference_update(released)
+            db.execute(
+                update(PollLease)
+                .where(PollLease.shard_id.in_(released), PollLease.owner == self.worker_id)
+                .values(owner=None, expires_at=None)
+            )
+        elif len(owned) < fair_share:
+            claimable = db.query(PollLease).filter(
+                PollLease.shard_id < self.shard_count,
+                or_(PollLease.owner.is_(None), PollLease.expires_at < now)
+            ).order_by(PollLease.shard_id).limit(fair_share - len(owned)).with_for_update(skip_locked=True).all()
+            for lease in claimable:
+                lease.owner = self.worker_id
+                lease.expires_at = expires_at
+                lease.heartbeat_at = now
+                owned.append(lease.shard_id)
+
+        db.commit()
+        return set(owned)
+
+    def sync(self) -> bool:
+        """
+        Heartbeat, rebalance and claim leases. Returns True when the set of owned shards changed.
+        """
+        started = time.monotonic()
+        db = self.session_factory()
+        try:
+            self._ensure_shards(db)
+            owned = self._sync(db)
+        except Exception as e:
+            db.rollback()
+            network_logger.error(f"Poll lease sync failed for {self.worker_id}: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+        with self._lock:
+            changed = owned != self._owned
+            self._owned = owned
+            self._valid_until = started + self.lease_ttl / 2
+        if changed:
+            log_db_operation("UPDATE", "poll_leases", f"{self.worker_id}:{len(owned)}")
+            network_logger.info(f"Poll worker {self.worker_id} now owns {len(owned)} of {self.shard_count} shards")
+        return changed
+
+    def release_all(self):
+        """
+        Give up every lease and deregister, so other workers take over without waiting for expiry
+        """
+        with self._lock:
+            self._owned = set()
+            self._valid_until = 0.0
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(PollLease).where(PollLease.owner == self.worker_id).values(owner=None, expires_at=None)
+            )
+            db.execute(delete(PollWorker).where(PollWorker.worker_id == self.worker_id))
+            db.commit()
+            log_db_operation("UPDATE", "poll_leases", f"{self.worker_id}:released")
+        except Exception as e:
+            db.rollback()
+            network_logger.error(f"Poll lease release failed for {self.worker_id}: {str(e)}")
+        finally:
+            db.close()
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from ..database.connection import SessionLocal
+from ..database.models import Device
+from ..utils.config import config
+from ..utils.logger import log_db_operation, db_logger
+from .cache import device_cache
+from .history import record_poll_samples
+from .schemas import DevicePollResult
+
+# Core statement rather than an ORM bulk update, which fails the whole batch when a row is gone
+STATUS_UPDATE = update(Device.__table__).where(Device.__table__.c.id == bindparam("device_id")).values(
+    status=bindparam("new_status"), last_polled=bindparam("polled_at")
+)
+
+def known_device_results(db: Session, results: Iterable[DevicePollResult],
+                         batch_size: Optional[int] = None) -> List[DevicePollResult]:
+    """
+    Drop outcomes for devices deleted since they were polled
+    """
+    batch_size = batch_size or config.POLL_WRITEBACK_BATCH_SIZE
+    results = list(results)
+    device_ids = list({result.device_id for result in results})
+    existing = set()
+    for start in range(0, len(device_ids), batch_size):
+        existing.update(
+            device_id for device_id, in db.query(Device.id).filter(Device.id.in_(device_ids[start:start + batch_size]))
+        )
+    return [result for result in results if result.device_id in existing]
+
+def bulk_update_status(db: Session, results: Iterable[DevicePollResult], batch_size: Optional[int] = None) -> int:
+    """
+    Write poll outcomes back with one executemany UPDATE per batch.
+    Results with status "error" are skipped so those devices keep their last known status,
+    and outcomes for deleted devices update nothing. The caller commits.
+    """
+    batch_size = batch_size or config.POLL_WRITEBACK_BATCH_SIZE
+    rows = [
+        {"device_id": result.device_id, "new_status": result.status, "polled_at": result.timestamp}
+        for result in results if result.status != "error"
+    ]
+    for start in range(0, len(rows), batch_size):
+        # UPDATE devices SET status=?, last_polled=? WHERE id=? executed for the whole batch
+        db.execute(STATUS_UPDATE, rows[start:start + batch_size])
+    if rows:
+        # Cached snapshots carry the old status
+        device_cache.invalidate(device_ids=[row["device_id"] for row in rows])
+        log_db_operation("UPDATE", "devices", f"bulk:{len(rows)}")
+    return len(rows)
+
+class StatusWriteBack:
+    """
+    Collects poll outcomes and flushes them to the database in batches.
+
+    A flush happens as soon as ``batch_size`` outcomes are buffered, and at
+    least every ``flush_interval`` seconds while ``run`` is active. Only the
+    newest outcome per device is used for the status update, while every
+    outcome is appended to the poll history.
+    """
+    def __init__(self, batch_size: Optional[int] = None, flush_interval: Optional[float] = None,
+                 session_factory: Callable = SessionLocal):
+        self.batch_size = batch_size or config.POLL_WRITEBACK_BATCH_SIZE
+        self.flush_interval = flush_interval or config.POLL_WRITEBACK_FLUSH_INTERVAL
+        self.session_factory = session_factory
+        self._pending: Dict[int, DevicePollResult] = {}
+        self._samples: List[DevicePollResult] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, results: Iterable[DevicePollResult]) -> bool:
+        """
+        Buffer poll outcomes. Returns True when a full batch is waiting to be flushed.
+        """
+        with self._lock:
+            for result in results:
+                if result.status != "error":
+                    self._pending[result.device_id] = result
+                    self._samples.append(result)
+            return len(self._samples) >= self.batch_size
+
+    def _take(self) -> Tuple[List[DevicePollResult], List[DevicePollResult]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            samples, self._samples = self._samples, []
+        return list(pending.values()), samples
+
+    def flush(self) -> int:
+        """
+        Write all buffered outcomes to the database
+        """
+        with self._flush_lock:
+            results, samples = self._take()
+            if not results:
+                return 0
+            db = self.session_factory()
+            try:
+                # Devices deleted since they were polled would fail the history insert
+                results = known_device_results(db, results, self.batch_size)
+                known = {result.device_id for result in results}
+                samples = [sample for sample in samples if sample.device_id in known]
+                record_poll_samples(db, samples)
+                written = bulk_update_status(db, results, self.batch_size)
+                db.commit()
+                return written
+            except Exception as e:
+                db.rollback()
+                db_logger.error(f"Poll status write-back failed: {str(e)}")
+                # Keep the outcomes for the next flush unless newer ones arrived meanwhile;
+                # a device deleted in the meantime is filtered out then
+                with self._lock:
+                    for result in results:
+                        self._pending.setdefault(result.device_id, result)
+                    self._samples[:0] = samples
+                return 0
+            finally:
+                db.close()
+
+    async def submit_async(self, results: Iterable[DevicePollResult]):
+        """
+        Buffer poll outcomes from the event loop, flushing in a worker thread when a batch is full
+        """
+        if self.submit(results):
+            await asyncio.to_thread(self.flush)
+
+    async def run(self):
+        """
+        Flush periodically until cancelled, then flush whatever is left
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                if self._pending:
+                    await asyncio.to_thread(self.flush)
+        finally:
+            if self._pending:
+                await asyncio.to_thread(self.flush)
+
+# Global instance used by the background poll scheduler
+status_writeback = StatusWriteBack()
@@ -0,0 +1,133 @@
+import asyncio
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..database.connection import SessionLocal
+from ..utils.config import config
+from ..utils.logger import network_logger
+from .config_store import add_config_versions
+from .connection_pool import ConnectionPool, DeviceTarget
+from .deploy import CLI_ERROR
+from .executor import run_commands
+from .schemas import ConfigBackupError, ConfigBackupResult
+
+BACKUP_COMMAND = "show running-config"
+
+BACKUP_STATUS = "backup"
+
+# Lines that change without a configuration change
+VOLATILE_LINE = re.compile(
+    r"^(?:"
+    r"Building configuration"
+    r"|Current configuration\s*:"
+    r"|!+\s*Last configuration change at"
+    r"|!\s*NVRAM config last updated at"
+    r"|!\s*No configuration change since last restart"
+    r"|!\s*Time:"
+    r"|ntp clock-period"
+    r"|Cryptochecksum:"
+    r"|(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)\s+\w{3}\s+\d+\s+\d\d:\d\d:\d\d"
+    r")"
+)
+
+MAX_REPORTED_ERRORS = 1000
+
+def normalize_config(content: str) -> str:
+    """
+    Drop volatile lines and trailing whitespace so identical configurations hash identically
+    """
+    lines = [line.rstrip() for line in content.replace("\r", "").split("\n") if not VOLATILE_LINE.match(line)]
+    return "\n".join(lines).strip("\n") + "\n"
+
+def store_backups(db: Session, backups: List[Tuple[int, str]]) -> Tuple[int, int]:
+    """
+    Normalize a batch of running-configs and store a new version for the
+    ones that changed since the latest backup.
+    Returns ``(stored, unchanged)``.
+    """
+    return add_config_versions(
+        db, {device_id: normalize_config(content) for device_id, content in backups}, BACKUP_STATUS
+    )
+
+async def backup_configs(targets: List[DeviceTarget], concurrency: Optional[int] = None,
+                         device_timeout: Optional[float] = None, batch_size: Optional[int] = None,
+                         session_factory: Callable = SessionLocal,
+                         pool: Optional[ConnectionPool] = None) -> ConfigBackupResult:
+    """
+    Back up the running-config of many devices.
+
+    Configurations are pulled concurrently through the command runner and
+    written in batches of ``batch_size`` as they arrive, so only one batch
+    is held in memory. A configuration is stored only when its normalized
+    content differs from the device's latest backup.
+    """
+    concurrency = concurrency or config.CONFIG_BACKUP_CONCURRENCY
+    device_timeout = device_timeout or config.CONFIG_BACKUP_DEVICE_TIMEOUT
+    batch_size = batch_size or config.CONFIG_BACKUP_BATCH_SIZE
+
+    started = time.monotonic()
+    stored = unchanged = failed = 0
+    errors: List[ConfigBackupError] = []
+    # (device_id, device_name, running-config)
+    batch: List[Tuple[int, str, str]] = []
+
+    def reject(device_id: int, device_name: str, error: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(ConfigBackupError(device_id=device_id, device_name=device_name, error=error))
+
+    def write(backups: List[Tuple[int, str]]) -> Tuple[int, int]:
+        db = session_factory()
+        try:
+            return store_backups(db, backups)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def flush():
+        nonlocal stored, unchanged
+        backups = list(batch)
+        batch.clear()
+        try:
+            batch_stored, batch_unchanged = await asyncio.to_thread(
+                write, [(device_id, content) for device_id, _, content in backups]
+            )
+        except Exception as e:
+            network_logger.error(f"Storing {len(backups)} configuration backups failed: {str(e)}")
+            for device_id, device_name, _ in backups:
+                reject(device_id, device_name, f"Storing the backup failed: {str(e)}")
+            return
+        stored += batch_stored
+        unchanged += batch_unchanged
+
+    async for result in run_commands(targets, [BACKUP_COMMAND], concurrency, device_timeout, pool):
+        if result.status != "success":
+            reject(result.device_id, result.device_name, result.error or result.status)
+            continue
+        output = result.outputs[0].output
+        # The device answered with an error message instead of its configuration
+        if CLI_ERROR.search(output):
+            reject(result.device_id, result.device_name, output.strip().splitlines()[-1])
+            continue
+        batch.append((result.device_id, result.device_name, output))
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+
+    network_logger.info(f"Configuration backup finished: {stored} stored, {unchanged} unchanged, {failed} failed")
+    return ConfigBackupResult(
+        total=len(targets),
+        stored=stored,
+        unchanged=unchanged,
+        failed=failed,
+        duration=time.monotonic() - started,
+        errors=errors,
+        errors_truncated=failed > len(errors)
+    )
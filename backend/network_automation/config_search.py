@@ -0,0 +1,494 @@
+import json
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from ..database.models import Configuration, Device
+from ..utils.config import config
+from ..utils.exceptions import ValidationException
+from ..utils.logger import network_logger
+from .delta import apply_delta, decode_delta, split_lines
+from .schemas import ConfigSearchLine, ConfigSearchMatch, ConfigSearchResult
+
+# Search over stored configuration versions.
+#
+# Every line of every stored version is either in the full text of a version
+# without a delta (the first one) or among the lines added by the delta of
+# the version that introduced it. Indexing just those lines is enough to
+# find every device whose history contains a match; the matching versions
+# and line numbers are then found by replaying the device's deltas.
+#
+# On PostgreSQL, trigram GIN indexes (pg_trgm) on configurations.content and
+# configurations.delta answer the literal parts of a query with LIKE. Other
+# databases use LocalSearchIndex, an in-process index of distinct lines.
+
+SEARCH_MODES = ("text", "regex")
+SEARCH_SCOPES = ("latest", "history")
+
+# Devices whose history is replayed per query
+HISTORY_BATCH_SIZE = 50
+
+# Characters that stand for themselves when escaped in a regex
+_ESCAPED_LITERALS = set(".^$*+?{}[]()|\\/-#&~ \"'`!%,:;<=>@_")
+
+def required_literals(pattern: str) -> List[str]:
+    """
+    Literal strings every match of a regex must contain; conservative, so
+    groups, classes and alternations simply end a literal
+    """
+    if re.search(r"(?<!\\)\|", pattern):
+        return []
+    literals = []
+    current: List[str] = []
+
+    def end_literal():
+        if current:
+            literals.append("".join(current))
+            current.clear()
+
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\" and index + 1 < len(pattern):
+            escaped = pattern[index + 1]
+            index += 2
+            if escaped in _ESCAPED_LITERALS:
+                current.append(escaped)
+            else:
+                end_literal()
+            continue
+        if char == "[":
+            # Skip the class; a ] right after [ or [^ is a member
+            index += 2 if pattern[index + 1:index + 2] == "^" else 1
+            index += 1 if pattern[index:index + 1] == "]" else 0
+            while index < len(pattern) and pattern[index] != "]":
+                index += 2 if pattern[index] == "\\" else 1
+            index += 1
+            end_literal()
+            continue
+        if char == "(":
+            depth = 0
+            while index < len(pattern):
+                if pattern[index] == "\\":
+                    index += 2
+                    continue
+                if pattern[index] == "(":
+                    depth += 1
+                elif pattern[index] == ")":
+                    depth -= 1
+                    if not depth:
+                        break
+                index += 1
+            index += 1
+            end_literal()
+            continue
+        if char in "*?{":
+            # The previous character is optional or repeated
+            if current:
+                current.pop()
+            end_literal()
+            if char == "{":
+                index = pattern.find("}", index) + 1 or len(pattern)
+                continue
+        elif char == "+":
+            end_literal()
+        elif char in ".^$":
+            end_literal()
+        else:
+            current.append(char)
+        index += 1
+    end_literal()
+    return [literal for literal in literals if len(literal) >= 3]
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+
+def _first_chars(items) -> Optional[Set[int]]:
+    """Code points a subpattern can start with, or None when it is not a plain literal."""
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            return {av}
+        if op == sre_parse.SUBPATTERN:
+            return _first_chars(av[-1])
+        if op == sre_parse.AT:
+            continue
+        return None
+    return None
+
+def _backtracking_risk(items, outer_max: int = 0) -> Optional[str]:
+    """
+    Describe a construct that can backtrack exponentially: a repeat inside a
+    repeat (unless both are bounded), or a repeated alternation whose
+    branches can start with the same character
+    """
+    for op, av in items:
+        if op in _REPEATS:
+            low, high, body = av
+            if high > 1 and outer_max > 1 and sre_parse.MAXREPEAT in (high, outer_max):
+                return "nested quantifiers"
+            found = _backtracking_risk(body, max(outer_max, high))
+        elif op == sre_parse.BRANCH:
+            branches = av[1]
+            if outer_max > 1:
+                starts = [_first_chars(branch) for branch in branches]
+                seen: Set[int] = set()
+                for first in starts:
+                    if first is None or first & seen:
+                        return "a repeated alternation with overlapping branches"
+                    seen |= first
+            found = next(filter(None, (_backtracking_risk(branch, outer_max) for branch in branches)), None)
+        elif op == sre_parse.SUBPATTERN:
+            found = _backtracking_risk(av[-1], outer_max)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            found = _backtracking_risk(av[1], outer_max)
+        elif op == getattr(sre_parse, "ATOMIC_GROUP", None):
+            found = _backtracking_risk(av, outer_max)
+        elif op == sre_parse.GROUPREF_EXISTS:
+            found = _backtracking_risk(av[1], outer_max) or (av[2] and _backtracking_risk(av[2], outer_max))
+        else:
+            found = None
+        if found:
+            return found
+    return None
+
+def line_matcher(query: str, mode: str, ignore_case: bool) -> Tuple[Callable[[str], bool], List[str], bool]:
+    """
+    Line predicate for a query, the literals every matching line contains,
+    and whether those literals must be compared ignoring case
+    """
+    if not query:
+        raise ValidationException("Search query must not be empty")
+    if mode not in SEARCH_MODES:
+        raise ValidationException(f"Search mode must be one of: {', '.join(SEARCH_MODES)}")
+    if len(query) > config.CONFIG_SEARCH_MAX_QUERY_LENGTH:
+        raise ValidationException(f"Search query must not exceed {config.CONFIG_SEARCH_MAX_QUERY_LENGTH} characters")
+    if mode == "text":
+        if ignore_case:
+            lowered = query.lower()
+            return (lambda line: lowered in line.lower()), [query], True
+        return (lambda line: query in line), [query], False
+    try:
+        compiled = re.compile(query, re.IGNORECASE if ignore_case else 0)
+    except re.error as e:
+        raise ValidationException(f"Invalid regular expression: {str(e)}")
+    # Searches run over every stored line, so patterns that can backtrack exponentially are refused
+    risk = _backtracking_risk(sre_parse.parse(query, compiled.flags))
+    if risk:
+        raise ValidationException(f"Regular expression is too expensive to search with: {risk}")
+    # An inline (?i) makes the literals case-insensitive too
+    ignore_case = bool(compiled.flags & re.IGNORECASE)
+    return (lambda line: compiled.search(line) is not None), required_literals(query), ignore_case
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+class LocalSearchIndex:
+    """
+    In-process configuration index for databases without trigram indexes.
+
+    Each distinct line is stored once, with the devices whose history
+    introduced it and an entry in a lowercase trigram index. The latest version of each device
+    is kept as a list of line ids, so latest-version searches and their line
+    numbers never touch the configurations table. New rows are picked up
+    incrementally before each search.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._line_ids: Dict[str, int] = {}
+        self._lines: List[str] = []
+        self._trigrams: Dict[str, array] = defaultdict(lambda: array("I"))
+        self._devices: Dict[Tuple[str, int], array] = defaultdict(lambda: array("I"))  # (status, line id) -> devices
+        self._latest: Dict[Tuple[str, int], Tuple[int, array]] = {}  # (status, device) -> (version, line ids)
+        self._last_row_id = 0
+
+    def _line_id(self, line: str) -> int:
+        line_id = self._line_ids.get(line)
+        if line_id is None:
+            line_id = len(self._lines)
+            self._line_ids[line] = line_id
+            self._lines.append(line)
+            for trigram in _trigrams(line.lower()):
+                self._trigrams[trigram].append(line_id)
+        return line_id
+
+    def _add_version(self, device_id: int, status: str, version: int,
+                 content: Optional[str], delta: Optional[str]):
+        if delta:
+            introduced = [line for _, _, new_lines in decode_delta(delta) for line in new_lines]
+        else:
+            introduced = split_lines(content or "")
+        for line in set(introduced):
+            self._devices[(status, self._line_id(line))].append(device_id)
+        if content is not None:
+            latest = self._latest.get((status, device_id))
+            if latest is None or version >= latest[0]:
+                self._latest[(status, device_id)] = (
+                    version, array("I", (self._line_id(line) for line in split_lines(content)))
+                )
+
+    def refresh(self, db: Session, batch_size: int = 1000):
+        """
+        Index configuration versions stored since the last refresh
+        """
+        with self._lock:
+            added = 0
+            while True:
+                rows = db.query(
+                    Configuration.id, Configuration.device_id, Configuration.status, Configuration.version,
+                    Configuration.content, Configuration.delta
+                ).filter(
+                    Configuration.id > self._last_row_id,
+                    Configuration.version.isnot(None)
+                ).order_by(Configuration.id).limit(batch_size).all()
+                if not rows:
+                    break
+                for row in rows:
+                    self._add_version(*row[1:])
+                self._last_row_id = rows[-1][0]
+                added += len(rows)
+            if added:
+                network_logger.info(f"Configuration search index: {added} versions added, {len(self._lines)} distinct lines")
+
+    def _matching_lines(self, matches: Callable[[str], bool], literals: List[str]) -> Set[int]:
+        # The rarest trigram of any required literal bounds the candidate lines
+        candidates: Optional[array] = None
+        for literal in literals:
+            for trigram in _trigrams(literal.lower()):
+                postings = self._trigrams.get(trigram)
+                if postings is None:
+                    return set()
+                if candidates is None or len(postings) < len(candidates):
+                    candidates = postings
+        line_ids = candidates if candidates is not None else range(len(self._lines))
+        lines = self._lines
+        return {line_id for line_id in line_ids if matches(lines[line_id])}
+
+    def _history_devices(self, matched: Set[int], status: str) -> Set[int]:
+        devices = set()
+        for line_id in matched:
+            devices.update(self._devices.get((status, line_id), ()))
+        return devices
+
+    def search_latest(self, matches: Callable[[str], bool], literals: List[str], status: str,
+                      limit: int) -> Tuple[List[Tuple[int, int, List[ConfigSearchLine]]], int]:
+        """
+        ``(device_id, version, lines)`` of the first ``limit`` devices whose
+        latest version matches, and the number of such devices
+        """
+        with self._lock:
+            matched = self._matching_lines(matches, literals)
+            if not matched:
+                return [], 0
+            devices = []
+            for device_id in sorted(self._history_devices(matched, status)):
+                latest = self._latest.get((status, device_id))
+                if latest is not None and not matched.isdisjoint(latest[1]):
+                    devices.append(device_id)
+            results = []
+            for device_id in devices[:limit]:
+                version, line_ids = self._latest[(status, device_id)]
+                lines = [
+                    ConfigSearchLine(number=number, text=self._lines[line_id])
+                    for number, line_id in enumerate(line_ids, 1)
+                    if line_id in matched
+                ]
+                results.append((device_id, version, lines))
+            return results, len(devices)
+
+    def history_devices(self, matches: Callable[[str], bool], literals: List[str], status: str) -> List[int]:
+        """
+        Devices with a match in some stored version, possibly a few more
+        """
+        with self._lock:
+            return sorted(self._history_devices(self._matching_lines(matches, literals), status))
+
+def _like_filters(column, literals: List[str], ignore_case: bool, encoded: bool = False) -> list:
+    if encoded:
+        # Deltas are stored as JSON, which escapes quotes, backslashes and non-ASCII characters
+        literals = [json.dumps(literal)[1:-1] for literal in literals]
+    if ignore_case:
+        return [column.icontains(literal, autoescape=True) for literal in literals]
+    return [column.contains(literal, autoescape=True) for literal in literals]
+
+def _latest_rows_query(db: Session, status: str):
+    latest = select(Configuration.device_id, func.max(Configuration.version).label("version")).where(
+        Configuration.status == status
+    ).group_by(Configuration.device_id).subquery()
+    return db.query(Configuration.device_id, Configuration.version, Configuration.content).join(
+        latest,
+        and_(
+            Configuration.device_id == latest.c.device_id,
+            Configuration.version == latest.c.version,
+            Configuration.status == status
+        )
+    )
+
+def _matching_lines(content: str, matches: Callable[[str], bool]) -> List[ConfigSearchLine]:
+    return [
+        ConfigSearchLine(number=number, text=line)
+        for number, line in enumerate(split_lines(content), 1)
+        if matches(line)
+    ]
+
+def _replay_history(db: Session, device_ids: List[int], status: str,
+                    matches: Callable[[str], bool]) -> Iterable[Tuple[int, int, List[ConfigSearchLine]]]:
+    """
+    ``(device_id, version, lines)`` for every stored version with a match,
+    rebuilding versions forwards from full copies and deltas
+    """
+    rows = db.query(
+        Configuration.device_id, Configuration.version, Configuration.content, Configuration.delta
+    ).filter(
+        Configuration.device_id.in_(device_ids),
+        Configuration.status == status,
+        Configuration.version.isnot(None)
+    ).order_by(Configuration.device_id, Configuration.version)
+    current_device = None
+    lines: List[str] = []
+    for device_id, version, content, delta in rows:
+        if device_id != current_device:
+            current_device = device_id
+            lines = []
+        if content is not None:
+            lines = split_lines(content)
+        else:
+            lines = apply_delta(lines, decode_delta(delta))
+        found = [
+            ConfigSearchLine(number=number, text=line)
+            for number, line in enumerate(lines, 1)
+            if matches(line)
+        ]
+        if found:
+            yield device_id, version, found
+
+class ConfigSearch:
+    """
+    Finds configuration lines matching a text or regex query in the latest
+    version of each device, or across all stored versions
+    """
+    def __init__(self, local_index: Optional[LocalSearchIndex] = None):
+        self.local_index = local_index or LocalSearchIndex()
+
+    @staticmethod
+    def uses_trigram_index(db: Session) -> bool:
+        return db.get_bind().dialect.name == "postgresql"
+
+    def _latest(self, db: Session, matches: Callable[[str], bool], literals: List[str], ignore_case: bool,
+                status: str, limit: int) -> Tuple[List[Tuple[int, int, List[ConfigSearchLine]]], int]:
+        if not self.uses_trigram_index(db):
+            self.local_index.refresh(db)
+            return self.local_index.search_latest(matches, literals, status, limit)
+
+        query = _latest_rows_query(db, status).filter(*_like_filters(Configuration.content, literals, ignore_case))
+        results = []
+        devices = 0
+        for device_id, version, content in query.order_by(Configuration.device_id).yield_per(500):
+            lines = _matching_lines(content or "", matches)
+            if lines:
+                devices += 1
+                if len(results) < limit:
+                    results.append((device_id, version, lines))
+        return results, devices
+
+    def _history_devices(self, db: Session, matches: Callable[[str], bool], literals: List[str],
+                         ignore_case: bool, status: str) -> List[int]:
+        if not self.uses_trigram_index(db):
+            self.local_index.refresh(db)
+            return self.local_index.history_devices(matches, literals, status)
+
+        query = db.query(Configuration.device_id).filter(
+            Configuration.status == status,
+            Configuration.version.isnot(None)
+        )
+        if literals:
+            query = query.filter(or_(
+                and_(*_like_filters(Configuration.content, literals, ignore_case)),
+                and_(*_like_filters(Configuration.delta, literals, ignore_case, encoded=True))
+            ))
+        return [device_id for device_id, in query.distinct().order_by(Configuration.device_id)]
+
+    def search(self, db: Session, query: str, mode: str = "text", scope: str = "latest",
+               status: str = "backup", ignore_case: bool = False, limit: int = 100) -> ConfigSearchResult:
+        """
+        Search stored configurations. ``limit`` caps the number of matching
+        versions returned; ``devices`` counts every matching device in
+        latest-version searches and the devices examined so far in history
+        searches, which stop once the limit is reached.
+        """
+        if scope not in SEARCH_SCOPES:
+            raise ValidationException(f"Search scope must be one of: {', '.join(SEARCH_SCOPES)}")
+        started = time.monotonic()
+        matches, literals, ignore_case = line_matcher(query, mode, ignore_case)
+
+        if scope == "latest":
+            found, devices = self._latest(db, matches, literals, ignore_case, status, limit)
+            truncated = devices > len(found)
+        else:
+            candidates = self._history_devices(db, matches, literals, ignore_case, status)
+            found = []
+            matched_devices: Set[int] = set()
+            truncated = False
+            for start in range(0, len(candidates), HISTORY_BATCH_SIZE):
+                for device_id, version, lines in _replay_history(
+                    db, candidates[start:start + HISTORY_BATCH_SIZE], status, matches
+                ):
+                    if len(found) == limit:
+                        truncated = True
+                        break
+                    found.append((device_id, version, lines))
+                    matched_devices.add(device_id)
+                if truncated:
+                    break
+            devices = len(matched_devices)
+
+        details = {}
+        if found:
+            rows = db.query(Configuration.device_id, Configuration.version, Configuration.created_at, Device.name).join(
+                Device, Device.id == Configuration.device_id
+            ).filter(
+                Configuration.status == status,
+                Configuration.device_id.in_({device_id for device_id, _, _ in found})
+            )
+            wanted = {(device_id, version) for device_id, version, _ in found}
+            details = {
+                (device_id, version): (created_at, name)
+                for device_id, version, created_at, name in rows
+                if (device_id, version) in wanted
+            }
+
+        return ConfigSearchResult(
+            query=query,
+            mode=mode,
+            scope=scope,
+            status=status,
+            # Versions of devices deleted since they were indexed are dropped
+            matches=[
+                ConfigSearchMatch(
+                    device_id=device_id,
+                    device_name=details[(device_id, version)][1],
+                    version=version,
+                    created_at=details[(device_id, version)][0],
+                    lines=lines
+                )
+                for device_id, version, lines in found
+                if (device_id, version) in details
+            ],
+            devices=devices,
+            truncated=truncated,
+            duration=time.monotonic() - started
+        )
+
+# Global instance to be used across the application
+config_search = ConfigSearch()
@@ -0,0 +1,219 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database.models import Configuration
+from ..utils.config import config
+from ..utils.exceptions import ConfigurationNotFoundException
+from ..utils.logger import log_db_operation
+from .delta import (
+    Delta, apply_delta, compose_all, compute_delta, decode_delta, encode_delta, invert_delta, join_lines, split_lines
+)
+from .schemas import ConfigDiff, ConfigDiffHunk, ConfigVersion, ConfigVersionContent
+
+# Versioned configuration storage.
+#
+# Every version of a device's configuration stores the line delta from the
+# version before it. Full text is kept only on snapshots, taken every
+# CONFIG_SNAPSHOT_INTERVAL versions, and on the latest version, so any
+# version is rebuilt from the closest full copy plus at most half an interval
+# of deltas, and a diff between two versions never reads full text.
+
+# Attempts at storing a batch when a concurrent writer took the same version numbers
+VERSION_CONFLICT_ATTEMPTS = 5
+
+def hash_config(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def _latest_versions(db: Session, device_ids: Iterable[int], status: str) -> Dict[int, Configuration]:
+    """
+    Latest version of each device's configuration
+    """
+    latest = select(Configuration.device_id, func.max(Configuration.version).label("version")).where(
+        Configuration.status == status,
+        Configuration.device_id.in_(list(device_ids))
+    ).group_by(Configuration.device_id).subquery()
+    rows = db.query(Configuration).join(
+        latest,
+        and_(
+            Configuration.device_id == latest.c.device_id,
+            Configuration.version == latest.c.version,
+            Configuration.status == status
+        )
+    ).all()
+    return {row.device_id: row for row in rows}
+
+def add_config_versions(db: Session, contents: Dict[int, str], status: str,
+                        snapshot_interval: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Store a new version for each device whose configuration differs from its
+    latest version, with one multi-row INSERT. The previous latest version
+    gives up its full text unless it is a snapshot.
+
+    Two writers for the same device pick the same next version and the
+    second one hits the unique version index; it then rolls back and builds
+    the batch again on top of the versions the other one stored.
+    Returns ``(stored, unchanged)``.
+    """
+    snapshot_interval = snapshot_interval or config.CONFIG_SNAPSHOT_INTERVAL
+    for attempt in range(VERSION_CONFLICT_ATTEMPTS):
+        try:
+            return _add_config_versions(db, contents, status, snapshot_interval)
+        except IntegrityError:
+            db.rollback()
+            if attempt == VERSION_CONFLICT_ATTEMPTS - 1:
+                raise
+
+def _add_config_versions(db: Session, contents: Dict[int, str], status: str,
+                         snapshot_interval: int) -> Tuple[int, int]:
+    latest = _latest_versions(db, contents, status)
+    now = datetime.now(timezone.utc)
+    rows = []
+    demoted = []
+    for device_id, content in contents.items():
+        content_hash = hash_config(content)
+        previous = latest.get(device_id)
+        if previous is not None and previous.content_hash == content_hash:
+            continue
+        if previous is None:
+            version, delta = 1, None
+        else:
+            version = previous.version + 1
+            delta = encode_delta(compute_delta(split_lines(previous.content), split_lines(content)))
+            if not previous.is_snapshot:
+                demoted.append({"id": previous.id, "content": None})
+        rows.append({
+            "device_id": device_id,
+            "version": version,
+            "content": content,
+            "delta": delta,
+            "is_snapshot": delta is None or (version - 1) % snapshot_interval == 0,
+            "content_hash": content_hash,
+            "status": status,
+            "created_at": now,
+        })
+    if demoted:
+        db.execute(update(Configuration), demoted)
+    if rows:
+        db.execute(insert(Configuration), rows)
+    db.commit()
+    log_db_operation("INSERT", "configurations", f"{status}:{len(rows)}/{len(contents)}")
+    return len(rows), len(contents) - len(rows)
+
+def list_config_versions(db: Session, device_id: int, status: str) -> List[ConfigVersion]:
+    """
+    All versions of a device's configuration, newest first
+    """
+    rows = db.query(
+        Configuration.version, Configuration.content_hash, Configuration.is_snapshot, Configuration.created_at
+    ).filter(
+        Configuration.device_id == device_id,
+        Configuration.status == status,
+        Configuration.version.isnot(None)
+    ).order_by(Configuration.version.desc()).all()
+    return [
+        ConfigVersion(version=version, content_hash=content_hash, is_snapshot=bool(is_snapshot), created_at=created_at)
+        for version, content_hash, is_snapshot, created_at in rows
+    ]
+
+def _load_deltas(db: Session, device_id: int, status: str, after: int, through: int) -> List[Delta]:
+    """
+    Deltas of versions ``after + 1`` through ``through``, oldest first
+    """
+    rows = db.query(Configuration.version, Configuration.delta).filter(
+        Configuration.device_id == device_id,
+        Configuration.status == status,
+        Configuration.version > after,
+        Configuration.version <= through
+    ).order_by(Configuration.version).all()
+    if [version for version, _ in rows] != list(range(after + 1, through + 1)):
+        raise ConfigurationNotFoundException(
+            f"Configuration history of device {device_id} is incomplete between versions {after} and {through}"
+        )
+    return [decode_delta(delta) for _, delta in rows]
+
+def get_config_version(db: Session, device_id: int, version: int, status: str) -> ConfigVersionContent:
+    """
+    Rebuild one version of a device's configuration from the closest full copy
+    """
+    row = db.query(Configuration).filter(
+        Configuration.device_id == device_id,
+        Configuration.status == status,
+        Configuration.version == version
+    ).first()
+    if row is None:
+        raise ConfigurationNotFoundException(f"Configuration version {version} of device {device_id} not found")
+
+    content = row.content
+    if content is None:
+        full_copies = db.query(Configuration.version).filter(
+            Configuration.device_id == device_id,
+            Configuration.status == status,
+            Configuration.content.isnot(None)
+        )
+        below = full_copies.filter(Configuration.version < version).order_by(Configuration.version.desc()).first()
+        above = full_copies.filter(Configuration.version > version).order_by(Configuration.version).first()
+        if above is None or (below is not None and version - below[0] <= above[0] - version):
+            base_version = below[0]
+            delta = compose_all(_load_deltas(db, device_id, status, base_version, version))
+        else:
+            base_version = above[0]
+            delta = invert_delta(compose_all(_load_deltas(db, device_id, status, version, base_version)))
+        base = db.query(Configuration.content).filter(
+            Configuration.device_id == device_id,
+            Configuration.status == status,
+            Configuration.version == base_version
+        ).scalar()
+        content = join_lines(apply_delta(split_lines(base), delta))
+
+    return ConfigVersionContent(
+        version=row.version,
+        content_hash=row.content_hash,
+        is_snapshot=bool(row.is_snapshot),
+        created_at=row.created_at,
+        content=content
+    )
+
+def diff_config_versions(db: Session, device_id: int, from_version: int, to_version: int,
+                         status: str) -> ConfigDiff:
+    """
+    Line diff between two versions of a device's configuration, composed from
+    the stored deltas between them
+    """
+    low, high = sorted((from_version, to_version))
+    exists = db.query(Configuration.id).filter(
+        Configuration.device_id == device_id,
+        Configuration.status == status,
+        Configuration.version == low
+    ).first()
+    if exists is None:
+        raise ConfigurationNotFoundException(f"Configuration version {low} of device {device_id} not found")
+
+    delta = compose_all(_load_deltas(db, device_id, status, low, high))
+    if from_version > to_version:
+        delta = invert_delta(delta)
+
+    hunks = []
+    offset = 0
+    for start, old_lines, new_lines in delta:
+        hunks.append(ConfigDiffHunk(
+            old_start=start + 1,
+            old_count=len(old_lines),
+            new_start=start + offset + 1,
+            new_count=len(new_lines),
+            removed=old_lines,
+            added=new_lines
+        ))
+        offset += len(new_lines) - len(old_lines)
+    return ConfigDiff(
+        device_id=device_id,
+        from_version=from_version,
+        to_version=to_version,
+        lines_removed=sum(hunk.old_count for hunk in hunks),
+        lines_added=sum(hunk.new_count for hunk in hunks),
+        hunks=hunks
+    )
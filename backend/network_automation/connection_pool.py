@@ -0,0 +1,683 @@
+import asyncio
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Type
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+from ..utils.config import config
+from ..utils.exceptions import DeviceConnectionException, NetworkOperationException
+from ..utils.logger import log_network_activity, network_logger
+from .schemas import ConnectionPoolStats
+from .telnet import TelnetConnection
+
+# Cisco style prompt: hostname, optional mode such as (config-if), then > or #
+PROMPT_PATTERN = re.compile(r"(?:^|\n)([\w.\-@/:]+)(?:\([\w.\-]+\))?[>#]\s*$")
+
+# Telnet login prompts
+USERNAME_PROMPT = re.compile(r"(?:user ?name|login)\s*:\s*$", re.IGNORECASE)
+PASSWORD_PROMPT = re.compile(r"password\s*:\s*$", re.IGNORECASE)
+LOGIN_FAILED = re.compile(r"%\s*(?:login invalid|authentication failed|bad passwords|access denied)", re.IGNORECASE)
+
+# Pager prompt shown when paging could not be turned off, and the backspaces that erase it
+MORE_PATTERN = re.compile(r" *--More-- *$")
+BACKSPACES = re.compile(r"\x08+ *\x08*")
+
+# Only the end of the buffer can hold the prompt
+PROMPT_SEARCH_WINDOW = 256
+
+READ_SIZE = 65536
+
+class DeviceTarget:
+    """
+    What the pool needs to reach a device
+    """
+    def __init__(self, ip_address: str, port: Optional[int] = None, protocol: str = "ssh",
+                 device_type: str = "cisco_ios", username: Optional[str] = None,
+                 password: Optional[str] = None, device_id: Optional[int] = None, name: Optional[str] = None):
+        self.ip_address = ip_address
+        self.protocol = protocol
+        self.port = port or (config.DEFAULT_TELNET_PORT if protocol == "telnet" else config.DEFAULT_SSH_PORT)
+        self.device_type = device_type
+        self.username = username
+        self.password = password
+        self.device_id = device_id
+        self.name = name
+
+    @classmethod
+    def from_device(cls, device, password: Optional[str] = None) -> "DeviceTarget":
+        """
+        Build a target from a Device model or schema. Devices only keep a
+        password hash, so the password comes from the caller or the pool's
+        credentials resolver.
+        """
+        return cls(
+            ip_address=device.ip_address,
+            port=device.port,
+            protocol=device.protocol or "ssh",
+            device_type=device.device_type,
+            username=device.username,
+            password=password,
+            device_id=device.id,
+            name=device.name
+        )
+
+    @property
+    def key(self) -> str:
+        return f"{self.ip_address}:{self.port}:{self.protocol}"
+
+def default_credentials(target: DeviceTarget) -> Tuple[str, str]:
+    """
+    Resolve login credentials for a target from the application settings
+    """
+    return target.username or config.DEVICE_USERNAME, config.DEVICE_PASSWORD
+
+class DeviceSession(ABC):
+    """
+    One logged-in CLI session with pagination turned off, ready for commands
+    """
+    def __init__(self, target: DeviceTarget, username: str, password: str):
+        self.target = target
+        self.username = username
+        self.password = password
+        self.prompt_pattern: Optional[re.Pattern] = None
+        self.prompt_prefix: Optional[str] = None
+        self.hostname: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.broken = False
+
+    @abstractmethod
+    async def open(self, timeout: float):
+        """Connect, log in and detect the prompt."""
+        pass
+
+    @abstractmethod
+    async def _write(self, data: str):
+        pass
+
+    @abstractmethod
+    async def _read(self, timeout: float) -> str:
+        """Return the next chunk of output, or an empty string once the session is closed."""
+        pass
+
+    @abstractmethod
+    def is_closed(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
+
+    async def read_until_prompt(self, timeout: float, pattern: Optional[re.Pattern] = None,
+                                echo: Optional[str] = None) -> Tuple[str, re.Match]:
+        """
+        Read output until the prompt appears. Returns the text before the prompt and the prompt match.
+        With ``echo``, anything up to and including the echoed command is
+        dropped first, so output left over from an earlier exchange is never
+        mistaken for the answer.
+        """
+        pattern = pattern or self.prompt_pattern
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        buffer = ""
+        while True:
+            if echo is not None:
+                position = buffer.find(echo)
+                if position >= 0:
+                    buffer = buffer[position + len(echo):]
+                    echo = None
+            if echo is None:
+                match = pattern.search(buffer, max(0, len(buffer) - PROMPT_SEARCH_WINDOW))
+                if match:
+                    return buffer[:match.start()], match
+            buffer += await self._receive(deadline - loop.time())
+
+    async def _receive(self, timeout: float) -> str:
+        """
+        Next output from the device, without carriage returns. A pager
+        prompt is answered and removed.
+        """
+        if timeout <= 0:
+            self.broken = True
+            raise NetworkOperationException(f"Timed out waiting for the prompt on {self.target.key}")
+        try:
+            chunk = await self._read(timeout)
+        except asyncio.TimeoutError:
+            return ""
+        if not chunk:
+            self.broken = True
+            raise DeviceConnectionException(f"Session to {self.target.key} was closed by the device")
+        chunk = BACKSPACES.sub("", chunk.replace("\r", ""))
+        if MORE_PATTERN.search(chunk):
+            chunk = MORE_PATTERN.sub("", chunk)
+            await self._write(" ")
+        return chunk
+
+    async def detect_prompt(self, timeout: float):
+        """
+        Learn the hostname from the first prompt and disable paging
+        """
+        await self._write("\n")
+        _, match = await self.read_until_prompt(timeout, PROMPT_PATTERN)
+        self.hostname = match.group(1)
+        self.prompt_prefix = r"(?:^|\n)" + re.escape(self.hostname) + r"(?:\([\w.\-]+\))?[>#]"
+        self.prompt_pattern = re.compile(self.prompt_prefix + r"\s*$")
+        await self._execute("terminal length 0", timeout)
+        await self._execute("terminal width 511", timeout)
+
+    async def _execute(self, command: str, timeout: float) -> str:
+        await self._write(command + "\n")
+        # Only the last line of a multi-line command (a banner) is echoed right before its output
+        echo = command.rsplit("\n", 1)[-1] + "\n" if command.strip() else None
+        output, _ = await self.read_until_prompt(timeout, echo=echo)
+        return output.rstrip("\n")
+
+    async def send_command(self, command: str, timeout: Optional[float] = None) -> str:
+        """
+        Run one command and return its output without the echo and the trailing prompt
+        """
+        output = await self._execute(command, timeout or config.COMMAND_TIMEOUT)
+        self.uses += 1
+        self.last_used = time.monotonic()
+        return output
+
+    async def send_commands(self, commands: List[str], timeout: Optional[float] = None) -> List[str]:
+        """
+        Run several commands pipelined: all of them are written at once and the
+        device works through them as typed-ahead input, saving a round trip
+        per command. The outputs are cut apart where each command is echoed
+        after a prompt.
+        """
+        if len(commands) < 2:
+            return [await self.send_command(command, timeout) for command in commands]
+        timeout = timeout or config.COMMAND_TIMEOUT
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout * len(commands)
+        await self._write("".join(command + "\n" for command in commands))
+
+        outputs: List[str] = []
+        buffer = ""
+        position = None  # end of the echo of the command whose output is being read
+        while True:
+            if position is None:
+                found = buffer.find(commands[0] + "\n")
+                if found >= 0:
+                    position = found + len(commands[0]) + 1
+            while position is not None and len(outputs) + 1 < len(commands):
+                echo = re.compile(self.prompt_prefix + re.escape(commands[len(outputs) + 1]) + "\n")
+                match = echo.search(buffer, position - 1)
+                if not match:
+                    break
+                outputs.append(buffer[position:match.start()])
+                position = match.end()
+            if position is not None and len(outputs) + 1 == len(commands):
+                match = self.prompt_pattern.search(buffer, max(position - 1, len(buffer) - PROMPT_SEARCH_WINDOW))
+                if match:
+                    outputs.append(buffer[position:match.start()])
+                    break
+            buffer += await self._receive(deadline - loop.time())
+
+        self.uses += len(commands)
+        self.last_used = time.monotonic()
+        return [output.rstrip("\n") for output in outputs]
+
+    async def is_alive(self, probe_after: float, timeout: float) -> bool:
+        """
+        Cheap check before reuse. Sessions idle for longer than ``probe_after``
+        seconds must also answer an empty line with a prompt.
+        """
+        if self.broken or self.is_closed():
+            return False
+        if time.monotonic() - self.last_used < probe_after:
+            return True
+        try:
+            await self._write("\n")
+            await self.read_until_prompt(timeout)
+            self.last_used = time.monotonic()
+            return True
+        except (NetworkOperationException, DeviceConnectionException, OSError):
+            return False
+
+class SSHSession(DeviceSession):
+    """
+    Interactive shell over SSH using asyncssh
+    """
+    def __init__(self, target: DeviceTarget, username: str, password: str):
+        super().__init__(target, username, password)
+        self._connection = None
+        self._process = None
+
+    async def open(self, timeout: float):
+        if asyncssh is None:
+            raise ImportError("asyncssh library is not installed. Please install it with 'pip install asyncssh'.")
+        # None turns host key checking off, () is asyncssh's default ~/.ssh/known_hosts
+        known_hosts = None if config.SSH_DISABLE_HOST_KEY_CHECK else (config.SSH_KNOWN_HOSTS or ())
+        try:
+            self._connection = await asyncio.wait_for(
+                asyncssh.connect(
+                    self.target.ip_address,
+                    port=self.target.port,
+                    username=self.username,
+                    password=self.password,
+                    known_hosts=known_hosts,
+                    client_keys=None,
+                    connect_timeout=timeout
+                ),
+                timeout
+            )
+            self._process = await self._connection.create_process(
+                term_type="vt100", term_size=(511, 24), encoding="utf-8"
+            )
+        except (OSError, asyncio.TimeoutError, asyncssh.Error) as e:
+            await self.close()
+            raise DeviceConnectionException(f"SSH connection to {self.target.key} failed: {str(e) or type(e).__name__}")
+        await self.detect_prompt(timeout)
+
+    async def _write(self, data: str):
+        if self._process is None or self._process.stdin.is_closing():
+            self.broken = True
+            raise DeviceConnectionException(f"Session to {self.target.key} is closed")
+        self._process.stdin.write(data)
+
+    async def _read(self, timeout: float) -> str:
+        try:
+            return await asyncio.wait_for(self._process.stdout.read(READ_SIZE), timeout)
+        except asyncssh.Error as e:
+            self.broken = True
+            raise DeviceConnectionException(f"Session to {self.target.key} failed: {str(e)}")
+
+    def is_closed(self) -> bool:
+        return (
+            self._connection is None
+            or self._connection.is_closed()
+            or self._process is None
+            or self._process.exit_status is not None
+        )
+
+    async def close(self):
+        if self._process is not None:
+            self._process.close()
+        if self._connection is not None:
+            self._connection.close()
+            try:
+                await asyncio.wait_for(self._connection.wait_closed(), 5)
+            except (asyncio.TimeoutError, OSError):
+                pass
+        self._process = None
+        self._connection = None
+
+class TelnetSession(DeviceSession):
+    """
+    Interactive CLI over Telnet for devices without SSH
+    """
+    def __init__(self, target: DeviceTarget, username: str, password: str):
+        super().__init__(target, username, password)
+        self._connection: Optional[TelnetConnection] = None
+
+    async def open(self, timeout: float):
+        self._connection = TelnetConnection()
+        try:
+            await self._connection.connect(self.target.ip_address, self.target.port, timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            await self.close()
+            raise DeviceConnectionException(f"Telnet connection to {self.target.key} failed: {str(e) or type(e).__name__}")
+        await self.login(timeout)
+        await self.detect_prompt(timeout)
+
+    async def login(self, timeout: float):
+        """
+        Answer the username and password prompts until the CLI prompt appears
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        buffer = ""
+        sent = set()
+        while True:
+            tail = buffer[-PROMPT_SEARCH_WINDOW:]
+            if LOGIN_FAILED.search(tail):
+                raise DeviceConnectionException(f"Telnet login to {self.target.key} failed")
+            answer = None
+            if PASSWORD_PROMPT.search(tail):
+                answer = "password"
+            elif USERNAME_PROMPT.search(tail):
+                answer = "username"
+            elif PROMPT_PATTERN.search(tail):
+                return
+            if answer is not None:
+                # Being asked twice means the first answer was rejected
+                if answer in sent:
+                    raise DeviceConnectionException(f"Telnet login to {self.target.key} failed")
+                sent.add(answer)
+                await self._write((self.password if answer == "password" else self.username) + "\n")
+                buffer = ""
+            if deadline - loop.time() <= 0:
+                raise DeviceConnectionException(f"Timed out logging in to {self.target.key}")
+            buffer += await self._receive(deadline - loop.time())
+
+    async def _write(self, data: str):
+        if self._connection is None or self._connection.is_closing():
+            self.broken = True
+            raise DeviceConnectionException(f"Session to {self.target.key} is closed")
+        try:
+            await self._connection.write(data)
+        except OSError as e:
+            self.broken = True
+            raise DeviceConnectionException(f"Session to {self.target.key} failed: {str(e)}")
+
+    async def _read(self, timeout: float) -> str:
+        try:
+            return await asyncio.wait_for(self._connection.read(), timeout)
+        except OSError as e:
+            self.broken = True
+            raise DeviceConnectionException(f"Session to {self.target.key} failed: {str(e)}")
+
+    def is_closed(self) -> bool:
+        return self._connection is None or self._connection.is_closing()
+
+    async def close(self):
+        if self._connection is not None:
+            await self._connection.close()
+        self._connection = None
+
+# Session class per Device.protocol
+SESSION_TYPES: Dict[str, Type[DeviceSession]] = {
+    "ssh": SSHSession,
+    "telnet": TelnetSession,
+}
+
+class ConnectionPool:
+    """
+    Pool of logged-in CLI sessions keyed on ``ip:port:protocol``.
+
+    At most ``max_per_device`` sessions are open to one device and at most
+    ``max_total`` overall; when the global limit is reached, the least
+    recently used idle session of another device is closed to make room.
+    Idle sessions are reused after a liveness check and closed once they
+    have been idle for ``idle_timeout`` seconds. Commands sent through
+    ``send_command`` are retried once on a fresh session when a pooled
+    session turns out to be dead.
+
+    Sessions belong to the event loop that opened them, so the pool must
+    only be used from the application's event loop.
+    """
+    def __init__(self, max_per_device: Optional[int] = None, max_total: Optional[int] = None,
+                 idle_timeout: Optional[float] = None, connect_timeout: Optional[float] = None,
+                 command_timeout: Optional[float] = None, liveness_check_after: Optional[float] = None,
+                 credentials: Callable[[DeviceTarget], Tuple[str, str]] = default_credentials):
+        self.max_per_device = max_per_device or config.MAX_CONNECTIONS_PER_DEVICE
+        self.max_total = max_total or config.MAX_CONCURRENT_CONNECTIONS
+        self.idle_timeout = idle_timeout or config.CONNECTION_IDLE_TIMEOUT
+        self.connect_timeout = connect_timeout or config.CONNECTION_TIMEOUT
+        self.command_timeout = command_timeout or config.COMMAND_TIMEOUT
+        self.liveness_check_after = (
+            config.CONNECTION_LIVENESS_CHECK_AFTER if liveness_check_after is None else liveness_check_after
+        )
+        self.credentials = credentials
+
+        self._idle: Dict[str, List[DeviceSession]] = defaultdict(list)
+        self._open: Dict[str, int] = defaultdict(int)
+        self._open_total = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._reaper = None
+        # Evicted sessions being closed in the background
+        self._closing: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.evictions = 0
+        self.failures = 0
+
+    @property
+    def _lock(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _pop_lru_idle(self, exclude_key: str) -> Optional[DeviceSession]:
+        oldest = None
+        for key, sessions in self._idle.items():
+            if key != exclude_key and sessions and (oldest is None or sessions[0].last_used < oldest.last_used):
+                oldest = sessions[0]
+        if oldest is not None:
+            self._idle[oldest.target.key].remove(oldest)
+        return oldest
+
+    def _forget(self, session: DeviceSession):
+        # Caller holds the lock
+        self._open[session.target.key] -= 1
+        if not self._open[session.target.key]:
+            del self._open[session.target.key]
+        self._open_total -= 1
+
+    def _close_in_background(self, session: DeviceSession):
+        # Caller holds the lock; the task is kept so it is not garbage collected half way
+        task = asyncio.get_running_loop().create_task(session.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closed)
+
+    def _closed(self, task: asyncio.Task):
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            network_logger.warning(f"Closing an evicted session failed: {str(task.exception())}")
+
+    async def _discard(self, session: DeviceSession):
+        async with self._lock:
+            self._forget(session)
+            self._lock.notify_all()
+        await session.close()
+
+    async def _reserve(self, target: DeviceTarget) -> Optional[DeviceSession]:
+        """
+        Take an idle session for the target, or reserve a slot for a new one (returns None)
+        """
+        key = target.key
+        async with self._lock:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    # Most recently used first, it is the most likely to still be alive
+                    return idle.pop()
+                if self._open[key] < self.max_per_device:
+                    if self._open_total < self.max_total:
+                        self._open[key] += 1
+                        self._open_total += 1
+                        return None
+                    victim = self._pop_lru_idle(key)
+                    if victim is not None:
+                        self._forget(victim)
+                        self.evictions += 1
+                        self._close_in_background(victim)
+                        continue
+                await self._lock.wait()
+
+    async def _connect(self, target: DeviceTarget) -> DeviceSession:
+        session_type = SESSION_TYPES.get(target.protocol)
+        if session_type is None:
+            raise DeviceConnectionException(f"Unsupported protocol: {target.protocol}")
+        username, password = self.credentials(target)
+        if target.password is not None:
+            password = target.password
+        session = session_type(target, username, password)
+        started = time.monotonic()
+        try:
+            await session.open(self.connect_timeout)
+        except BaseException:
+            await session.close()
+            raise
+        log_network_activity("connect", target.ip_address, f"{target.protocol}:{time.monotonic() - started:.3f}s",
+                             target.device_id)
+        return session
+
+    async def acquire(self, target: DeviceTarget) -> DeviceSession:
+        """
+        Get a live session for the target, reusing an idle one when possible
+        """
+        self.start_reaper()
+        while True:
+            session = await self._reserve(target)
+            if session is None:
+                break
+            if await session.is_alive(self.liveness_check_after, self.connect_timeout):
+                self.hits += 1
+                return session
+            self.reconnects += 1
+            await self._discard(session)
+
+        self.misses += 1
+        try:
+            return await self._connect(target)
+        except BaseException:
+            self.failures += 1
+            async with self._lock:
+                self._open[target.key] -= 1
+                if not self._open[target.key]:
+                    del self._open[target.key]
+                self._open_total -= 1
+                self._lock.notify_all()
+            raise
+
+    async def release(self, session: DeviceSession):
+        """
+        Return a session to the pool; broken sessions are closed
+        """
+        if session.broken or session.is_closed():
+            await self._discard(session)
+            return
+        async with self._lock:
+            self._idle[session.target.key].append(session)
+            self._lock.notify_all()
+
+    @asynccontextmanager
+    async def session(self, target: DeviceTarget) -> AsyncIterator[DeviceSession]:
+        """
+        Borrow a session for several commands
+        """
+        session = await self.acquire(target)
+        try:
+            yield session
+        except BaseException:
+            # The session may be halfway through a command
+            session.broken = True
+            raise
+        finally:
+            await self.release(session)
+
+    async def send_command(self, target: DeviceTarget, command: str, timeout: Optional[float] = None) -> str:
+        """
+        Run one command on a pooled session, reconnecting once if the pooled session died
+        """
+        timeout = timeout or self.command_timeout
+        for attempt in range(2):
+            session = await self.acquire(target)
+            reused = session.uses > 0
+            try:
+                output = await session.send_command(command, timeout)
+            except DeviceConnectionException:
+                session.broken = True
+                await self.release(session)
+                if attempt or not reused:
+                    raise
+                self.reconnects += 1
+                continue
+            except BaseException:
+                session.broken = True
+                await self.release(session)
+                raise
+            await self.release(session)
+            return output
+
+    async def send_commands(self, target: DeviceTarget, commands: List[str], timeout: Optional[float] = None) -> List[str]:
+        """
+        Run several commands in order on one session
+        """
+        timeout = timeout or self.command_timeout
+        async with self.session(target) as session:
+            return await session.send_commands(commands, timeout)
+
+    async def evict_idle(self) -> int:
+        """
+        Close sessions that have been idle for longer than the idle timeout
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        async with self._lock:
+            for key in list(self._idle):
+                sessions = self._idle[key]
+                keep = [session for session in sessions if session.last_used >= cutoff]
+                expired.extend(session for session in sessions if session.last_used < cutoff)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+            for session in expired:
+                self._forget(session)
+            if expired:
+                self._lock.notify_all()
+        for session in expired:
+            await session.close()
+        self.evictions += len(expired)
+        return len(expired)
+
+    def start_reaper(self):
+        """
+        Start idle eviction on the running event loop
+        """
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._run_reaper())
+
+    async def _run_reaper(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                network_logger.error(f"Connection pool eviction failed: {str(e)}")
+
+    async def close_all(self):
+        """
+        Close every idle session and stop idle eviction
+        """
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        async with self._lock:
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle.clear()
+            for session in sessions:
+                self._forget(session)
+            self._lock.notify_all()
+        await asyncio.gather(*(session.close() for session in sessions), *self._closing, return_exceptions=True)
+        # A new event loop needs a new condition
+        self._condition = None
+
+    def stats(self) -> ConnectionPoolStats:
+        """
+        Return pool size and reuse counters
+        """
+        lookups = self.hits + self.misses
+        return ConnectionPoolStats(
+            open=self._open_total,
+            idle=sum(len(sessions) for sessions in self._idle.values()),
+            devices=len(self._open),
+            max_total=self.max_total,
+            max_per_device=self.max_per_device,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            reconnects=self.reconnects,
+            evictions=self.evictions,
+            failures=self.failures
+        )
+
+# Global instance used by network automation features
+connection_pool = ConnectionPool()
@@ -0,0 +1,136 @@
+import json
+from difflib import SequenceMatcher
+from typing import List, Optional, Sequence, Tuple
+
+from ..utils.exceptions import ConfigurationException
+
+# A delta turns one list of lines into another. It is a list of hunks
+# ``(start, old_lines, new_lines)`` ordered by ``start``, the 0-based index of
+# the first replaced line in the old version. Hunks carry the lines they
+# replace as well as the new ones, so a delta can be checked while it is
+# applied and inverted without the old version at hand.
+Hunk = Tuple[int, List[str], List[str]]
+Delta = List[Hunk]
+
+def split_lines(content: str) -> List[str]:
+    return content.split("\n")
+
+def join_lines(lines: Sequence[str]) -> str:
+    return "\n".join(lines)
+
+def compute_delta(old: Sequence[str], new: Sequence[str]) -> Delta:
+    """
+    Line-level delta from ``old`` to ``new``
+    """
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    return [
+        (i1, list(old[i1:i2]), list(new[j1:j2]))
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+def apply_delta(lines: Sequence[str], delta: Delta) -> List[str]:
+    """
+    Apply ``delta`` to ``lines``. Raises ConfigurationException when the
+    lines a hunk replaces are not the ones it expects.
+    """
+    result: List[str] = []
+    cursor = 0
+    for start, old_lines, new_lines in delta:
+        end = start + len(old_lines)
+        if start < cursor or list(lines[start:end]) != old_lines:
+            raise ConfigurationException(f"Delta does not apply at line {start + 1}")
+        result.extend(lines[cursor:start])
+        result.extend(new_lines)
+        cursor = end
+    result.extend(lines[cursor:])
+    return result
+
+def invert_delta(delta: Delta) -> Delta:
+    """
+    Delta that undoes ``delta``
+    """
+    inverted: Delta = []
+    offset = 0
+    for start, old_lines, new_lines in delta:
+        inverted.append((start + offset, new_lines, old_lines))
+        offset += len(new_lines) - len(old_lines)
+    return inverted
+
+def compose_deltas(first: Delta, second: Delta) -> Delta:
+    """
+    Single delta equivalent to applying ``first`` and then ``second``.
+
+    Works on the hunks only: the intermediate version is never rebuilt, so the
+    cost depends on the size of the changes rather than of the configuration.
+    Hunks of both deltas are placed on the intermediate version, overlapping or
+    touching ones are merged, and each merged group becomes one hunk whose lines
+    are taken from the hunks themselves.
+    """
+    if not first:
+        return list(second)
+    if not second:
+        return list(first)
+
+    # Spans on the intermediate version: (start, end, which delta, hunk)
+    spans = []
+    offset = 0
+    for start, old_lines, new_lines in first:
+        spans.append((start + offset, start + offset + len(new_lines), 0, (start + offset, old_lines, new_lines)))
+        offset += len(new_lines) - len(old_lines)
+    for start, old_lines, new_lines in second:
+        spans.append((start, start + len(old_lines), 1, (start, old_lines, new_lines)))
+    spans.sort(key=lambda span: (span[0], span[1], span[2]))
+
+    composed: Delta = []
+    offset = 0  # shift of the intermediate version against the original before the current group
+    index = 0
+    while index < len(spans):
+        group_start, group_end = spans[index][0], spans[index][1]
+        group = [spans[index]]
+        index += 1
+        while index < len(spans) and spans[index][0] <= group_end:
+            group_end = max(group_end, spans[index][1])
+            group.append(spans[index])
+            index += 1
+
+        # Intermediate lines of the group; every position lies in some hunk
+        middle: List[Optional[str]] = [None] * (group_end - group_start)
+        for start, _, which, (_, old_lines, new_lines) in group:
+            lines = new_lines if which == 0 else old_lines
+            middle[start - group_start:start - group_start + len(lines)] = lines
+
+        old_group: List[str] = []
+        new_group: List[str] = []
+        for which, target, source in ((0, old_group, 1), (1, new_group, 2)):
+            cursor = group_start
+            for start, end, span_which, hunk in group:
+                if span_which != which:
+                    continue
+                target.extend(middle[cursor - group_start:start - group_start])
+                target.extend(hunk[source])
+                cursor = end
+            target.extend(middle[cursor - group_start:])
+
+        shift = sum(len(hunk[2]) - len(hunk[1]) for _, _, which, hunk in group if which == 0)
+        if old_group != new_group:
+            composed.append((group_start - offset, old_group, new_group))
+        offset += shift
+    return composed
+
+def compose_all(deltas: Sequence[Delta]) -> Delta:
+    """
+    Compose consecutive deltas into one
+    """
+    result: Delta = []
+    for delta in deltas:
+        result = compose_deltas(result, delta)
+    return result
+
+def encode_delta(delta: Delta) -> str:
+    return json.dumps([[start, old_lines, new_lines] for start, old_lines, new_lines in delta], separators=(",", ":"))
+
+def decode_delta(encoded: Optional[str]) -> Delta:
+    if not encoded:
+        return []
+    return [(start, old_lines, new_lines) for start, old_lines, new_lines in json.loads(encoded)]
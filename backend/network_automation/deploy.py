@@ -0,0 +1,346 @@
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from ..database.connection import SessionLocal
+from ..database.models import Configuration, Device
+from ..utils.config import config
+from ..utils.exceptions import ConfigurationException, ConfigurationNotFoundException, ValidationException
+from ..utils.logger import log_db_operation, log_network_activity, network_logger
+from .config_store import hash_config
+from .connection_pool import ConnectionPool, DeviceTarget, connection_pool
+from .schemas import ConfigDeploymentError, ConfigDeploymentResult, ConfigDeploymentWave
+
+# Configuration.status values used by deployments
+# A failed rollout can be retried, or sent on to the devices it did not reach
+DEPLOYABLE_STATUSES = ("validated", "deployed", "failed")
+DEPLOYING_STATUS = "deploying"
+DEPLOYED_STATUS = "deployed"
+FAILED_STATUS = "failed"
+
+# IOS answers a rejected line with one of these
+CLI_ERROR = re.compile(
+    r"^\s*%\s*(?:Invalid input|Incomplete command|Ambiguous command|Unknown command|Unrecognized command|Error)",
+    re.MULTILINE
+)
+
+# Lines of a stored configuration that must not be replayed in configuration mode
+SKIPPED_LINE = re.compile(r"^(?:!.*|end|conf(?:igure)?(?: t(?:erminal)?)?|Building configuration.*|Current configuration.*)$")
+
+# Commands followed by free text up to a delimiter: the delimiter after a banner
+# type (shown as ^C for Ctrl-C), or a line holding only @ after a macro name
+BANNER_START = re.compile(r"^banner\s+\S+\s+(\^.|\S)")
+MACRO_START = re.compile(r"^macro\s+name\s+\S+$")
+
+MAX_REPORTED_ERRORS = 1000
+
+def config_lines(content: str) -> List[str]:
+    """
+    Configuration commands to enter, without comments, blank lines and mode
+    changes. A banner or macro is returned as one entry spanning several
+    lines, with its text kept exactly as stored.
+    """
+    lines: List[str] = []
+    block: Optional[List[str]] = None
+    ends_block: Callable[[str], bool] = lambda raw: False
+    for raw in content.replace("\r", "").split("\n"):
+        if block is not None:
+            block.append(raw)
+            if ends_block(raw):
+                lines.append("\n".join(block))
+                block = None
+            continue
+        line = raw.strip()
+        if not line or SKIPPED_LINE.match(line):
+            continue
+        banner = BANNER_START.match(line)
+        if banner and line.count(banner.group(1)) == 1:
+            block, ends_block = [line], (lambda raw, delimiter=banner.group(1): delimiter in raw)
+        elif MACRO_START.match(line):
+            block, ends_block = [line], (lambda raw: raw.strip() == "@")
+        else:
+            lines.append(line)
+    if block is not None:
+        lines.append("\n".join(block))
+    return lines
+
+def push_batches(lines: List[str], size: int) -> List[List[str]]:
+    """
+    Group configuration lines ``size`` at a time for pipelining; the device
+    shows no prompt inside a banner or macro, so each of those goes alone
+    """
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    for line in lines:
+        if "\n" in line:
+            if batch:
+                batches.append(batch)
+                batch = []
+            batches.append([line])
+            continue
+        batch.append(line)
+        if len(batch) >= size:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+    return batches
+
+def plan_waves(count: int, wave_size: int, canary_size: int) -> List[int]:
+    """
+    Wave sizes for ``count`` devices: a canary wave, then waves of ``wave_size``
+    """
+    sizes = []
+    if canary_size and count:
+        sizes.append(min(canary_size, count))
+        count -= sizes[0]
+    while count > 0:
+        sizes.append(min(wave_size, count))
+        count -= sizes[-1]
+    return sizes
+
+def _check_outputs(commands: List[str], outputs: List[str]) -> Optional[str]:
+    for command, output in zip(commands, outputs):
+        if CLI_ERROR.search(output):
+            return f"'{command}' was rejected: {output.strip().splitlines()[-1]}"
+    return None
+
+async def deploy_to_device(target: DeviceTarget, lines: List[str], checks: List[str], save: bool,
+                           device_timeout: float, pool: ConnectionPool) -> Optional[Tuple[str, str]]:
+    """
+    Pre-check, push and post-check one device on a single session.
+    Returns ``(stage, error)`` on failure, None on success.
+    Configuration lines are pushed ``DEPLOY_PUSH_BATCH`` at a time and the
+    push stops at the first rejected line, before the change is saved.
+    """
+    stage = "connect"
+    push_batch = max(1, config.DEPLOY_PUSH_BATCH)
+
+    async def run() -> Optional[Tuple[str, str]]:
+        nonlocal stage
+        async with pool.session(target) as session:
+            if checks:
+                stage = "pre-check"
+                error = _check_outputs(checks, await session.send_commands(checks))
+                if error:
+                    return stage, error
+            stage = "push"
+            error = _check_outputs(["configure terminal"], [await session.send_command("configure terminal")])
+            if error:
+                return stage, error
+            # Lines after a rejected one must not be applied, so only a few are typed ahead
+            for batch in push_batches(lines, push_batch):
+                error = _check_outputs(batch, await session.send_commands(batch))
+                if error:
+                    # Left in configuration mode; not fit to go back to the pool
+                    session.broken = True
+                    return stage, error
+            error = _check_outputs(["end"], [await session.send_command("end")])
+            if error:
+                return stage, error
+            if save:
+                stage = "save"
+                error = _check_outputs(["write memory"], [await session.send_command("write memory")])
+                if error:
+                    return stage, error
+            if checks:
+                stage = "post-check"
+                error = _check_outputs(checks, await session.send_commands(checks))
+                if error:
+                    return stage, error
+        return None
+
+    try:
+        failure = await asyncio.wait_for(run(), device_timeout)
+    except asyncio.TimeoutError:
+        failure = stage, f"Device did not finish within {device_timeout}s"
+    except Exception as e:
+        failure = stage, str(e)
+    log_network_activity("deploy-config", target.ip_address, "success" if failure is None else "error",
+                         target.device_id)
+    return failure
+
+def claim_configuration(db: Session, configuration_id: int) -> Configuration:
+    """
+    Mark a validated configuration as deploying. The conditional UPDATE makes
+    sure only one deployment of a configuration runs at a time.
+    """
+    claimed = db.execute(
+        update(Configuration)
+        .where(Configuration.id == configuration_id, Configuration.status.in_(DEPLOYABLE_STATUSES))
+        .values(status=DEPLOYING_STATUS)
+    ).rowcount
+    db.commit()
+    configuration = db.query(Configuration).filter(Configuration.id == configuration_id).first()
+    if configuration is None:
+        raise ConfigurationNotFoundException(f"Configuration with ID {configuration_id} not found")
+    if not claimed:
+        raise ConfigurationException(
+            f"Configuration {configuration_id} is {configuration.status}; only validated, deployed or failed configurations can be deployed"
+        )
+    if not configuration.content:
+        configuration.status = FAILED_STATUS
+        db.commit()
+        raise ConfigurationException(f"Configuration {configuration_id} has no content")
+    log_db_operation("UPDATE", "configurations", configuration_id)
+    return configuration
+
+def own_device_target(db: Session, configuration_id: int) -> List[DeviceTarget]:
+    """
+    Target for the device a configuration was written for
+    """
+    configuration = db.query(Configuration).filter(Configuration.id == configuration_id).first()
+    if configuration is None:
+        raise ConfigurationNotFoundException(f"Configuration with ID {configuration_id} not found")
+    device = db.query(Device).filter(Device.id == configuration.device_id).first()
+    if device is None:
+        raise ConfigurationException("Configuration is not linked to a device; select target devices")
+    return [DeviceTarget.from_device(device)]
+
+def record_deployed(db: Session, configuration: Configuration, device_ids: List[int], deployed_at: datetime):
+    """
+    Record one deployed configuration row per device, except the configuration's own device
+    """
+    rows = [
+        {
+            "device_id": device_id,
+            "content": configuration.content,
+            "content_hash": hash_config(configuration.content),
+            "status": DEPLOYED_STATUS,
+            "created_at": deployed_at,
+            "validated_at": configuration.validated_at,
+            "deployed_at": deployed_at,
+        }
+        for device_id in device_ids
+        if device_id != configuration.device_id
+    ]
+    if rows:
+        db.execute(insert(Configuration), rows)
+    db.commit()
+    log_db_operation("INSERT", "configurations", f"deployed:{len(rows)}")
+
+def finish_configuration(db: Session, configuration_id: int, status: str, deployed_at: Optional[datetime]):
+    values = {"status": status}
+    if deployed_at is not None:
+        values["deployed_at"] = deployed_at
+    db.execute(update(Configuration).where(Configuration.id == configuration_id).values(**values))
+    db.commit()
+    log_db_operation("UPDATE", "configurations", configuration_id)
+
+async def deploy_configuration(configuration_id: int, targets: Optional[List[DeviceTarget]] = None,
+                               wave_size: Optional[int] = None, canary_size: Optional[int] = None,
+                               concurrency: Optional[int] = None, failure_threshold: Optional[float] = None,
+                               checks: Optional[List[str]] = None, save: bool = True,
+                               device_timeout: Optional[float] = None, session_factory: Callable = SessionLocal,
+                               pool: Optional[ConnectionPool] = None) -> ConfigDeploymentResult:
+    """
+    Roll a validated configuration out to many devices in waves.
+
+    The first wave is a small canary, later waves hold ``wave_size`` devices.
+    Inside a wave up to ``concurrency`` devices are checked, configured and
+    checked again at the same time. After each wave the share of failed
+    devices so far is compared with ``failure_threshold`` and the rollout
+    stops when it is exceeded, so a bad change reaches at most one wave more
+    than it should. Devices configured successfully are recorded after every
+    wave, and the configuration ends up ``deployed`` or ``failed``.
+
+    Without ``targets`` the configuration is deployed to its own device.
+    """
+    wave_size = wave_size or config.DEPLOY_WAVE_SIZE
+    canary_size = config.DEPLOY_CANARY_SIZE if canary_size is None else canary_size
+    concurrency = concurrency or config.DEPLOY_CONCURRENCY
+    failure_threshold = config.DEPLOY_FAILURE_THRESHOLD if failure_threshold is None else failure_threshold
+    checks = config.DEPLOY_CHECK_COMMANDS if checks is None else checks
+    device_timeout = device_timeout or config.DEPLOY_DEVICE_TIMEOUT
+    pool = pool or connection_pool
+    if targets is not None and not targets:
+        raise ValidationException("No devices selected")
+
+    def db_call(function, *args):
+        db = session_factory()
+        try:
+            return function(db, *args)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    if targets is None:
+        targets = await asyncio.to_thread(db_call, own_device_target, configuration_id)
+    configuration = await asyncio.to_thread(db_call, claim_configuration, configuration_id)
+    started = time.monotonic()
+    lines = config_lines(configuration.content)
+    succeeded = failed = 0
+    waves: List[ConfigDeploymentWave] = []
+    errors: List[ConfigDeploymentError] = []
+    aborted = False
+
+    try:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def deploy(target: DeviceTarget) -> Optional[Tuple[str, str]]:
+            async with semaphore:
+                return await deploy_to_device(target, lines, checks, save, device_timeout, pool)
+
+        position = 0
+        for index, size in enumerate(plan_waves(len(targets), wave_size, canary_size)):
+            wave = targets[position:position + size]
+            position += size
+            wave_started = time.monotonic()
+            failures = await asyncio.gather(*(deploy(target) for target in wave))
+
+            deployed = [target.device_id for target, failure in zip(wave, failures) if failure is None]
+            for target, failure in zip(wave, failures):
+                if failure is not None and len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(ConfigDeploymentError(
+                        device_id=target.device_id,
+                        device_name=target.name or target.ip_address,
+                        stage=failure[0],
+                        error=failure[1]
+                    ))
+            succeeded += len(deployed)
+            failed += len(wave) - len(deployed)
+            if deployed:
+                await asyncio.to_thread(db_call, record_deployed, configuration, deployed, datetime.now(timezone.utc))
+            waves.append(ConfigDeploymentWave(
+                index=index,
+                size=len(wave),
+                succeeded=len(deployed),
+                failed=len(wave) - len(deployed),
+                duration=time.monotonic() - wave_started
+            ))
+            network_logger.info(
+                f"Deployment of configuration {configuration_id}: wave {index} done, "
+                f"{succeeded} succeeded and {failed} failed so far"
+            )
+            if position < len(targets) and failed / position > failure_threshold:
+                aborted = True
+                network_logger.warning(
+                    f"Deployment of configuration {configuration_id} stopped after wave {index}: "
+                    f"{failed} of {position} devices failed"
+                )
+                break
+    finally:
+        status = DEPLOYED_STATUS if succeeded == len(targets) else FAILED_STATUS
+        deployed_at = datetime.now(timezone.utc) if status == DEPLOYED_STATUS else None
+        await asyncio.to_thread(db_call, finish_configuration, configuration_id, status, deployed_at)
+
+    return ConfigDeploymentResult(
+        configuration_id=configuration_id,
+        status=status,
+        aborted=aborted,
+        total=len(targets),
+        succeeded=succeeded,
+        failed=failed,
+        skipped=len(targets) - succeeded - failed,
+        waves=waves,
+        duration=time.monotonic() - started,
+        errors=errors,
+        errors_truncated=failed > len(errors)
+    )
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from typing import AsyncIterator, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database.models import Device
+from ..devices.service import filter_devices
+from ..utils.config import config
+from ..utils.exceptions import ValidationException
+from ..utils.logger import log_db_operation, log_network_activity
+from .connection_pool import ConnectionPool, DeviceTarget, connection_pool
+from .schemas import CommandOutput, DeviceCommandResult, DeviceSelector
+
+def validate_commands(commands: List[str]) -> List[str]:
+    """
+    Only allow read-only commands: the runner must never change device configuration
+    """
+    allowed = tuple(prefix.strip() for prefix in config.COMMAND_RUN_ALLOWED_PREFIXES if prefix.strip())
+    cleaned = [command.strip() for command in commands]
+    for command in cleaned:
+        # Any control character could end the line early on the device: a CR is Enter on a pty
+        if not command or not command.isprintable():
+            raise ValidationException("Commands must be single, non-empty lines without control characters")
+        if not command.startswith(allowed):
+            raise ValidationException(f"Command not allowed: {command}")
+    return cleaned
+
+def select_devices(db: Session, selector: Optional[DeviceSelector],
+                   max_devices: Optional[int] = config.COMMAND_RUN_MAX_DEVICES) -> List[DeviceTarget]:
+    """
+    Resolve a device selector to connection targets.
+    A selector of None selects every device; ``max_devices`` of None lifts the size cap.
+    """
+    if selector is not None and not selector.device_ids and selector.filters is None:
+        raise ValidationException("Select devices by id or with filters")
+    query = db.query(
+        Device.id, Device.name, Device.ip_address, Device.port, Device.protocol, Device.device_type, Device.username
+    )
+    if selector is not None:
+        if selector.device_ids:
+            query = query.filter(Device.id.in_(selector.device_ids))
+        query = filter_devices(query, selector.filters)
+
+    log_db_operation("SELECT", "devices", "command-run")
+    query = query.order_by(Device.id)
+    if max_devices is None:
+        rows = query.all()
+    else:
+        rows = query.limit(max_devices + 1).all()
+        if len(rows) > max_devices:
+            raise ValidationException(f"Selector matches more than {max_devices} devices")
+
+    return [
+        DeviceTarget(ip_address, port, protocol or "ssh", device_type, username, device_id=device_id, name=name)
+        for device_id, name, ip_address, port, protocol, device_type, username in rows
+    ]
+
+async def run_on_device(target: DeviceTarget, commands: List[str], device_timeout: float,
+                        pool: ConnectionPool) -> DeviceCommandResult:
+    """
+    Run the commands in order on one device within its deadline.
+    The deadline starts once a session is held: waiting for a free pool slot
+    is not the device's fault, and connecting has its own timeout.
+    """
+    started = time.monotonic()
+    outputs: List[CommandOutput] = []
+
+    async def run():
+        async with pool.session(target) as session:
+            results = await asyncio.wait_for(session.send_commands(commands), device_timeout)
+        outputs.extend(CommandOutput(command=command, output=output) for command, output in zip(commands, results))
+
+    status, error = "success", None
+    try:
+        await run()
+    except asyncio.TimeoutError:
+        status, error = "timeout", f"Device did not finish within {device_timeout}s"
+    except Exception as e:
+        status, error = "error", str(e)
+    log_network_activity("command-run", target.ip_address, status, target.device_id)
+
+    return DeviceCommandResult(
+        device_id=target.device_id,
+        device_name=target.name or target.ip_address,
+        ip_address=target.ip_address,
+        status=status,
+        outputs=outputs,
+        error=error,
+        duration=time.monotonic() - started
+    )
+
+async def run_commands(targets: Iterable[DeviceTarget], commands: List[str], concurrency: Optional[int] = None,
+                       device_timeout: Optional[float] = None,
+                       pool: Optional[ConnectionPool] = None) -> AsyncIterator[DeviceCommandResult]:
+    """
+    Run commands on many devices and yield each device's result as soon as it completes.
+
+    At most ``concurrency`` devices are worked on at once, and finished
+    results wait in a queue of the same size, so a slow consumer holds back
+    the workers instead of the whole fleet's output piling up in memory.
+    Closing the iterator (for example when the client disconnects) cancels
+    the devices still in progress.
+    """
+    concurrency = concurrency or config.COMMAND_RUN_CONCURRENCY
+    device_timeout = device_timeout or config.COMMAND_RUN_DEVICE_TIMEOUT
+    pool = pool or connection_pool
+
+    pending = iter(targets)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+    async def worker():
+        for target in pending:
+            await results.put(await run_on_device(target, commands, device_timeout, pool))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    done = asyncio.gather(*workers)
+    getter = None
+    try:
+        while True:
+            getter = asyncio.ensure_future(results.get())
+            await asyncio.wait([getter, done], return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            done.result()  # re-raise unexpected worker failures
+            while not results.empty():
+                yield results.get_nowait()
+            break
+    finally:
+        if getter is not None:
+            getter.cancel()
+        done.cancel()
+        await asyncio.gather(done, return_exceptions=True)
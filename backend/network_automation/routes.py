@@ -0,0 +1,139 @@
+import time
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database.connection import get_db
+from ..utils.exceptions import ConfigurationException, ConfigurationNotFoundException, ValidationException
+from ..utils.logger import log_api_request
+from .backup import BACKUP_STATUS
+from .config_search import config_search
+from .config_store import diff_config_versions, get_config_version, list_config_versions
+from .connection_pool import connection_pool
+from .executor import run_commands, select_devices, validate_commands
+from .schemas import (
+    CommandRunRequest, CommandRunSummary, ConfigDiff, ConfigSearchResult, ConfigVersion, ConfigVersionContent,
+    ConnectionPoolStats
+)
+
+router = APIRouter()
+
+@router.post("/commands/run")
+async def run_device_commands(request: CommandRunRequest, db: Session = Depends(get_db)):
+    """
+    Run read-only commands on the selected devices.
+    Streams one NDJSON line per device as it finishes, followed by a summary line.
+    """
+
+    try:
+        commands = validate_commands(request.commands)
+        targets = await run_in_threadpool(select_devices, db, request.selector)
+    except ValidationException as e:
+        log_api_request("POST", "/network-automation/commands/run", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def stream():
+        started = time.monotonic()
+        succeeded = failed = 0
+        async for result in run_commands(targets, commands, request.concurrency, request.device_timeout):
+            if result.status == "success":
+                succeeded += 1
+            else:
+                failed += 1
+            yield result.model_dump_json() + "\n"
+        summary = CommandRunSummary(
+            total=len(targets),
+            succeeded=succeeded,
+            failed=failed,
+            duration=time.monotonic() - started
+        )
+        yield summary.model_dump_json() + "\n"
+
+    log_api_request("POST", "/network-automation/commands/run", status.HTTP_200_OK)
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/connections/stats", response_model=ConnectionPoolStats)
+def read_connection_pool_stats():
+    """
+    Retrieve device connection pool statistics
+    """
+
+    log_api_request("GET", "/network-automation/connections/stats", status.HTTP_200_OK)
+    return connection_pool.stats()
+
+@router.get("/configs/search", response_model=ConfigSearchResult)
+def search_configs(
+    q: str = Query(..., min_length=1, description="Text or regular expression to find"),
+    mode: str = Query("text", pattern="^(text|regex)$"),
+    scope: str = Query("latest", pattern="^(latest|history)$", description="Latest version of each device or all versions"),
+    ignore_case: bool = False,
+    config_status: str = Query(BACKUP_STATUS, alias="status"),
+    limit: int = Query(100, ge=1, le=10000, description="Maximum number of matching versions"),
+    db: Session = Depends(get_db)
+):
+    """
+    Find devices whose stored configuration has lines matching a query, with line numbers
+    """
+
+    try:
+        result = config_search.search(db, q, mode, scope, config_status, ignore_case, limit)
+        log_api_request("GET", "/network-automation/configs/search", status.HTTP_200_OK)
+        return result
+    except ValidationException as e:
+        log_api_request("GET", "/network-automation/configs/search", status.HTTP_400_BAD_REQUEST)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ConfigurationException as e:
+        log_api_request("GET", "/network-automation/configs/search", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/devices/{device_id}/configs", response_model=List[ConfigVersion])
+def read_config_versions(device_id: int, config_status: str = Query(BACKUP_STATUS, alias="status"),
+                         db: Session = Depends(get_db)):
+    """
+    List the stored configuration versions of a device, newest first
+    """
+
+    versions = list_config_versions(db, device_id, config_status)
+    log_api_request("GET", f"/network-automation/devices/{device_id}/configs", status.HTTP_200_OK)
+    return versions
+
+@router.get("/devices/{device_id}/configs/diff", response_model=ConfigDiff)
+def read_config_diff(device_id: int, from_version: int = Query(..., ge=1), to_version: int = Query(..., ge=1),
+                     config_status: str = Query(BACKUP_STATUS, alias="status"), db: Session = Depends(get_db)):
+    """
+    Line diff between two configuration versions of a device
+    """
+
+    url = f"/network-automation/devices/{device_id}/configs/diff"
+    try:
+        diff = diff_config_versions(db, device_id, from_version, to_version, config_status)
+        log_api_request("GET", url, status.HTTP_200_OK)
+        return diff
+    except ConfigurationNotFoundException as e:
+        log_api_request("GET", url, status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ConfigurationException as e:
+        log_api_request("GET", url, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/devices/{device_id}/configs/{version}", response_model=ConfigVersionContent)
+def read_config_version(device_id: int, version: int, config_status: str = Query(BACKUP_STATUS, alias="status"),
+                        db: Session = Depends(get_db)):
+    """
+    Retrieve the full text of one configuration version of a device
+    """
+
+    url = f"/network-automation/devices/{device_id}/configs/{version}"
+    try:
+        content = get_config_version(db, device_id, version, config_status)
+        log_api_request("GET", url, status.HTTP_200_OK)
+        return content
+    except ConfigurationNotFoundException as e:
+        log_api_request("GET", url, status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ConfigurationException as e:
+        log_api_request("GET", url, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -0,0 +1,213 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from ..devices.schemas import DeviceFilter
+
+class ConnectionPoolStats(BaseModel):
+    """
+    Schema for CLI connection pool statistics
+    """
+    open: int
+    idle: int
+    devices: int
+    max_total: int
+    max_per_device: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    reconnects: int
+    evictions: int
+    failures: int
+
+class DeviceSelector(BaseModel):
+    """
+    Schema for choosing devices either by id or with device list filters
+    """
+    device_ids: Optional[List[int]] = Field(None, example=[1, 2, 3])
+    filters: Optional[DeviceFilter] = None
+
+class CommandRunRequest(BaseModel):
+    """
+    Schema for running CLI commands on many devices
+    """
+    selector: DeviceSelector
+    commands: List[str] = Field(..., min_length=1, example=["show ip bgp summary"])
+    concurrency: Optional[int] = Field(None, ge=1, le=500, example=50, description="Devices worked on at the same time")
+    device_timeout: Optional[float] = Field(None, gt=0, example=60, description="Seconds allowed per device")
+
+class CommandOutput(BaseModel):
+    """
+    Schema for the output of one command
+    """
+    command: str
+    output: str
+
+class DeviceCommandResult(BaseModel):
+    """
+    Schema for the outcome of a command run on one device, one NDJSON line per device
+    """
+    type: str = "result"
+    device_id: int
+    device_name: str
+    ip_address: str
+    status: str  # success, error, timeout
+    outputs: List[CommandOutput] = []
+    error: Optional[str] = None
+    duration: float
+
+class CommandRunSummary(BaseModel):
+    """
+    Schema for the final NDJSON line of a command run
+    """
+    type: str = "summary"
+    total: int
+    succeeded: int
+    failed: int
+    duration: float
+
+class ConfigBackupRequest(BaseModel):
+    """
+    Schema for a running-config backup job; without a selector every device is backed up
+    """
+    selector: Optional[DeviceSelector] = None
+    concurrency: Optional[int] = Field(None, ge=1, le=500, example=100)
+    device_timeout: Optional[float] = Field(None, gt=0, example=300)
+
+class ConfigBackupError(BaseModel):
+    """
+    Schema for a device whose configuration could not be backed up
+    """
+    device_id: int
+    device_name: str
+    error: str
+
+class ConfigBackupResult(BaseModel):
+    """
+    Schema for the outcome of a running-config backup job
+    """
+    total: int
+    stored: int = Field(..., description="Devices whose configuration changed and was stored")
+    unchanged: int = Field(..., description="Devices whose configuration matched the latest backup")
+    failed: int
+    duration: float
+    errors: List[ConfigBackupError] = []
+    errors_truncated: bool = False
+
+class ConfigVersion(BaseModel):
+    """
+    Schema for one stored version of a device configuration
+    """
+    version: int
+    content_hash: Optional[str] = None
+    is_snapshot: bool
+    created_at: Optional[datetime] = None
+
+class ConfigVersionContent(ConfigVersion):
+    """
+    Schema for a device configuration version with its full text
+    """
+    content: str
+
+class ConfigDiffHunk(BaseModel):
+    """
+    Schema for one changed block; line numbers are 1-based
+    """
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    removed: List[str]
+    added: List[str]
+
+class ConfigDiff(BaseModel):
+    """
+    Schema for the line diff between two versions of a device configuration
+    """
+    device_id: int
+    from_version: int
+    to_version: int
+    lines_added: int
+    lines_removed: int
+    hunks: List[ConfigDiffHunk] = []
+
+class ConfigSearchLine(BaseModel):
+    """
+    Schema for a matching configuration line; numbers are 1-based
+    """
+    number: int
+    text: str
+
+class ConfigSearchMatch(BaseModel):
+    """
+    Schema for the matching lines of one configuration version
+    """
+    device_id: int
+    device_name: Optional[str] = None
+    version: int
+    created_at: Optional[datetime] = None
+    lines: List[ConfigSearchLine]
+
+class ConfigSearchResult(BaseModel):
+    """
+    Schema for the outcome of a configuration search
+    """
+    query: str
+    mode: str  # text, regex
+    scope: str  # latest, history
+    status: str
+    matches: List[ConfigSearchMatch] = []
+    devices: int
+    truncated: bool = False
+    duration: float
+
+class ConfigDeployRequest(BaseModel):
+    """
+    Schema for rolling a validated configuration out in waves; without a
+    selector the configuration goes to its own device
+    """
+    configuration_id: int
+    selector: Optional[DeviceSelector] = None
+    wave_size: Optional[int] = Field(None, ge=1, example=50)
+    canary_size: Optional[int] = Field(None, ge=0, example=1, description="Devices in the first wave")
+    concurrency: Optional[int] = Field(None, ge=1, example=25)
+    failure_threshold: Optional[float] = Field(None, ge=0, le=1, example=0.05,
+                                               description="Share of failed devices that stops the rollout")
+    checks: Optional[List[str]] = Field(None, example=["show version"], description="Read-only pre/post checks")
+    save: bool = True
+    device_timeout: Optional[float] = Field(None, gt=0, example=300)
+
+class ConfigDeploymentWave(BaseModel):
+    """
+    Schema for the outcome of one deployment wave
+    """
+    index: int
+    size: int
+    succeeded: int
+    failed: int
+    duration: float
+
+class ConfigDeploymentError(BaseModel):
+    """
+    Schema for a device the configuration could not be deployed to
+    """
+    device_id: Optional[int] = None
+    device_name: str
+    stage: str  # connect, pre-check, push, save, post-check
+    error: str
+
+class ConfigDeploymentResult(BaseModel):
+    """
+    Schema for the outcome of a configuration deployment
+    """
+    configuration_id: int
+    status: str  # deployed, failed
+    aborted: bool = Field(..., description="Stopped early because the failure threshold was exceeded")
+    total: int
+    succeeded: int
+    failed: int
+    skipped: int
+    waves: List[ConfigDeploymentWave] = []
+    duration: float
+    errors: List[ConfigDeploymentError] = []
+    errors_truncated: bool = False
@@ -0,0 +1,138 @@
+import asyncio
+import codecs
+import struct
+from typing import Optional, Set, Tuple
+
+# Telnet commands and options (RFC 854, 857, 858, 1073)
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+ECHO = 1
+SGA = 3
+NAWS = 31
+
+# Options the device may enable on its side: it echoes our input and suppresses go-ahead
+ACCEPTED_REMOTE_OPTIONS = {ECHO, SGA}
+
+# Options we enable on our side when asked
+ACCEPTED_LOCAL_OPTIONS = {SGA, NAWS}
+
+READ_SIZE = 65536
+
+# Parser state after an IAC inside a subnegotiation
+_SB_IAC = -1
+
+class TelnetConnection:
+    """
+    Minimal asyncio Telnet client.
+
+    Option negotiation is answered inline while reading: the device may echo
+    and suppress go-ahead, and we report a wide window so lines are not
+    wrapped. Everything else is refused. ``read`` returns decoded text with
+    Telnet commands removed and ``write`` escapes IAC bytes and sends CRLF
+    line endings, so callers only ever see plain text.
+    """
+    def __init__(self, window: Tuple[int, int] = (511, 24), encoding: str = "utf-8"):
+        self.window = window
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.encoding = encoding
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._state = None  # pending command byte, or SB while inside a subnegotiation
+        self._subnegotiation = bytearray()
+        self._answered: Set[Tuple[int, int]] = set()
+
+    async def connect(self, host: str, port: int, timeout: float):
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+
+    def _send(self, *data: int):
+        self._writer.write(bytes(data))
+
+    def _negotiate(self, command: int, option: int):
+        # Answer each request once so two peers never loop on the same option
+        if (command, option) in self._answered:
+            return
+        self._answered.add((command, option))
+        if command == DO:
+            if option in ACCEPTED_LOCAL_OPTIONS:
+                self._send(IAC, WILL, option)
+                if option == NAWS:
+                    window = struct.pack(">HH", *self.window).replace(b"\xff", b"\xff\xff")
+                    self._writer.write(bytes([IAC, SB, NAWS]) + window + bytes([IAC, SE]))
+            else:
+                self._send(IAC, WONT, option)
+        elif command == WILL:
+            self._send(IAC, DO if option in ACCEPTED_REMOTE_OPTIONS else DONT, option)
+
+    def _feed(self, data: bytes) -> bytes:
+        """
+        Strip Telnet commands from received bytes, answering negotiation
+        """
+        text = bytearray()
+        for byte in data:
+            state = self._state
+            if state is None:
+                if byte == IAC:
+                    self._state = IAC
+                elif byte != 0:
+                    text.append(byte)
+            elif state == IAC:
+                if byte == IAC:
+                    text.append(IAC)
+                    self._state = None
+                elif byte in (DO, DONT, WILL, WONT):
+                    self._state = byte
+                elif byte == SB:
+                    self._subnegotiation.clear()
+                    self._state = SB
+                else:
+                    self._state = None
+            elif state in (DO, DONT, WILL, WONT):
+                self._negotiate(state, byte)
+                self._state = None
+            elif state == SB:
+                if byte == IAC:
+                    self._state = _SB_IAC
+                else:
+                    self._subnegotiation.append(byte)
+            else:  # IAC inside a subnegotiation
+                if byte == SE:
+                    self._state = None
+                else:
+                    self._subnegotiation.append(byte)
+                    self._state = SB
+        return bytes(text)
+
+    async def read(self) -> str:
+        """
+        Return the next text received, or an empty string once the connection is closed
+        """
+        while True:
+            data = await self._reader.read(READ_SIZE)
+            if not data:
+                return self._decoder.decode(b"", final=True)
+            text = self._decoder.decode(self._feed(data))
+            if text:
+                return text
+
+    async def write(self, text: str):
+        data = text.replace("\r\n", "\n").replace("\n", "\r\n").encode(self.encoding)
+        self._writer.write(data.replace(b"\xff", b"\xff\xff"))
+        await self._writer.drain()
+
+    def is_closing(self) -> bool:
+        return self._writer is None or self._writer.is_closing() or self._reader.at_eof()
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await asyncio.wait_for(self._writer.wait_closed(), 5)
+            except (asyncio.TimeoutError, OSError):
+                pass
+        self._reader = None
+        self._writer = None
@@ -0,0 +1,371 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import and_, case, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..database.models import AuditResult, AuditRun, Configuration, Device
+from ..network_automation.backup import BACKUP_STATUS
+from ..utils.config import config
+from ..utils.exceptions import ConfigurationException, NetworkOperationException, ValidationException
+from ..utils.logger import log_db_operation, network_logger
+from .config_tree import ConfigLine, ConfigTree
+from .schemas import AuditFinding, AuditRule, AuditRuleSummary, AuditRunDetail, AuditRunSummary
+
+BUILTIN_RULES_FILE = os.path.join(os.path.dirname(__file__), "audit_rules.json")
+
+# Offending lines reported per rule and device
+MAX_DETAILS = 5
+
+# A pattern starting with a literal keyword, e.g. ``^ntp server``
+LEADING_WORD = re.compile(r"^\^([A-Za-z][\w\-]*)(?=\\s|\s|\$|$)")
+
+# Device, list of (rule id, severity, passed, details)
+DeviceFindings = Tuple[int, List[Tuple[str, str, bool, Optional[str]]]]
+
+def _leading_word(pattern: str) -> Optional[str]:
+    match = LEADING_WORD.match(pattern)
+    return match.group(1) if match else None
+
+def _describe(lines: Sequence[ConfigLine]) -> str:
+    described = "; ".join(f"line {line.number}: {line.text}" for line in lines[:MAX_DETAILS])
+    if len(lines) > MAX_DETAILS:
+        described += f"; and {len(lines) - MAX_DETAILS} more"
+    return described
+
+class CompiledRule:
+    """
+    An audit rule with its patterns compiled and its index lookups planned
+    """
+    def __init__(self, rule: AuditRule):
+        self.id = rule.id
+        self.severity = rule.severity
+        self.type = rule.type
+        self.device_types = set(rule.device_types) if rule.device_types else None
+        self.line = rule.line
+        self.match = rule.match
+        try:
+            self.pattern = re.compile(rule.pattern) if rule.pattern else None
+            self.parent = re.compile(rule.parent) if rule.parent else None
+            self.required_children = [re.compile(pattern) for pattern in rule.required_children]
+            self.forbidden_children = [re.compile(pattern) for pattern in rule.forbidden_children]
+            self.unless_child = re.compile(rule.unless_child) if rule.unless_child else None
+            self.only_if_child = re.compile(rule.only_if_child) if rule.only_if_child else None
+        except re.error as e:
+            raise ConfigurationException(f"Audit rule {rule.id} has an invalid pattern: {str(e)}")
+        if self.type in ("required", "forbidden") and not self.line:
+            raise ConfigurationException(f"Audit rule {rule.id} needs a line")
+        if self.type == "regex" and self.pattern is None:
+            raise ConfigurationException(f"Audit rule {rule.id} needs a pattern")
+        if self.type == "block" and self.parent is None:
+            raise ConfigurationException(f"Audit rule {rule.id} needs a parent pattern")
+        # Only lines starting with this word can match, so the first-word index narrows the search
+        self.pattern_word = _leading_word(rule.pattern) if rule.pattern else None
+        self.parent_word = _leading_word(rule.parent) if rule.parent else None
+
+    def applies_to(self, device_type: Optional[str]) -> bool:
+        return self.device_types is None or device_type in self.device_types
+
+    def evaluate(self, tree: ConfigTree) -> Tuple[bool, Optional[str]]:
+        """
+        Returns whether the configuration passes, and what is wrong when it does not
+        """
+        if self.type == "required":
+            return (True, None) if tree.find(self.line) else (False, f"missing: {self.line}")
+        if self.type == "forbidden":
+            found = tree.find(self.line)
+            return (False, _describe(found)) if found else (True, None)
+        if self.type == "regex":
+            found = [line for line in tree.starting_with(self.pattern_word) if self.pattern.search(line.text)]
+            if self.match == "required":
+                return (True, None) if found else (False, f"no line matches {self.pattern.pattern}")
+            return (False, _describe(found)) if found else (True, None)
+        return self._evaluate_blocks(tree)
+
+    def _evaluate_blocks(self, tree: ConfigTree) -> Tuple[bool, Optional[str]]:
+        problems = []
+        for block in tree.starting_with(self.parent_word):
+            if not self.parent.search(block.text):
+                continue
+            children = [child.text for child in block.children]
+            if self.unless_child and any(self.unless_child.search(child) for child in children):
+                continue
+            if self.only_if_child and not any(self.only_if_child.search(child) for child in children):
+                continue
+            for pattern in self.required_children:
+                if not any(pattern.search(child) for child in children):
+                    problems.append(f"'{block.text}' (line {block.number}) lacks {pattern.pattern}")
+            for pattern in self.forbidden_children:
+                for child in block.children:
+                    if pattern.search(child.text):
+                        problems.append(f"'{block.text}' has line {child.number}: {child.text}")
+        if not problems:
+            return True, None
+        details = "; ".join(problems[:MAX_DETAILS])
+        if len(problems) > MAX_DETAILS:
+            details += f"; and {len(problems) - MAX_DETAILS} more"
+        return False, details
+
+def audit_config(rules: Sequence[CompiledRule], device_type: Optional[str], content: str,
+                 rule_ids: Optional[frozenset] = None) -> List[Tuple[str, str, bool, Optional[str]]]:
+    """
+    Parse one configuration and evaluate the rules that apply to the device
+    """
+    tree = ConfigTree(content)
+    return [
+        (rule.id, rule.severity) + rule.evaluate(tree)
+        for rule in rules
+        if rule.applies_to(device_type) and (rule_ids is None or rule.id in rule_ids)
+    ]
+
+# Compiled rules of an audit worker process
+_worker_rules: List[CompiledRule] = []
+
+def _init_worker(rules: List[dict]):
+    global _worker_rules
+    _worker_rules = [CompiledRule(AuditRule(**rule)) for rule in rules]
+
+def _audit_in_worker(items: List[Tuple[int, Optional[str], str]], rule_ids: Optional[frozenset]) -> List[DeviceFindings]:
+    return [(device_id, audit_config(_worker_rules, device_type, content, rule_ids))
+            for device_id, device_type, content in items]
+
+class AuditEngine:
+    """
+    Evaluates the rule library against device configurations.
+
+    Rules are loaded and compiled once. Small batches are evaluated in the
+    calling thread; larger ones are split into chunks for a pool of worker
+    processes that compile the rules once at start-up.
+    """
+    def __init__(self, rules_file: Optional[str] = None, workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None, parallel_threshold: Optional[int] = None):
+        self.rules_file = rules_file or config.AUDIT_RULES_FILE or BUILTIN_RULES_FILE
+        self.workers = workers or config.AUDIT_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size or config.AUDIT_CHUNK_SIZE
+        self.parallel_threshold = parallel_threshold or config.AUDIT_PARALLEL_THRESHOLD
+        self._rules: Optional[List[AuditRule]] = None
+        self._compiled: List[CompiledRule] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def rules(self) -> List[AuditRule]:
+        """
+        The rule library, loaded and compiled on first use
+        """
+        with self._lock:
+            if self._rules is None:
+                try:
+                    with open(self.rules_file) as rules_file:
+                        rules = [AuditRule(**rule) for rule in json.load(rules_file)]
+                except (OSError, ValueError, TypeError, ValidationError) as e:
+                    raise ConfigurationException(f"Cannot load audit rules from {self.rules_file}: {str(e)}")
+                ids = [rule.id for rule in rules]
+                if len(set(ids)) != len(ids):
+                    raise ConfigurationException(f"Audit rule ids in {self.rules_file} are not unique")
+                self._compiled = [CompiledRule(rule) for rule in rules]
+                self._rules = rules
+            return self._rules
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs threads and an event loop is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=([rule.model_dump() for rule in self._rules],)
+                )
+            return self._executor
+
+    def submit(self, items: List[Tuple[int, Optional[str], str]],
+               rule_ids: Optional[frozenset] = None) -> List[Future]:
+        """
+        Start evaluating ``(device_id, device_type, content)`` items; each future yields a list of findings per device
+        """
+        self.rules()
+        if len(items) <= self.parallel_threshold or self.workers == 1:
+            future = Future()
+            try:
+                future.set_result([(device_id, audit_config(self._compiled, device_type, content, rule_ids))
+                                   for device_id, device_type, content in items])
+            except Exception as e:
+                future.set_exception(e)
+            return [future]
+        executor = self._get_executor()
+        return [
+            executor.submit(_audit_in_worker, items[start:start + self.chunk_size], rule_ids)
+            for start in range(0, len(items), self.chunk_size)
+        ]
+
+    def shutdown(self):
+        """
+        Stop the worker processes
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+def _latest_configs(db: Session, device_ids: Optional[List[int]], batch_size: int) -> Iterator[List[Tuple[int, Optional[str], str]]]:
+    """
+    Latest backed up configuration of each device, in batches ordered by device id
+    """
+    latest = select(Configuration.device_id, func.max(Configuration.version).label("version")).where(
+        Configuration.status == BACKUP_STATUS
+    ).group_by(Configuration.device_id).subquery()
+    query = db.query(Configuration.device_id, Device.device_type, Configuration.content).join(
+        latest,
+        and_(Configuration.device_id == latest.c.device_id, Configuration.version == latest.c.version)
+    ).join(Device, Device.id == Configuration.device_id).filter(Configuration.status == BACKUP_STATUS)
+    last_id = 0
+    while True:
+        page = query.filter(Configuration.device_id > last_id)
+        if device_ids is not None:
+            page = page.filter(Configuration.device_id.in_(device_ids))
+        rows = page.order_by(Configuration.device_id).limit(batch_size).all()
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+        last_id = rows[-1][0]
+
+def _store_findings(db: Session, run_id: int, findings: List[DeviceFindings]) -> Tuple[int, int, int]:
+    rows = [
+        {"run_id": run_id, "device_id": device_id, "rule_id": rule_id, "severity": severity,
+         "passed": passed, "details": details}
+        for device_id, results in findings
+        for rule_id, severity, passed, details in results
+    ]
+    if rows:
+        db.execute(insert(AuditResult), rows)
+    db.commit()
+    passed = sum(1 for row in rows if row["passed"])
+    failed_devices = sum(1 for _, results in findings if any(not result[2] for result in results))
+    return passed, len(rows) - passed, failed_devices
+
+def run_audit(db: Session, device_ids: Optional[List[int]] = None, rule_ids: Optional[List[str]] = None,
+              engine: Optional["AuditEngine"] = None, batch_size: Optional[int] = None) -> AuditRunSummary:
+    """
+    Audit the latest backed up configuration of the given devices, or of every device.
+
+    Configurations are read in batches. While worker processes evaluate one
+    batch, the next one is read and the findings of the previous one are
+    written, so the database and the CPUs are busy at the same time.
+    """
+    engine = engine or audit_engine
+    batch_size = batch_size or config.AUDIT_BATCH_SIZE
+    rules = engine.rules()
+    if rule_ids is not None:
+        unknown = set(rule_ids) - {rule.id for rule in rules}
+        if unknown:
+            raise ValidationException(f"Unknown audit rules: {', '.join(sorted(unknown))}")
+    selected = frozenset(rule_ids) if rule_ids is not None else None
+
+    run = AuditRun(status="running", rule_count=len(selected) if selected is not None else len(rules))
+    db.add(run)
+    db.commit()
+    log_db_operation("INSERT", "audit_runs", run.id)
+
+    audited = passed = failed = failed_devices = 0
+    status = "failed"
+    in_flight: Deque[List[Future]] = deque()
+
+    def collect(futures: List[Future]):
+        nonlocal audited, passed, failed, failed_devices
+        findings = [finding for future in futures for finding in future.result()]
+        batch_passed, batch_failed, batch_failed_devices = _store_findings(db, run.id, findings)
+        audited += len(findings)
+        passed += batch_passed
+        failed += batch_failed
+        failed_devices += batch_failed_devices
+
+    try:
+        for batch in _latest_configs(db, device_ids, batch_size):
+            in_flight.append(engine.submit(batch, selected))
+            if len(in_flight) > 1:
+                collect(in_flight.popleft())
+        while in_flight:
+            collect(in_flight.popleft())
+        status = "completed"
+    except Exception as e:
+        db.rollback()
+        for futures in in_flight:
+            for future in futures:
+                future.cancel()
+        network_logger.error(f"Audit run {run.id} failed: {str(e)}")
+        raise NetworkOperationException(f"Audit run {run.id} failed: {str(e)}")
+    finally:
+        total = len(device_ids) if device_ids is not None else db.query(func.count(Device.id)).scalar()
+        run.status = status
+        run.finished_at = datetime.now(timezone.utc)
+        run.device_count = audited
+        run.missing_configs = max(0, total - audited)
+        run.passed = passed
+        run.failed = failed
+        run.failed_devices = failed_devices
+        db.commit()
+        log_db_operation("UPDATE", "audit_runs", run.id)
+
+    network_logger.info(f"Audit run {run.id}: {audited} devices, {failed} failed checks on {failed_devices} devices")
+    return AuditRunSummary.model_validate(run)
+
+def list_audit_runs(db: Session, limit: int = 20) -> List[AuditRunSummary]:
+    runs = db.query(AuditRun).order_by(AuditRun.id.desc()).limit(limit).all()
+    return [AuditRunSummary.model_validate(run) for run in runs]
+
+def _get_run(db: Session, run_id: int) -> AuditRun:
+    run = db.query(AuditRun).filter(AuditRun.id == run_id).first()
+    if run is None:
+        raise NetworkOperationException(f"Audit run {run_id} not found")
+    return run
+
+def get_audit_run(db: Session, run_id: int) -> AuditRunDetail:
+    """
+    An audit run with pass/fail counts per rule
+    """
+    run = _get_run(db, run_id)
+    counts = db.query(
+        AuditResult.rule_id,
+        func.max(AuditResult.severity),
+        func.sum(case((AuditResult.passed, 1), else_=0)),
+        func.sum(case((AuditResult.passed, 0), else_=1))
+    ).filter(AuditResult.run_id == run_id).group_by(AuditResult.rule_id).order_by(AuditResult.rule_id).all()
+    detail = AuditRunDetail.model_validate(run, from_attributes=True)
+    detail.rules = [
+        AuditRuleSummary(rule_id=rule_id, severity=severity or "", passed=rule_passed or 0, failed=rule_failed or 0)
+        for rule_id, severity, rule_passed, rule_failed in counts
+    ]
+    return detail
+
+def get_device_findings(db: Session, run_id: int, device_id: int) -> List[AuditFinding]:
+    """
+    Results of every rule for one device
+    """
+    _get_run(db, run_id)
+    results = db.query(AuditResult).filter(
+        AuditResult.run_id == run_id, AuditResult.device_id == device_id
+    ).order_by(AuditResult.rule_id).all()
+    return [AuditFinding.model_validate(result) for result in results]
+
+def get_rule_findings(db: Session, run_id: int, rule_id: str, passed: Optional[bool] = False,
+                      skip: int = 0, limit: int = 100) -> List[AuditFinding]:
+    """
+    Results of one rule across devices, failures only by default
+    """
+    _get_run(db, run_id)
+    query = db.query(AuditResult).filter(AuditResult.run_id == run_id, AuditResult.rule_id == rule_id)
+    if passed is not None:
+        query = query.filter(AuditResult.passed == passed)
+    results = query.order_by(AuditResult.device_id).offset(skip).limit(limit).all()
+    return [AuditFinding.model_validate(result) for result in results]
+
+# Global instance to be used across the application
+audit_engine = AuditEngine()
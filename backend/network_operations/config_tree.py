@@ -0,0 +1,62 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+class ConfigLine:
+    """
+    One configuration line with its block children
+    """
+    __slots__ = ("text", "number", "parent", "children")
+
+    def __init__(self, text: str, number: int, parent: Optional["ConfigLine"] = None):
+        self.text = text
+        self.number = number  # 1-based line number in the configuration
+        self.parent = parent
+        self.children: List["ConfigLine"] = []
+
+class ConfigTree:
+    """
+    IOS style configuration parsed once into blocks by indentation.
+
+    Lines are indexed by their exact text and by their first word, so rules
+    looking for a given line or for lines starting with a keyword do not
+    scan the whole configuration.
+    """
+    def __init__(self, content: str):
+        self.roots: List[ConfigLine] = []
+        self.lines: List[ConfigLine] = []
+        self.by_text: Dict[str, List[ConfigLine]] = defaultdict(list)
+        self.by_first_word: Dict[str, List[ConfigLine]] = defaultdict(list)
+
+        # Open blocks as (indent, line)
+        stack: List[tuple] = []
+        for number, raw in enumerate(content.replace("\r", "").split("\n"), 1):
+            text = raw.strip()
+            if not text or text.startswith("!"):
+                continue
+            indent = len(raw) - len(raw.lstrip())
+            while stack and stack[-1][0] >= indent:
+                stack.pop()
+            parent = stack[-1][1] if stack else None
+            line = ConfigLine(text, number, parent)
+            if parent is None:
+                self.roots.append(line)
+            else:
+                parent.children.append(line)
+            stack.append((indent, line))
+            self.lines.append(line)
+            self.by_text[text].append(line)
+            self.by_first_word[text.split(None, 1)[0]].append(line)
+
+    def find(self, text: str) -> List[ConfigLine]:
+        """
+        Lines with exactly this text, at any depth
+        """
+        return self.by_text.get(text, [])
+
+    def starting_with(self, word: Optional[str]) -> Iterator[ConfigLine]:
+        """
+        Lines whose first word is ``word``, or every line when ``word`` is None
+        """
+        if word is None:
+            return iter(self.lines)
+        return iter(self.by_first_word.get(word, []))
@@ -0,0 +1,314 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import textfsm
+except ImportError:
+    textfsm = None
+
+from ..utils.config import config
+from ..utils.exceptions import NetworkOperationException
+from ..utils.logger import network_logger
+from .schemas import ParsedOutput, ParserCacheStats, ParserTemplate
+
+# Templates shipped with the application; PARSER_TEMPLATE_DIR may point at
+# more, e.g. an ntc-templates checkout, and wins on name clashes. Files are
+# named ``<platform>_<command words joined by _>.textfsm``.
+BUILTIN_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+TEMPLATE_SUFFIX = ".textfsm"
+
+# Device.device_type -> template platform
+PLATFORMS = {
+    "ios": "cisco_ios",
+    "iosxe": "cisco_ios",
+    "iosxr": "cisco_xr",
+    "nxos": "cisco_nxos",
+}
+
+def platform_for(device_type: str) -> str:
+    return PLATFORMS.get(device_type, device_type)
+
+def _records(fsm, output: str) -> List[Dict[str, Any]]:
+    fsm.Reset()
+    rows = fsm.ParseText(output)
+    header = [name.lower() for name in fsm.header]
+    return [dict(zip(header, row)) for row in rows]
+
+class TemplateLibrary:
+    """
+    Index of TextFSM templates with each template compiled once.
+
+    A command resolves to the template whose command words it abbreviates, as
+    on the device CLI (``sh ip int br`` is ``show ip interface brief``).
+    Arguments after the template's words are allowed, so ``show interfaces
+    Gi0/1`` uses the ``show interfaces`` template; the longest match wins.
+    """
+    def __init__(self, directories: Optional[Sequence[str]] = None):
+        if directories is None:
+            directories = [BUILTIN_TEMPLATE_DIR] + ([config.PARSER_TEMPLATE_DIR] if config.PARSER_TEMPLATE_DIR else [])
+        self.directories = list(directories)
+        self._paths: Optional[Dict[str, str]] = None
+        self._commands: Dict[str, List[Tuple[str, ...]]] = {}
+        self._resolved: Dict[Tuple[str, str], Optional[str]] = {}
+        self._compiled: Dict[str, Tuple[threading.Lock, object]] = {}
+        self._lock = threading.Lock()
+
+    def _index(self) -> Dict[str, str]:
+        if self._paths is None:
+            paths = {}
+            for directory in self.directories:
+                if not os.path.isdir(directory):
+                    network_logger.warning(f"Parser template directory {directory} does not exist")
+                    continue
+                for filename in sorted(os.listdir(directory)):
+                    if filename.endswith(TEMPLATE_SUFFIX):
+                        paths[filename[:-len(TEMPLATE_SUFFIX)]] = os.path.join(directory, filename)
+            self._paths = paths
+        return self._paths
+
+    def _platform_commands(self, platform: str) -> List[Tuple[str, ...]]:
+        commands = self._commands.get(platform)
+        if commands is None:
+            prefix = platform + "_"
+            commands = sorted(
+                (tuple(name[len(prefix):].split("_")) for name in self._index() if name.startswith(prefix)),
+                key=len,
+                reverse=True
+            )
+            self._commands[platform] = commands
+        return commands
+
+    def resolve(self, device_type: str, command: str) -> Optional[str]:
+        """
+        Name of the template for a command on a device type, or None
+        """
+        key = (device_type, " ".join(command.split()).lower())
+        with self._lock:
+            if key in self._resolved:
+                return self._resolved[key]
+            platform = platform_for(device_type)
+            words = key[1].split()
+            name = None
+            for template_words in self._platform_commands(platform):
+                if len(template_words) <= len(words) and all(
+                    full.startswith(word) for word, full in zip(words, template_words)
+                ):
+                    name = f"{platform}_{'_'.join(template_words)}"
+                    break
+            self._resolved[key] = name
+            return name
+
+    def _template(self, name: str) -> Tuple[threading.Lock, object]:
+        with self._lock:
+            compiled = self._compiled.get(name)
+            if compiled is None:
+                if textfsm is None:
+                    raise ImportError("textfsm library is not installed. Please install it with 'pip install textfsm'.")
+                with open(self._index()[name]) as template:
+                    compiled = (threading.Lock(), textfsm.TextFSM(template))
+                self._compiled[name] = compiled
+            return compiled
+
+    def parse(self, name: str, output: str) -> List[Dict[str, Any]]:
+        """
+        Parse output with a named template
+        """
+        lock, fsm = self._template(name)
+        with lock:
+            return _records(fsm, output)
+
+    def templates(self) -> List[ParserTemplate]:
+        with self._lock:
+            index = self._index()
+        templates = []
+        for name in sorted(index):
+            platform = next((p for p in sorted(set(PLATFORMS.values()), key=len, reverse=True)
+                             if name.startswith(p + "_")), None)
+            if platform is not None:
+                command = name[len(platform) + 1:].replace("_", " ")
+                templates.append(ParserTemplate(name=name, platform=platform, command=command))
+        return templates
+
+# Template library of a parser worker process
+_worker_library: Optional[TemplateLibrary] = None
+
+def _init_worker(directories: List[str]):
+    global _worker_library
+    _worker_library = TemplateLibrary(directories)
+
+def _parse_outcome(library: TemplateLibrary, name: str, output: str) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    try:
+        return library.parse(name, output), None
+    except Exception as e:
+        return None, f"Parsing with {name} failed: {str(e)}"
+
+def _parse_in_worker(name: str, output: str) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    return _parse_outcome(_worker_library, name, output)
+
+class ParseResultCache:
+    """
+    Bounded LRU cache of parse results keyed by a hash of the template and raw output.
+    Cached records are shared and must be treated as read-only.
+    """
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or config.PARSER_CACHE_SIZE
+        self._entries: "OrderedDict[bytes, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(template: str, output: str) -> bytes:
+        return hashlib.blake2b(f"{template}\0{output}".encode("utf-8"), digest_size=20).digest()
+
+    def get(self, key: bytes) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            records = self._entries.get(key)
+            if records is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return records
+
+    def put(self, key: bytes, records: List[Dict[str, Any]]):
+        with self._lock:
+            self._entries[key] = records
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class OutputParser:
+    """
+    Structured parsing of show command output.
+
+    Single outputs are parsed in the calling thread. Batches larger than
+    ``parallel_threshold`` send their cache misses to a pool of worker
+    processes, each of which compiles a template the first time it uses it.
+    """
+    def __init__(self, library: Optional[TemplateLibrary] = None, cache: Optional[ParseResultCache] = None,
+                 workers: Optional[int] = None, parallel_threshold: Optional[int] = None):
+        self.library = library or TemplateLibrary()
+        self.cache = cache or ParseResultCache()
+        self.workers = workers or config.PARSER_WORKERS or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold or config.PARSER_PARALLEL_THRESHOLD
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # Forking a process that runs threads and an event loop is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.library.directories,)
+                )
+            return self._executor
+
+    def _template_for(self, device_type: str, command: str) -> str:
+        name = self.library.resolve(device_type, command)
+        if name is None:
+            raise NetworkOperationException(f"No parser template for '{command}' on {device_type}")
+        return name
+
+    def parse(self, device_type: str, command: str, output: str) -> ParsedOutput:
+        """
+        Parse the output of one command
+        """
+        name = self._template_for(device_type, command)
+        key = self.cache.key(name, output)
+        records = self.cache.get(key)
+        cached = records is not None
+        if not cached:
+            records = self.library.parse(name, output)
+            self.cache.put(key, records)
+        return ParsedOutput(device_type=device_type, command=command, template=name, records=records, cached=cached)
+
+    def parse_many(self, items: Sequence[Tuple[str, str, str]]) -> List[ParsedOutput]:
+        """
+        Parse many ``(device_type, command, output)`` items, in order.
+        Items without a template or whose output fails to parse get an error
+        instead of records.
+        """
+        results: List[Optional[ParsedOutput]] = [None] * len(items)
+        pending: List[Tuple[int, str, bytes]] = []
+        for index, (device_type, command, output) in enumerate(items):
+            try:
+                name = self._template_for(device_type, command)
+            except NetworkOperationException as e:
+                results[index] = ParsedOutput(device_type=device_type, command=command, error=str(e))
+                continue
+            key = self.cache.key(name, output)
+            records = self.cache.get(key)
+            if records is not None:
+                results[index] = ParsedOutput(
+                    device_type=device_type, command=command, template=name, records=records, cached=True
+                )
+            else:
+                pending.append((index, name, key))
+
+        if len(pending) > self.parallel_threshold and self.workers > 1:
+            executor = self._get_executor()
+            chunksize = max(1, min(config.PARSER_CHUNK_SIZE, len(pending) // (self.workers * 4)))
+            outcomes = list(executor.map(
+                _parse_in_worker,
+                [name for _, name, _ in pending],
+                [items[index][2] for index, _, _ in pending],
+                chunksize=chunksize
+            ))
+        else:
+            outcomes = [_parse_outcome(self.library, name, items[index][2]) for index, name, _ in pending]
+
+        for (index, name, key), (records, error) in zip(pending, outcomes):
+            device_type, command, _ = items[index]
+            if records is not None:
+                self.cache.put(key, records)
+            results[index] = ParsedOutput(
+                device_type=device_type, command=command, template=name, records=records or [], error=error
+            )
+        return results
+
+    def templates(self) -> List[ParserTemplate]:
+        return self.library.templates()
+
+    def stats(self) -> ParserCacheStats:
+        cache = self.cache
+        lookups = cache.hits + cache.misses
+        return ParserCacheStats(
+            size=len(cache),
+            max_size=cache.max_size,
+            hits=cache.hits,
+            misses=cache.misses,
+            hit_ratio=cache.hits / lookups if lookups else 0.0,
+            evictions=cache.evictions,
+            workers=self.workers
+        )
+
+    def shutdown(self):
+        """
+        Stop the worker processes
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+# Global instance to be used across the application
+output_parser = OutputParser()
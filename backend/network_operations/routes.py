@@ -0,0 +1,137 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from ..database.connection import get_db
+from ..utils.exceptions import ConfigurationException, NetworkOperationException
+from ..utils.logger import log_api_request
+from .audit import audit_engine, get_audit_run, get_device_findings, get_rule_findings, list_audit_runs
+from .parsers import output_parser
+from .schemas import (
+    AuditFinding, AuditRule, AuditRunDetail, AuditRunSummary, ParseBatchRequest, ParsedOutput, ParseRequest,
+    ParserCacheStats, ParserTemplate
+)
+
+router = APIRouter()
+
+@router.post("/parse", response_model=ParsedOutput)
+def parse_output(request: ParseRequest):
+    """
+    Parse the output of one show command into records
+    """
+
+    try:
+        parsed = output_parser.parse(request.device_type, request.command, request.output)
+        log_api_request("POST", "/network-operations/parse", status.HTTP_200_OK)
+        return parsed
+    except NetworkOperationException as e:
+        log_api_request("POST", "/network-operations/parse", status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        log_api_request("POST", "/network-operations/parse", status.HTTP_422_UNPROCESSABLE_ENTITY)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Parsing failed: {str(e)}")
+
+@router.post("/parse/batch", response_model=List[ParsedOutput])
+def parse_outputs(request: ParseBatchRequest):
+    """
+    Parse many show command outputs, in parallel for large batches.
+    Items that cannot be parsed carry an error instead of records.
+    """
+
+    parsed = output_parser.parse_many([(item.device_type, item.command, item.output) for item in request.items])
+    log_api_request("POST", "/network-operations/parse/batch", status.HTTP_200_OK)
+    return parsed
+
+@router.get("/parsers", response_model=List[ParserTemplate])
+def read_parser_templates():
+    """
+    List the available parser templates
+    """
+
+    log_api_request("GET", "/network-operations/parsers", status.HTTP_200_OK)
+    return output_parser.templates()
+
+@router.get("/parsers/cache/stats", response_model=ParserCacheStats)
+def read_parser_cache_stats():
+    """
+    Retrieve parse result cache statistics
+    """
+
+    log_api_request("GET", "/network-operations/parsers/cache/stats", status.HTTP_200_OK)
+    return output_parser.stats()
+
+@router.get("/audit-rules", response_model=List[AuditRule])
+def read_audit_rules():
+    """
+    List the configuration audit rules
+    """
+
+    try:
+        rules = audit_engine.rules()
+    except ConfigurationException as e:
+        log_api_request("GET", "/network-operations/audit-rules", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    log_api_request("GET", "/network-operations/audit-rules", status.HTTP_200_OK)
+    return rules
+
+@router.get("/audits", response_model=List[AuditRunSummary])
+def read_audit_runs(limit: int = Query(20, ge=1, le=1000), db: Session = Depends(get_db)):
+    """
+    List recent audit runs, newest first
+    """
+
+    runs = list_audit_runs(db, limit)
+    log_api_request("GET", "/network-operations/audits", status.HTTP_200_OK)
+    return runs
+
+@router.get("/audits/{run_id}", response_model=AuditRunDetail)
+def read_audit_run(run_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieve an audit run with pass and fail counts per rule
+    """
+
+    try:
+        run = get_audit_run(db, run_id)
+    except NetworkOperationException as e:
+        log_api_request("GET", f"/network-operations/audits/{run_id}", status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    log_api_request("GET", f"/network-operations/audits/{run_id}", status.HTTP_200_OK)
+    return run
+
+@router.get("/audits/{run_id}/devices/{device_id}", response_model=List[AuditFinding])
+def read_device_findings(run_id: int, device_id: int, db: Session = Depends(get_db)):
+    """
+    Retrieve the result of every rule for one device in an audit run
+    """
+
+    url = f"/network-operations/audits/{run_id}/devices/{device_id}"
+    try:
+        findings = get_device_findings(db, run_id, device_id)
+    except NetworkOperationException as e:
+        log_api_request("GET", url, status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    log_api_request("GET", url, status.HTTP_200_OK)
+    return findings
+
+@router.get("/audits/{run_id}/rules/{rule_id}", response_model=List[AuditFinding])
+def read_rule_findings(
+    run_id: int,
+    rule_id: str,
+    passed: Optional[bool] = Query(False, description="Filter by outcome; failures by default"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Retrieve the devices that failed (or passed) one rule in an audit run
+    """
+
+    url = f"/network-operations/audits/{run_id}/rules/{rule_id}"
+    try:
+        findings = get_rule_findings(db, run_id, rule_id, passed, skip, limit)
+    except NetworkOperationException as e:
+        log_api_request("GET", url, status.HTTP_404_NOT_FOUND)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    log_api_request("GET", url, status.HTTP_200_OK)
+    return findings
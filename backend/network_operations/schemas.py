@@ -0,0 +1,128 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+from ..network_automation.schemas import DeviceSelector
+
+class ParseRequest(BaseModel):
+    """
+    Schema for parsing the output of one show command
+    """
+    device_type: str = Field(..., example="ios")
+    command: str = Field(..., example="show interfaces")
+    output: str
+
+class ParseBatchRequest(BaseModel):
+    """
+    Schema for parsing many show command outputs at once
+    """
+    items: List[ParseRequest] = Field(..., min_length=1)
+
+class ParsedOutput(BaseModel):
+    """
+    Schema for structured records parsed from show command output
+    """
+    device_type: str
+    command: str
+    template: Optional[str] = None
+    records: List[Dict[str, Any]] = []
+    cached: bool = False
+    error: Optional[str] = None
+
+class ParserTemplate(BaseModel):
+    """
+    Schema for an available parser template
+    """
+    name: str
+    platform: str
+    command: str
+
+class ParserCacheStats(BaseModel):
+    """
+    Schema for parse result cache statistics
+    """
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    workers: int
+
+class AuditRule(BaseModel):
+    """
+    Schema for a compliance rule.
+
+    required/forbidden: ``line`` must (not) appear at any depth.
+    regex: some line must (``match`` = required) or must not (forbidden) match ``pattern``.
+    block: every block whose header matches ``parent`` needs a child matching each
+    of ``required_children`` and none matching ``forbidden_children``; blocks are
+    skipped when they have a child matching ``unless_child`` or lack one matching
+    ``only_if_child``.
+    """
+    id: str = Field(..., example="no-http-server")
+    description: str = ""
+    severity: str = Field("medium", example="high")  # low, medium, high, critical
+    type: str = Field(..., pattern="^(required|forbidden|regex|block)$")
+    device_types: Optional[List[str]] = Field(None, example=["ios", "iosxe"])
+    line: Optional[str] = None
+    pattern: Optional[str] = None
+    match: str = Field("required", pattern="^(required|forbidden)$")
+    parent: Optional[str] = None
+    required_children: List[str] = []
+    forbidden_children: List[str] = []
+    unless_child: Optional[str] = None
+    only_if_child: Optional[str] = None
+
+class AuditRunRequest(BaseModel):
+    """
+    Schema for starting an audit; without a selector every device is audited
+    """
+    selector: Optional[DeviceSelector] = None
+    rule_ids: Optional[List[str]] = Field(None, example=["no-http-server", "vty-ssh-only"])
+
+class AuditRunSummary(BaseModel):
+    """
+    Schema for an audit run
+    """
+    id: int
+    status: str  # running, completed, failed
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    device_count: int
+    rule_count: int
+    missing_configs: int = Field(..., description="Selected devices without a backed up configuration")
+    passed: int
+    failed: int
+    failed_devices: int
+
+    class Config:
+        from_attributes = True
+
+class AuditRuleSummary(BaseModel):
+    """
+    Schema for how many devices passed and failed one rule in a run
+    """
+    rule_id: str
+    severity: str
+    passed: int
+    failed: int
+
+class AuditRunDetail(AuditRunSummary):
+    """
+    Schema for an audit run with its per-rule results
+    """
+    rules: List[AuditRuleSummary] = []
+
+class AuditFinding(BaseModel):
+    """
+    Schema for the result of one rule on one device
+    """
+    device_id: int
+    rule_id: str
+    severity: str
+    passed: bool
+    details: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import psutil
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+from ..network_automation.connection_pool import ConnectionPool, DeviceTarget
+from ..utils.config import config
+from ..utils.logger import network_logger
+
+# Connection layer benchmark against stand-in devices.
+#
+#   python -m backend.tests.benchmark_connections --sizes 10 100 1000 --output bench.json
+#
+# For each fleet size the stand-in devices run in a child process, so the
+# memory figures only cover the client side. Every device is connected once
+# through a fresh pool, then each device runs ``--rounds`` commands through
+# the pool. Results are printed (or written) as JSON; pass ``--baseline`` with
+# an earlier result file to fail when a metric got worse than ``--tolerance``.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_BANNER = (
+    "**************************************************************\n"
+    "* Authorized access only. Disconnect IMMEDIATELY if you are  *\n"
+    "* not an authorized user. All activity is logged.            *\n"
+    "**************************************************************"
+)
+
+# Metric path -> whether a higher value is better, compared against a baseline
+COMPARED_METRICS = {
+    ("connect", "per_second"): True,
+    ("connect", "latency_ms", "p95"): False,
+    ("commands", "per_second"): True,
+    ("commands", "latency_ms", "p95"): False,
+    ("memory", "per_session_bytes"): False,
+    ("pool", "hit_ratio"): True,
+}
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    Nearest-rank percentiles of latencies in seconds, reported in milliseconds
+    """
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def rank(share: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(0, int(share * len(ordered) + 0.5) - 1))] * 1000, 3)
+
+    return {"p50": rank(0.50), "p95": rank(0.95), "p99": rank(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+def rss() -> int:
+    gc.collect()
+    return psutil.Process().memory_info().rss
+
+async def start_fleet(count: int, args: argparse.Namespace) -> asyncio.subprocess.Process:
+    """
+    Start ``count`` stand-in devices in a child process and wait until they listen
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "backend.tests.fake_devices",
+        "--count", str(count),
+        "--port", str(args.base_port),
+        "--protocol", args.protocol,
+        "--delay", str(args.command_delay),
+        "--login-delay", str(args.login_delay),
+        "--banner", args.banner.replace("\n", "\\n"),
+        "--output-size", str(args.output_size),
+        "--username", args.username,
+        "--password", args.password,
+        cwd=REPO_ROOT,
+        stdout=asyncio.subprocess.PIPE
+    )
+    try:
+        line = await asyncio.wait_for(process.stdout.readline(), args.startup_timeout)
+    except asyncio.TimeoutError:
+        line = b""
+    if not line.startswith(b"Serving"):
+        await stop_fleet(process)
+        raise RuntimeError(f"{count} stand-in devices did not start within {args.startup_timeout}s")
+    return process
+
+async def stop_fleet(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        process.terminate()
+        await process.wait()
+
+async def benchmark_fleet(count: int, args: argparse.Namespace) -> dict:
+    """
+    Connect to and run commands on ``count`` stand-in devices through one pool
+    """
+    fleet = await start_fleet(count, args)
+    pool = ConnectionPool(
+        max_per_device=1,
+        max_total=args.pool_size or count,
+        idle_timeout=3600,
+        connect_timeout=args.connect_timeout,
+        command_timeout=args.command_timeout,
+        liveness_check_after=args.liveness_check_after
+    )
+    targets = [
+        DeviceTarget("127.0.0.1", args.base_port + index, args.protocol, device_type="ios",
+                     username=args.username, password=args.password, device_id=index + 1, name=f"R{index}")
+        for index in range(count)
+    ]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    try:
+        # One throwaway session first, so one-off allocations are not counted per session
+        warm_up = ConnectionPool(max_per_device=1, max_total=1, connect_timeout=args.connect_timeout)
+        try:
+            await warm_up.release(await warm_up.acquire(targets[0]))
+        finally:
+            await warm_up.close_all()
+        rss_before = rss()
+
+        connect_latencies: List[float] = []
+        connect_errors: List[str] = []
+
+        async def connect(target: DeviceTarget):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    session = await pool.acquire(target)
+                except Exception as e:
+                    connect_errors.append(str(e))
+                    return
+                connect_latencies.append(time.perf_counter() - started)
+                await pool.release(session)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(target) for target in targets))
+        connect_seconds = time.perf_counter() - started
+        open_sessions = pool.stats().open
+        rss_open = rss()
+
+        command_latencies: List[float] = []
+        command_errors: List[str] = []
+        received = 0
+
+        async def run(target: DeviceTarget):
+            nonlocal received
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    output = await pool.send_command(target, args.command)
+                except Exception as e:
+                    command_errors.append(str(e))
+                    return
+                command_latencies.append(time.perf_counter() - started)
+                received += len(output)
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            await asyncio.gather(*(run(target) for target in targets))
+        command_seconds = time.perf_counter() - started
+        pool_stats = pool.stats()
+    finally:
+        await pool.close_all()
+        await stop_fleet(fleet)
+
+    return {
+        "devices": count,
+        "connect": {
+            "opened": len(connect_latencies),
+            "failed": len(connect_errors),
+            "seconds": round(connect_seconds, 3),
+            "per_second": round(len(connect_latencies) / connect_seconds, 2) if connect_seconds else 0.0,
+            "latency_ms": percentiles(connect_latencies),
+            "errors": sorted(set(connect_errors))[:5],
+        },
+        "commands": {
+            "completed": len(command_latencies),
+            "failed": len(command_errors),
+            "seconds": round(command_seconds, 3),
+            "per_second": round(len(command_latencies) / command_seconds, 2) if command_seconds else 0.0,
+            "latency_ms": percentiles(command_latencies),
+            "bytes_received": received,
+            "errors": sorted(set(command_errors))[:5],
+        },
+        "memory": {
+            "rss_before_bytes": rss_before,
+            "rss_open_bytes": rss_open,
+            "open_sessions": open_sessions,
+            "per_session_bytes": (rss_open - rss_before) // open_sessions if open_sessions else 0,
+        },
+        "pool": pool_stats.model_dump(),
+    }
+
+def _metric(result: dict, path: tuple) -> Optional[float]:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Metrics that got worse than the baseline by more than ``tolerance`` (a share, 0.2 = 20%)
+    """
+    previous = {result["devices"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get(result["devices"])
+        if before is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS.items():
+            old, new = _metric(before, path), _metric(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{result['devices']} devices: {'.'.join(path)} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+async def main(args: argparse.Namespace) -> dict:
+    report = {
+        "benchmark": "connections",
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "asyncssh": getattr(asyncssh, "__version__", None),
+        },
+        "parameters": {
+            "protocol": args.protocol,
+            "command": args.command,
+            "rounds": args.rounds,
+            "concurrency": args.concurrency,
+            "pool_size": args.pool_size,
+            "command_delay": args.command_delay,
+            "login_delay": args.login_delay,
+            "banner_bytes": len(args.banner),
+            "output_size": args.output_size,
+        },
+        "results": [],
+    }
+    for count in args.sizes:
+        print(f"Benchmarking {count} devices...", file=sys.stderr, flush=True)
+        report["results"].append(await benchmark_fleet(count, args))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the device connection pool against stand-in devices")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="fleet sizes to run")
+    parser.add_argument("--protocol", choices=["ssh", "telnet"], default="ssh")
+    parser.add_argument("--command", default="show logging", help="command run on every device")
+    parser.add_argument("--rounds", type=int, default=5, help="commands per device")
+    parser.add_argument("--concurrency", type=int, default=50, help="devices worked on at once")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="pool session limit; 0 allows one session per device, smaller values force evictions")
+    parser.add_argument("--command-delay", type=float, default=0.0, help="device seconds per command")
+    parser.add_argument("--login-delay", type=float, default=0.0, help="device seconds before the first prompt")
+    parser.add_argument("--banner", default=DEFAULT_BANNER, help="device banner; use \\n for line breaks")
+    parser.add_argument("--output-size", type=int, default=4096, help="bytes of 'show logging' output")
+    parser.add_argument("--base-port", type=int, default=42000, help="first stand-in device port")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="cisco")
+    parser.add_argument("--connect-timeout", type=float, default=60.0)
+    parser.add_argument("--command-timeout", type=float, default=60.0)
+    parser.add_argument("--liveness-check-after", type=float, default=30.0,
+                        help="idle seconds before a pooled session is probed")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression against the baseline")
+    args = parser.parse_args()
+    args.banner = args.banner.replace("\\n", "\n")
+    # A log line per connection would be measured along with the pool
+    network_logger.setLevel(logging.WARNING)
+    # The stand-in devices generate a fresh host key on every start
+    config.SSH_DISABLE_HOST_KEY_CHECK = True
+
+    report = asyncio.run(main(args))
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            report["regressions"] = find_regressions(report, json.load(baseline_file), args.tolerance)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if report.get("regressions"):
+        for regression in report["regressions"]:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1)
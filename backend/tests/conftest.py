@@ -0,0 +1,26 @@
+import os
+
+# The database connection module builds its engine on import, so tests get an
+# in-memory SQLite URL unless one is configured
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from backend.database.models import Base
+
+@pytest.fixture
+def db():
+    """
+    Session on a fresh in-memory SQLite database with every table created
+    """
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
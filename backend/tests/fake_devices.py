@@ -0,0 +1,518 @@
+import argparse
+import asyncio
+import random
+import re
+import time
+from typing import List, Optional, Tuple
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+# Stand-in Cisco IOS devices for exercising the connection pool without real hardware.
+#
+#   python -m backend.tests.fake_devices --count 10 --port 8022
+#
+# starts ten SSH devices on ports 8022-8031 that accept admin/cisco; add
+# --protocol telnet for Telnet-only devices.
+
+RUNNING_CONFIG = """Building configuration...
+
+Current configuration : 1024 bytes
+!
+! Last configuration change at {clock} UTC Mon Jan 1 2024 by admin
+!
+version 15.2
+service timestamps debug datetime msec
+service timestamps log datetime msec
+!
+hostname {hostname}
+!
+interface Loopback0
+ ip address 10.255.{index}.1 255.255.255.255
+!
+interface GigabitEthernet0/0
+ description uplink
+ ip address 192.0.2.{index} 255.255.255.0
+ duplex auto
+ speed auto
+!
+interface GigabitEthernet0/1
+ shutdown
+!
+router ospf 1
+ network 10.0.0.0 0.255.255.255 area 0
+!
+ntp clock-period {clock_period}
+ntp server 192.0.2.254
+!
+{extra}end"""
+
+SHOW_VERSION = """Cisco IOS Software, IOSv Software (VIOS-ADVENTERPRISEK9-M), Version 15.2(4.0.55)E, RELEASE SOFTWARE (fc1)
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 1986-2016 by Cisco Systems, Inc.
+
+ROM: Bootstrap program is IOSv
+
+{hostname} uptime is 1 day, 2 hours, 3 minutes
+System image file is "flash0:/vios-adventerprisek9-m"
+
+Cisco IOSv (revision 1.0) with 460033K/62464K bytes of memory.
+Processor board ID 9{index:07d}
+2 Gigabit Ethernet interfaces
+Configuration register is 0x0"""
+
+SHOW_IP_INTERFACE_BRIEF = """Interface                  IP-Address      OK? Method Status                Protocol
+GigabitEthernet0/0         192.0.2.{index}       YES NVRAM  up                    up
+GigabitEthernet0/1         unassigned      YES NVRAM  administratively down down
+Loopback0                  10.255.{index}.1     YES NVRAM  up                    up"""
+
+SHOW_INTERFACE = """{name} is {status}, line protocol is {protocol}
+  Hardware is {hardware}
+  Description: {description}
+  Internet address is {address}/24
+  MTU 1500 bytes, BW 1000000 Kbit/sec, DLY 10 usec,
+     reliability 255/255, txload 1/255, rxload 1/255
+  Encapsulation ARPA, loopback not set
+  Keepalive set (10 sec)
+  Full-duplex, 1000Mb/s, media type is RJ45
+  Last input 00:00:01, output 00:00:00, output hang never
+  Queueing strategy: fifo
+  5 minute input rate {rate} bits/sec, 2 packets/sec
+  5 minute output rate {rate} bits/sec, 1 packets/sec
+     {packets} packets input, 8123456 bytes, 0 no buffer
+     0 input errors, 0 CRC, 0 frame, 0 overrun, 0 ignored
+     {packets} packets output, 7123456 bytes, 0 underruns
+     0 output errors, 0 collisions, 1 interface resets"""
+
+SHOW_LOGGING_HEADER = """Syslog logging: enabled (0 messages dropped, 0 flushes, 0 overruns)
+    Console logging: disabled
+    Monitor logging: level debugging, 0 messages logged
+    Buffer logging:  level debugging, {count} messages logged
+
+Log Buffer (8192 bytes):
+"""
+
+LOG_LINE = "*Jan  1 00:{minute:02d}:{second:02d}.{millis:03d}: %LINEPROTO-5-UPDOWN: Line protocol on Interface GigabitEthernet0/{port}, changed state to {state}"
+
+INVALID_INPUT = """                ^
+% Invalid input detected at '^' marker."""
+
+class FakeCiscoCLI:
+    """
+    Minimal IOS command line: show commands, paging settings and configuration mode
+    """
+    def __init__(self, hostname: str = "R1", index: int = 1, output_size: int = 2048):
+        self.hostname = hostname
+        self.index = index
+        self.output_size = output_size
+        self.mode = None
+        self.banner_delimiter: Optional[str] = None
+        self.config_lines: List[str] = []
+        self._logging: Optional[str] = None
+
+    @property
+    def prompt(self) -> str:
+        if self.banner_delimiter:
+            # Banner text is typed without prompts
+            return ""
+        if self.mode:
+            return f"{self.hostname}({self.mode})#"
+        return f"{self.hostname}#"
+
+    def running_config(self) -> str:
+        extra = "".join(f"{line}\n!\n" for line in self.config_lines)
+        # Volatile lines differ on every read, like on a real device
+        return RUNNING_CONFIG.format(
+            hostname=self.hostname,
+            index=self.index,
+            extra=extra,
+            clock=time.strftime("%H:%M:%S"),
+            clock_period=random.randint(17179800, 17179900)
+        )
+
+    def interfaces(self) -> str:
+        blocks = []
+        for port in range(4):
+            up = port < 2
+            blocks.append(SHOW_INTERFACE.format(
+                name=f"GigabitEthernet0/{port}",
+                status="up" if up else "administratively down",
+                protocol="up" if up else "down",
+                hardware=f"iGbE, address is 5254.00{self.index % 100:02d}.{port:04d} (bia 5254.00{self.index % 100:02d}.{port:04d})",
+                description="uplink" if port == 0 else f"port {port}",
+                address=f"192.0.{2 + port}.{self.index}",
+                rate=random.randint(1000, 90000) if up else 0,
+                packets=random.randint(100000, 999999) if up else 0
+            ))
+        return "\n".join(blocks)
+
+    def logging(self) -> str:
+        """
+        Log buffer of about ``output_size`` bytes
+        """
+        if self._logging is None:
+            lines = []
+            size = 0
+            while size < self.output_size:
+                count = len(lines)
+                lines.append(LOG_LINE.format(
+                    minute=count // 600 % 60,
+                    second=count // 10 % 60,
+                    millis=count % 10 * 100,
+                    port=count % 4,
+                    state="down" if count % 2 else "up"
+                ))
+                size += len(lines[-1]) + 1
+            self._logging = SHOW_LOGGING_HEADER.format(count=len(lines)) + "\n".join(lines)
+        return self._logging
+
+    def execute(self, line: str) -> Tuple[str, bool]:
+        """
+        Run one input line. Returns the output and whether the session should close.
+        """
+        if self.banner_delimiter:
+            if self.banner_delimiter in line:
+                self.banner_delimiter = None
+            return "", False
+        command = line.strip()
+        if not command:
+            return "", False
+        if self.mode:
+            banner = re.match(r"banner\s+\S+\s+(\^.|\S)", command)
+            if banner and command.count(banner.group(1)) == 1:
+                self.banner_delimiter = banner.group(1)
+                self.config_lines.append(command)
+                return f"Enter TEXT message.  End with the character '{banner.group(1)}'.", False
+            if command in ("end", "\x1a"):
+                self.mode = None
+            elif command == "exit":
+                self.mode = "config" if self.mode != "config" else None
+            else:
+                if command.startswith("interface "):
+                    self.mode = "config-if"
+                self.config_lines.append(command)
+            return "", False
+        if command in ("exit", "quit", "logout"):
+            return "", True
+        if command.startswith("terminal "):
+            return "", False
+        if command in ("configure terminal", "conf t"):
+            self.mode = "config"
+            return "Enter configuration commands, one per line.  End with CNTL/Z.", False
+        if command in ("show running-config", "show run"):
+            return self.running_config(), False
+        if command in ("show version", "show ver"):
+            return SHOW_VERSION.format(hostname=self.hostname, index=self.index), False
+        if command in ("show interfaces", "show int"):
+            return self.interfaces(), False
+        if command in ("show logging", "show log"):
+            return self.logging(), False
+        if command in ("show ip interface brief", "show ip int brief"):
+            return SHOW_IP_INTERFACE_BRIEF.format(index=self.index), False
+        if command in ("write memory", "wr"):
+            return "Building configuration...\n[OK]", False
+        return INVALID_INPUT, False
+
+class _FakeSSHServer(asyncssh.SSHServer if asyncssh else object):
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+
+    def begin_auth(self, username: str) -> bool:
+        return True
+
+    def password_auth_supported(self) -> bool:
+        return True
+
+    def validate_password(self, username: str, password: str) -> bool:
+        return username == self.username and password == self.password
+
+class FakeDeviceServer:
+    """
+    One stand-in device reachable over SSH on 127.0.0.1
+    """
+    def __init__(self, hostname: str = "R1", index: int = 1, username: str = "admin", password: str = "cisco",
+                 host: str = "127.0.0.1", port: int = 0, command_delay: float = 0.0, host_key=None,
+                 login_delay: float = 0.0, banner: str = "", output_size: int = 2048):
+        if asyncssh is None:
+            raise ImportError("asyncssh library is not installed. Please install it with 'pip install asyncssh'.")
+        self.hostname = hostname
+        self.index = index
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.command_delay = command_delay
+        self.host_key = host_key
+        self.login_delay = login_delay
+        self.banner = banner
+        self.output_size = output_size
+        self.sessions = 0
+        self.commands = 0
+        self._server = None
+
+    async def _handle_session(self, process):
+        self.sessions += 1
+        cli = FakeCiscoCLI(self.hostname, self.index, self.output_size)
+        try:
+            if self.login_delay:
+                await asyncio.sleep(self.login_delay)
+            if self.banner:
+                process.stdout.write("\r\n" + self.banner.replace("\n", "\r\n") + "\r\n")
+            process.stdout.write(f"\r\n{self.hostname} line 2 \r\n\r\n{cli.prompt}")
+            while True:
+                line = await process.stdin.readline()
+                if not line:
+                    break
+                line = line.rstrip("\r\n")
+                process.stdout.write(line + "\r\n")
+                if line.strip():
+                    self.commands += 1
+                    if self.command_delay:
+                        await asyncio.sleep(self.command_delay)
+                output, done = cli.execute(line)
+                if output:
+                    process.stdout.write(output.replace("\n", "\r\n") + "\r\n")
+                if done:
+                    break
+                process.stdout.write(cli.prompt)
+        except (asyncssh.Error, ConnectionError):
+            pass
+        finally:
+            process.exit(0)
+
+    async def start(self) -> int:
+        """
+        Start listening and return the bound port
+        """
+        host_key = self.host_key or asyncssh.generate_private_key("ssh-ed25519")
+        self._server = await asyncssh.create_server(
+            lambda: _FakeSSHServer(self.username, self.password),
+            self.host,
+            self.port,
+            server_host_keys=[host_key],
+            process_factory=self._handle_session,
+            line_editor=False,
+            encoding="utf-8"
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+# Telnet bytes used by the stand-in
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+TELNET_ECHO, TELNET_SGA, TELNET_NAWS = 1, 3, 31
+
+class FakeTelnetDeviceServer:
+    """
+    One stand-in device reachable over Telnet on 127.0.0.1.
+    It negotiates echo and window size and asks for a username and password like IOS with login local.
+    """
+    def __init__(self, hostname: str = "R1", index: int = 1, username: str = "admin", password: str = "cisco",
+                 host: str = "127.0.0.1", port: int = 0, command_delay: float = 0.0,
+                 login_delay: float = 0.0, banner: str = "", output_size: int = 2048):
+        self.hostname = hostname
+        self.index = index
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.command_delay = command_delay
+        self.login_delay = login_delay
+        self.banner = banner
+        self.output_size = output_size
+        self.sessions = 0
+        self.commands = 0
+        self.window = None
+        self._server = None
+
+    async def _readline(self, reader: asyncio.StreamReader, pending: bytearray) -> Optional[str]:
+        """
+        Next input line with Telnet commands removed, or None at EOF
+        """
+        while True:
+            end = pending.find(b"\r")
+            if end < 0:
+                end = pending.find(b"\n")
+            if end >= 0:
+                line = bytes(pending[:end])
+                del pending[:end + 1]
+                if pending[:1] in (b"\n", b"\x00"):
+                    del pending[:1]
+                return line.decode("utf-8", errors="replace")
+            data = await reader.read(4096)
+            if not data:
+                return None
+            pending.extend(self._strip_commands(data))
+
+    def _strip_commands(self, data: bytes) -> bytes:
+        text = bytearray()
+        index = 0
+        while index < len(data):
+            byte = data[index]
+            if byte != IAC:
+                text.append(byte)
+                index += 1
+            elif index + 1 < len(data) and data[index + 1] == IAC:
+                text.append(IAC)
+                index += 2
+            elif index + 1 < len(data) and data[index + 1] == SB:
+                end = data.find(bytes([IAC, SE]), index)
+                end = len(data) if end < 0 else end
+                payload = data[index + 3:end].replace(bytes([IAC, IAC]), bytes([IAC]))
+                if data[index + 2:index + 3] == bytes([TELNET_NAWS]) and len(payload) == 4:
+                    self.window = (int.from_bytes(payload[:2], "big"), int.from_bytes(payload[2:], "big"))
+                index = end + 2
+            else:
+                index += 3
+        return bytes(text)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.sessions += 1
+        cli = FakeCiscoCLI(self.hostname, self.index, self.output_size)
+        pending = bytearray()
+
+        def write(text: str):
+            writer.write(text.replace("\n", "\r\n").encode("utf-8"))
+
+        try:
+            writer.write(bytes([IAC, WILL, TELNET_ECHO, IAC, WILL, TELNET_SGA, IAC, DO, TELNET_NAWS]))
+            if self.banner:
+                write("\n" + self.banner + "\n")
+            write("\nUser Access Verification\n")
+            for _ in range(3):
+                write("\nUsername: ")
+                username = await self._readline(reader, pending)
+                if username is None:
+                    return
+                write(username + "\nPassword: ")
+                password = await self._readline(reader, pending)
+                if password is None:
+                    return
+                write("\n")
+                if username == self.username and password == self.password:
+                    if self.login_delay:
+                        await asyncio.sleep(self.login_delay)
+                    break
+                write("% Login invalid\n")
+            else:
+                return
+
+            write(f"\n{cli.prompt}")
+            while True:
+                line = await self._readline(reader, pending)
+                if line is None:
+                    break
+                write(line + "\n")
+                if line.strip():
+                    self.commands += 1
+                    if self.command_delay:
+                        await asyncio.sleep(self.command_delay)
+                output, done = cli.execute(line)
+                if output:
+                    write(output + "\n")
+                if done:
+                    break
+                write(cli.prompt)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> int:
+        """
+        Start listening and return the bound port
+        """
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+async def start_fake_fleet(count: int, base_port: int = 0, command_delay: float = 0.0,
+                           username: str = "admin", password: str = "cisco", protocol: str = "ssh",
+                           login_delay: float = 0.0, banner: str = "", output_size: int = 2048) -> List:
+    """
+    Start ``count`` stand-in devices; SSH devices share one host key. With
+    ``base_port`` 0 every device gets an ephemeral port, otherwise consecutive ports.
+    ``login_delay`` is added before the first prompt and ``output_size`` sets
+    the size of ``show logging`` output.
+    """
+    if protocol == "telnet":
+        servers = [
+            FakeTelnetDeviceServer(
+                hostname=f"R{index}",
+                index=index % 250 + 1,
+                username=username,
+                password=password,
+                port=base_port + index if base_port else 0,
+                command_delay=command_delay,
+                login_delay=login_delay,
+                banner=banner,
+                output_size=output_size
+            )
+            for index in range(count)
+        ]
+    else:
+        host_key = asyncssh.generate_private_key("ssh-ed25519")
+        servers = [
+            FakeDeviceServer(
+                hostname=f"R{index}",
+                index=index % 250 + 1,
+                username=username,
+                password=password,
+                port=base_port + index if base_port else 0,
+                command_delay=command_delay,
+                host_key=host_key,
+                login_delay=login_delay,
+                banner=banner,
+                output_size=output_size
+            )
+            for index in range(count)
+        ]
+    await asyncio.gather(*(server.start() for server in servers))
+    return servers
+
+async def stop_fake_fleet(servers: List):
+    await asyncio.gather(*(server.stop() for server in servers))
+
+async def _serve(count: int, base_port: int, command_delay: float, username: str, password: str, protocol: str,
+                 login_delay: float, banner: str, output_size: int):
+    servers = await start_fake_fleet(count, base_port, command_delay, username, password, protocol,
+                                     login_delay, banner, output_size)
+    print(f"Serving {count} fake {protocol} devices on 127.0.0.1 ports {servers[0].port}-{servers[-1].port} "
+          f"({username}/{password})", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_fake_fleet(servers)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run stand-in Cisco devices over SSH or Telnet")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8022, help="first port")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds of processing time per command")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="cisco")
+    parser.add_argument("--protocol", choices=["ssh", "telnet"], default="ssh")
+    parser.add_argument("--login-delay", type=float, default=0.0, help="seconds before the first prompt")
+    parser.add_argument("--banner", default="", help="banner shown before the first prompt")
+    parser.add_argument("--output-size", type=int, default=2048, help="bytes of 'show logging' output")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.count, args.port, args.delay, args.username, args.password, args.protocol,
+                           args.login_delay, args.banner.replace("\\n", "\n"), args.output_size))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,248 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+# Stand-in for an OpenAI-compatible chat completions API, for exercising the
+# async LLM providers without network access or API keys.
+#
+#   python -m backend.tests.fake_llm_server --port 8090 --latency 1.5
+#
+# serves POST /v1/chat/completions (streamed when the request sets "stream")
+# and GET /v1/models on 127.0.0.1:8090; point OPENAI_BASE_URL, GROQ_BASE_URL
+# or OPENROUTER_BASE_URL at http://127.0.0.1:8090/v1.
+
+CANNED_CONFIG = """hostname R1
+!
+service password-encryption
+!
+interface GigabitEthernet0/0
+ description uplink
+ ip address 192.0.2.1 255.255.255.0
+ no shutdown
+!
+line vty 0 4
+ transport input ssh
+!
+end"""
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 500: "Internal Server Error"}
+
+# Words with their trailing whitespace, streamed one per chunk
+TOKEN = re.compile(r"\S+\s*|\s+")
+
+class FakeLLMServer:
+    """
+    One stand-in chat completions endpoint on 127.0.0.1.
+
+    ``latency`` is waited before the answer (or its first token), streamed
+    answers wait ``token_delay`` between tokens, and ``error_rate`` of the
+    completions fail with HTTP 500. Answers are deterministic: ``reply`` when
+    given, a canned configuration for configuration prompts, an echo otherwise.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, token_delay: float = 0.0,
+                 error_rate: float = 0.0, reply: Optional[str] = None, api_key: Optional[str] = None,
+                 model: str = "fake-model"):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.reply = reply
+        self.api_key = api_key
+        self.model = model
+        self.connections = 0
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.max_active = 0
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def reply_for(self, prompt: str) -> str:
+        if self.reply is not None:
+            return self.reply
+        if prompt.startswith("Generate") and "configuration" in prompt:
+            return CANNED_CONFIG
+        return f"Received {len(prompt.split())} words: {prompt[:200]}"
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", "0")))
+        return method, path.split("?", 1)[0], headers, body
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"] + [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def _json(self, writer: asyncio.StreamWriter, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(self._head(status, {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive",
+        }) + body)
+
+    @staticmethod
+    def _error(message: str, kind: str) -> dict:
+        return {"error": {"message": message, "type": kind}}
+
+    async def _stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, completion_id: str, created: int, text: str):
+        writer.write(self._head(200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive",
+        }))
+
+        def event(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            data = "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": self.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }) + "\n\n"
+            return f"{len(data.encode('utf-8')):x}\r\n".encode("latin-1") + data.encode("utf-8") + b"\r\n"
+
+        writer.write(event({"role": "assistant"}))
+        for token in TOKEN.findall(text):
+            if self.token_delay:
+                await writer.drain()
+                await asyncio.sleep(self.token_delay)
+                if reader.at_eof():
+                    # The client hung up mid-answer
+                    raise ConnectionResetError("client closed the stream")
+            writer.write(event({"content": token}))
+        writer.write(event({}, "stop"))
+        done = b"data: [DONE]\n\n"
+        writer.write(f"{len(done):x}\r\n".encode("latin-1") + done + b"\r\n0\r\n\r\n")
+
+    async def _respond(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str, headers: Dict[str, str], body: bytes):
+        if self.api_key is not None and headers.get("authorization") != f"Bearer {self.api_key}":
+            self._json(writer, 401, self._error("Invalid API key", "invalid_request_error"))
+            return
+        if method == "GET" and path == "/v1/models":
+            self._json(writer, 200, {"object": "list", "data": [{"id": self.model, "object": "model", "owned_by": "stand-in"}]})
+            return
+        if method != "POST" or path != "/v1/chat/completions":
+            self._json(writer, 404, self._error(f"No route for {method} {path}", "invalid_request_error"))
+            return
+        try:
+            request = json.loads(body)
+            prompt = "\n".join(str(message.get("content", "")) for message in request["messages"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._json(writer, 400, self._error("Expected a JSON body with messages", "invalid_request_error"))
+            return
+
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                self._json(writer, 500, self._error("Stand-in failure", "server_error"))
+                return
+            text = self.reply_for(prompt)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            created = int(time.time())
+            if request.get("stream"):
+                await self._stream(reader, writer, completion_id, created, text)
+                return
+            prompt_tokens = len(prompt.split())
+            completion_tokens = len(text.split())
+            self._json(writer, 200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": request.get("model", self.model),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+        finally:
+            self.active -= 1
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                await self._respond(reader, writer, method, path, headers, body)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> int:
+        """
+        Start listening and return the bound port
+        """
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+async def _serve(args: argparse.Namespace):
+    server = FakeLLMServer(
+        port=args.port,
+        latency=args.latency,
+        token_delay=args.token_delay,
+        error_rate=args.error_rate,
+        reply=args.reply,
+        api_key=args.api_key
+    )
+    await server.start()
+    print(f"Serving a fake OpenAI-compatible API at {server.base_url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a stand-in OpenAI-compatible chat completions API")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each answer or its first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of completions answered with HTTP 500")
+    parser.add_argument("--reply", help="fixed answer to every prompt")
+    parser.add_argument("--api-key", help="require this bearer token")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+from backend.ai.response_cache import LLMResponseCache
+from backend.devices.cache import DeviceInventoryCache
+from backend.devices.schemas import Device
+
+def device(device_id: int, ip_address: str = None) -> Device:
+    return Device(
+        id=device_id,
+        name=f"R{device_id}",
+        ip_address=ip_address or f"10.0.0.{device_id}",
+        device_type="ios",
+        username="admin",
+        created_at=datetime(2024, 1, 1)
+    )
+
+def test_device_cache_evicts_least_recently_used():
+    cache = DeviceInventoryCache(max_size=2, ttl=60)
+    cache.put(device(1))
+    cache.put(device(2))
+    assert cache.get(1) is not None  # 2 is now the oldest
+    cache.put(device(3))
+
+    assert cache.get(2) is None
+    assert cache.get_by_ip("10.0.0.2") is None
+    assert cache.get(1).id == 1
+    assert cache.get_by_ip("10.0.0.3").id == 3
+    assert cache.stats().evictions == 1
+
+def test_device_cache_expires_entries():
+    cache = DeviceInventoryCache(max_size=10, ttl=-1)
+    cache.put(device(1))
+    assert cache.get(1) is None
+    assert cache.stats().size == 0
+
+def test_device_cache_invalidates_by_id_and_ip():
+    cache = DeviceInventoryCache(max_size=10, ttl=60)
+    cache.put(device(1))
+    cache.put(device(2))
+    cache.invalidate(device_ids=[1], ip_addresses=["10.0.0.2"])
+    assert cache.get(1) is None
+    assert cache.get(2) is None
+    assert cache.stats().invalidations == 2
+
+def test_device_cache_follows_ip_changes():
+    cache = DeviceInventoryCache(max_size=10, ttl=60)
+    cache.put(device(1, "10.0.0.1"))
+    cache.put(device(1, "10.0.0.9"))
+    assert cache.get_by_ip("10.0.0.1") is None
+    assert cache.get_by_ip("10.0.0.9").id == 1
+
+def test_response_cache_evicts_least_recently_used():
+    cache = LLMResponseCache(max_size=2, path="", ttl=60)
+    keys = [cache.key(f"prompt {index}", "openai", "gpt", 0.0) for index in range(3)]
+    cache.put(keys[0], "a", 1.0)
+    cache.put(keys[1], "b", 1.0)
+    assert cache.get(keys[0]) == "a"
+    cache.put(keys[2], "c", 1.0)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "a"
+    assert cache.stats().evictions == 1
+
+def test_response_cache_expires_entries(tmp_path):
+    cache = LLMResponseCache(max_size=10, path=str(tmp_path / "cache.sqlite3"), ttl=-1)
+    key = cache.key("prompt", "openai", "gpt", 0.0)
+    cache.put(key, "answer", 1.0)
+    assert cache.get(key) is None
+
+def test_response_cache_keys():
+    cache = LLMResponseCache(max_size=10, path="", ttl=60, max_temperature=0.7)
+    # Whitespace in the prompt does not matter, the model and settings do
+    assert cache.key("show  version\n", "openai", "gpt", 0.2) == cache.key("show version", "openai", "gpt", 0.2)
+    assert cache.key("show version", "openai", "gpt", 0.2) != cache.key("show version", "openai", "gpt-mini", 0.2)
+    # Hot requests and the provider default temperature are not cached
+    assert cache.key("show version", "openai", "gpt", 0.9) is None
+    assert cache.key("show version", "openai", "gpt") is None
+    assert cache.stats().bypassed == 2
+
+def test_response_cache_disk_tier_outlives_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMResponseCache(max_size=10, path=path, ttl=60)
+    key = cache.key("prompt", "openai", "gpt", 0.0)
+    cache.put(key, "answer", 2.0)
+
+    restarted = LLMResponseCache(max_size=10, path=path, ttl=60)
+    assert restarted.get(key) == "answer"
+    assert restarted.get(key) == "answer"
+    stats = restarted.stats()
+    assert (stats.disk_hits, stats.memory_hits) == (1, 1)
+
+def test_response_cache_trims_disk_tier(tmp_path):
+    cache = LLMResponseCache(max_size=10, path=str(tmp_path / "cache.sqlite3"), ttl=60, max_disk_bytes=10)
+    keys = [cache.key(f"prompt {index}", "openai", "gpt", 0.0) for index in range(3)]
+    for key in keys:
+        cache.put_disk(key, "12345", 1.0)
+
+    stats = cache.stats()
+    assert stats.disk_entries == 2
+    assert stats.disk_bytes == 10
+    assert stats.disk_evictions == 1
+    assert cache.get_disk(keys[0]) is None
+    assert cache.get_disk(keys[2]) == "12345"
@@ -0,0 +1,53 @@
+import pytest
+
+from backend.network_automation.config_search import line_matcher, required_literals
+from backend.utils.exceptions import ValidationException
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+$",
+    r"(\w+\s?)*$",
+    r"(?:x*)*y",
+    r"(a|a)*b",
+    r"(a|ab)+c",
+    r"(?=(a+)+)b",
+])
+def test_backtracking_patterns_are_refused(pattern):
+    with pytest.raises(ValidationException, match="too expensive"):
+        line_matcher(pattern, "regex", ignore_case=False)
+
+@pytest.mark.parametrize("pattern", [
+    r"^interface GigabitEthernet\d+/\d+$",
+    r"(ab|cd)*x",
+    r"(?:a{1,3}){1,3}",
+    r"ip address (\d{1,3}\.){3}\d{1,3}",
+    r"^\s+shutdown",
+])
+def test_linear_patterns_are_accepted(pattern):
+    matches, _, _ = line_matcher(pattern, "regex", ignore_case=False)
+    assert callable(matches)
+
+def test_regex_matching_and_case():
+    matches, literals, ignore_case = line_matcher(r"(?i)^hostname core", "regex", ignore_case=False)
+    assert matches("HOSTNAME core-01")
+    assert not matches(" hostname core")
+    assert literals == ["hostname core"]
+    assert ignore_case
+
+def test_text_mode():
+    matches, literals, _ = line_matcher("shutdown", "text", ignore_case=True)
+    assert matches(" SHUTDOWN")
+    assert literals == ["shutdown"]
+
+def test_invalid_queries():
+    with pytest.raises(ValidationException):
+        line_matcher("", "text", ignore_case=False)
+    with pytest.raises(ValidationException):
+        line_matcher("(", "regex", ignore_case=False)
+    with pytest.raises(ValidationException):
+        line_matcher("x", "glob", ignore_case=False)
+
+def test_required_literals():
+    assert required_literals(r"ip address 10\.1\.\d+") == ["ip address 10.1."]
+    assert required_literals(r"router bgp \d+") == ["router bgp "]
+    # Extraction stops at an alternation, so nothing after it is used
+    assert required_literals(r"(foo|bar)baz") == []
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from backend.network_automation.delta import (
+    apply_delta, compose_all, compose_deltas, compute_delta, decode_delta, encode_delta, invert_delta
+)
+from backend.utils.exceptions import ConfigurationException
+
+VERSIONS = [
+    ["hostname R1", "interface Gi0/1", " ip address 10.0.0.1 255.255.255.0", "end"],
+    ["hostname R1", "interface Gi0/1", " ip address 10.0.0.2 255.255.255.0", " no shutdown", "end"],
+    ["hostname R2", "interface Gi0/1", " no shutdown", "interface Gi0/2", " shutdown", "end"],
+    ["hostname R2", "end"],
+    [],
+    ["hostname R3", "interface Gi0/2", " shutdown", "end"],
+]
+
+def deltas_between(versions):
+    return [compute_delta(old, new) for old, new in zip(versions, versions[1:])]
+
+def test_apply_and_invert():
+    old, new = VERSIONS[1], VERSIONS[2]
+    delta = compute_delta(old, new)
+    assert apply_delta(old, delta) == new
+    assert apply_delta(new, invert_delta(delta)) == old
+
+def test_compose_matches_direct_delta():
+    composed = compose_all(deltas_between(VERSIONS))
+    assert apply_delta(VERSIONS[0], composed) == VERSIONS[-1]
+    assert apply_delta(VERSIONS[-1], invert_delta(composed)) == VERSIONS[0]
+
+def test_compose_with_empty_delta():
+    delta = compute_delta(VERSIONS[0], VERSIONS[1])
+    assert compose_deltas([], delta) == delta
+    assert compose_deltas(delta, []) == delta
+    # A change and its undo compose to nothing
+    assert compose_deltas(delta, invert_delta(delta)) == []
+
+def test_compose_random_edits():
+    rng = random.Random(7)
+    for _ in range(200):
+        versions = [[f"line {rng.randrange(20)}" for _ in range(rng.randrange(12))]]
+        for _ in range(rng.randrange(1, 6)):
+            lines = list(versions[-1])
+            for _ in range(rng.randrange(4)):
+                position = rng.randrange(len(lines) + 1)
+                if lines and rng.random() < 0.5:
+                    del lines[min(position, len(lines) - 1)]
+                else:
+                    lines.insert(position, f"line {rng.randrange(20)}")
+            versions.append(lines)
+        composed = compose_all(deltas_between(versions))
+        assert apply_delta(versions[0], composed) == versions[-1]
+        assert apply_delta(versions[-1], invert_delta(composed)) == versions[0]
+
+def test_encode_round_trip():
+    delta = compose_all(deltas_between(VERSIONS))
+    assert decode_delta(encode_delta(delta)) == delta
+    assert decode_delta(None) == []
+
+def test_apply_refuses_a_delta_for_other_lines():
+    delta = compute_delta(VERSIONS[1], VERSIONS[2])
+    with pytest.raises(ConfigurationException):
+        apply_delta(VERSIONS[0], delta)
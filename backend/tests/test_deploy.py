@@ -0,0 +1,31 @@
+from backend.network_automation.deploy import config_lines, plan_waves, push_batches
+
+def test_plan_waves():
+    assert plan_waves(10, 4, 1) == [1, 4, 4, 1]
+    assert plan_waves(10, 5, 0) == [5, 5]
+    assert plan_waves(3, 10, 5) == [3]
+    assert plan_waves(0, 10, 1) == []
+    assert sum(plan_waves(1001, 50, 3)) == 1001
+
+def test_config_lines_skips_comments_and_mode_changes():
+    content = "Building configuration...\n!\nconfigure terminal\nhostname R1\n\n interface Gi0/1\n  no shutdown\nend\n"
+    assert config_lines(content) == ["hostname R1", "interface Gi0/1", "no shutdown"]
+
+def test_config_lines_keeps_banners_raw():
+    content = "hostname R1\nbanner motd ^C\n  Authorized access only\n!\n^C\nline vty 0 4\n"
+    assert config_lines(content) == [
+        "hostname R1",
+        "banner motd ^C\n  Authorized access only\n!\n^C",
+        "line vty 0 4",
+    ]
+    # A banner on one line is a plain command
+    assert config_lines("banner login #Keep out#") == ["banner login #Keep out#"]
+
+def test_config_lines_keeps_macros_raw():
+    content = "macro name access\n switchport mode access\n@\nhostname R1"
+    assert config_lines(content) == ["macro name access\n switchport mode access\n@", "hostname R1"]
+
+def test_push_batches_sends_blocks_alone():
+    lines = ["a", "b", "c", "banner motd ^C\ntext\n^C", "d", "e"]
+    assert push_batches(lines, 2) == [["a", "b"], ["c"], ["banner motd ^C\ntext\n^C"], ["d", "e"]]
+    assert push_batches([], 5) == []
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from backend.database.models import DevicePollRollup, DevicePollSample
+from backend.devices.history import TIER_WIDTHS, _complete_until, _select_tier, rollup_tier
+
+NOW = datetime(2024, 5, 1, 10, 2, 40)
+
+def add_samples(db, *samples):
+    for timestamp, reachable, response_time in samples:
+        db.add(DevicePollSample(device_id=1, timestamp=timestamp, reachable=reachable, response_time=response_time))
+    db.commit()
+
+def test_rollup_tier_aggregates_closed_minutes_once(db):
+    add_samples(
+        db,
+        (datetime(2024, 5, 1, 10, 0, 10), True, 10.0),
+        (datetime(2024, 5, 1, 10, 0, 50), True, 20.0),
+        (datetime(2024, 5, 1, 10, 1, 30), False, None),
+        # Not settled yet: the minute ends after now minus the settle delay
+        (datetime(2024, 5, 1, 10, 2, 20), True, 5.0),
+    )
+
+    assert rollup_tier(db, "1m", TIER_WIDTHS["1m"], "raw", NOW) == 2
+    rows = db.query(DevicePollRollup).order_by(DevicePollRollup.bucket_start).all()
+    assert [row.bucket_start for row in rows] == [datetime(2024, 5, 1, 10, 0), datetime(2024, 5, 1, 10, 1)]
+    first, second = rows
+    assert (first.sample_count, first.up_count, first.rtt_count) == (2, 2, 2)
+    assert (first.rtt_sum, first.rtt_min, first.rtt_max) == (30.0, 10.0, 20.0)
+    assert (second.sample_count, second.up_count, second.rtt_count) == (1, 0, 0)
+
+    # Buckets already rolled up are not written again
+    assert rollup_tier(db, "1m", TIER_WIDTHS["1m"], "raw", NOW) == 0
+    # The hour is still open
+    assert rollup_tier(db, "1h", TIER_WIDTHS["1h"], "1m", NOW) == 0
+
+def test_rollup_tier_skips_gaps_without_data(db):
+    add_samples(
+        db,
+        (datetime(2024, 5, 1, 7, 15), True, 1.0),
+        (datetime(2024, 5, 1, 9, 45), True, 3.0),
+    )
+    assert rollup_tier(db, "1m", TIER_WIDTHS["1m"], "raw", NOW) == 2
+    assert rollup_tier(db, "1h", TIER_WIDTHS["1h"], "1m", NOW) == 2
+    hours = db.query(DevicePollRollup.bucket_start).filter(DevicePollRollup.tier == "1h").all()
+    assert sorted(hour for hour, in hours) == [datetime(2024, 5, 1, 7), datetime(2024, 5, 1, 9)]
+
+def test_complete_until_waits_for_pending_rollups(db):
+    assert _complete_until(db, "raw", NOW) == datetime(2024, 5, 1, 10, 2, 10)
+    assert _complete_until(db, "1m", NOW) == datetime(2024, 5, 1, 10, 2)
+
+    add_samples(db, (datetime(2024, 5, 1, 9, 30, 5), True, 1.0))
+    # The minute at 9:30 is closed but not rolled up, so 1m is only complete up to it
+    assert _complete_until(db, "1m", NOW) == datetime(2024, 5, 1, 9, 30)
+    assert _complete_until(db, "1h", NOW) == datetime(2024, 5, 1, 9)
+
+    rollup_tier(db, "1m", TIER_WIDTHS["1m"], "raw", NOW)
+    assert _complete_until(db, "1m", NOW) == datetime(2024, 5, 1, 10, 2)
+    # The 9:00 hour is closed now, but 1h has not rolled it up yet
+    assert _complete_until(db, "1h", NOW) == datetime(2024, 5, 1, 9)
+    rollup_tier(db, "1h", TIER_WIDTHS["1h"], "1m", NOW)
+    assert _complete_until(db, "1h", NOW) == datetime(2024, 5, 1, 10)
+
+def test_select_tier_prefers_the_finest_tier_within_limits():
+    assert _select_tier(NOW - timedelta(hours=1), NOW, 500, NOW) == "raw"
+    assert _select_tier(NOW - timedelta(days=2), NOW, 500, NOW) == "1h"
+    assert _select_tier(NOW - timedelta(days=2), NOW, 1000, NOW) == "raw"
+
+def test_select_tier_skips_tiers_that_no_longer_hold_the_start():
+    start = NOW - timedelta(days=3)
+    assert _select_tier(start, start + timedelta(hours=1), 500, NOW) == "1m"
+    start = NOW - timedelta(days=30)
+    assert _select_tier(start, start + timedelta(hours=1), 500, NOW) == "1h"
+    start = NOW - timedelta(days=365)
+    assert _select_tier(start, start + timedelta(hours=1), 500, NOW) == "1d"
+    # Too many points in every tier falls back to the coarsest
+    assert _select_tier(NOW - timedelta(days=700), NOW, 10, NOW) == "1d"
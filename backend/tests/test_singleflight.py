@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.ai.singleflight import SingleFlight
+
+def test_do_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fn))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Let every thread join the call before it finishes
+    while flight.calls + flight.coalesced < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert (stats.calls, stats.coalesced, stats.in_flight) == (1, 4, 0)
+
+def test_do_shares_errors_and_forgets_finished_calls():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    # Finished calls are not cached
+    assert flight.do("key", lambda: 2) == 2
+    assert flight.calls == 2
+
+def test_ado_coalesces_and_survives_one_caller_cancelling():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.ensure_future(flight.ado("key", fn))
+        second = asyncio.ensure_future(flight.ado("key", fn))
+        third = asyncio.ensure_future(flight.ado("other", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "answer"
+        assert await third == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return calls, flight.stats()
+
+    calls, stats = asyncio.run(run())
+    assert len(calls) == 2
+    assert (stats.calls, stats.coalesced, stats.in_flight) == (2, 1, 0)
+
+def test_ado_cancels_the_call_once_every_caller_is_gone():
+    async def run():
+        flight = SingleFlight()
+        finished = []
+
+        async def fn():
+            await asyncio.sleep(1)
+            finished.append(1)
+
+        callers = [asyncio.ensure_future(flight.ado("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return finished, flight.stats()
+
+    finished, stats = asyncio.run(run())
+    assert finished == []
+    assert stats.in_flight == 0
+
+def test_astream_replays_pieces_to_late_callers():
+    async def run():
+        flight = SingleFlight()
+        streams = []
+
+        async def fn():
+            streams.append(1)
+            for piece in ("a", "b", "c"):
+                await asyncio.sleep(0.02)
+                yield piece
+
+        async def read(delay):
+            await asyncio.sleep(delay)
+            return [piece async for piece in flight.astream("key", fn)]
+
+        results = await asyncio.gather(read(0), read(0.03))
+        return results, streams, flight.stats()
+
+    results, streams, stats = asyncio.run(run())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(streams) == 1
+    assert (stats.calls, stats.coalesced, stats.in_flight) == (1, 1, 0)
+
+def test_astream_shares_errors():
+    async def run():
+        flight = SingleFlight()
+
+        async def fn():
+            yield "a"
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def read():
+            return [piece async for piece in flight.astream("key", fn)]
+
+        return await asyncio.gather(read(), read(), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError, ValueError]
@@ -4,6 +4,12 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# Relative file paths in settings are relative to the project root, not the working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def project_path(path: str) -> str:
+    return os.path.join(PROJECT_ROOT, path) if path else path
+
 class Config:
     """
     Configuration class to hold all application settings
@@ -26,11 +32,77 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
+    # API base URLs, e.g. a local OpenAI-compatible server; the provider's public API when empty
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "")
+    OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "")
+    # Shared HTTP connections per provider for async generation, split across LLM_HTTP_CLIENTS clients
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "400"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "400"))
+    LLM_HTTP_CLIENTS = int(os.getenv("LLM_HTTP_CLIENTS", "8"))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))  # seconds an idle connection is kept
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+    LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))  # seconds for a whole completion
+    GENAI_STREAM_HEARTBEAT = float(os.getenv("GENAI_STREAM_HEARTBEAT", "15"))  # idle seconds between SSE keep-alive comments
+    # Cache of generated and validated configurations; no disk tier when LLM_CACHE_PATH is empty
+    LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1000"))  # answers kept in memory
+    LLM_CACHE_PATH = project_path(os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3"))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "604800"))  # seconds, one week
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))  # answer bytes kept on disk
+    LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.7"))  # hotter requests are not cached
+    # Spread requests over all configured providers by rolling latency and error rate
+    LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "False").lower() == "true"
+    LLM_ROUTING_WINDOW = int(os.getenv("LLM_ROUTING_WINDOW", "100"))  # recent requests per provider
+    LLM_ROUTING_TIMEOUT = float(os.getenv("LLM_ROUTING_TIMEOUT", "60"))  # seconds before failing over
+    LLM_ROUTING_THREADS = int(os.getenv("LLM_ROUTING_THREADS", "32"))  # blocking routed requests running at once
+    LLM_ROUTING_MAX_FAILURES = int(os.getenv("LLM_ROUTING_MAX_FAILURES", "3"))  # failures in a row before a cooldown
+    LLM_ROUTING_COOLDOWN = float(os.getenv("LLM_ROUTING_COOLDOWN", "30"))  # seconds a failing provider is tried last
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "5"))  # seconds before hedging, until a provider has a p95
     
     # Network settings
     DEFAULT_SSH_PORT = int(os.getenv("DEFAULT_SSH_PORT", "22"))
     DEFAULT_TELNET_PORT = int(os.getenv("DEFAULT_TELNET_PORT", "23"))
     CONNECTION_TIMEOUT = int(os.getenv("CONNECTION_TIMEOUT", "30"))
+    COMMAND_TIMEOUT = int(os.getenv("COMMAND_TIMEOUT", "60"))  # seconds per CLI command
+    MAX_CONNECTIONS_PER_DEVICE = int(os.getenv("MAX_CONNECTIONS_PER_DEVICE", "2"))
+    CONNECTION_IDLE_TIMEOUT = int(os.getenv("CONNECTION_IDLE_TIMEOUT", "300"))  # seconds before an idle session is closed
+    CONNECTION_LIVENESS_CHECK_AFTER = int(os.getenv("CONNECTION_LIVENESS_CHECK_AFTER", "30"))  # idle seconds before reuse is probed
+    SSH_KNOWN_HOSTS = os.getenv("SSH_KNOWN_HOSTS", "")  # known_hosts file; ~/.ssh/known_hosts when empty
+    SSH_DISABLE_HOST_KEY_CHECK = os.getenv("SSH_DISABLE_HOST_KEY_CHECK", "False").lower() == "true"  # accept any host key
+    # Devices only store a password hash, so CLI sessions log in with these unless a resolver supplies credentials
+    DEVICE_USERNAME = os.getenv("DEVICE_USERNAME", "")
+    DEVICE_PASSWORD = os.getenv("DEVICE_PASSWORD", "")
+    COMMAND_RUN_CONCURRENCY = int(os.getenv("COMMAND_RUN_CONCURRENCY", "50"))  # devices per command run
+    COMMAND_RUN_DEVICE_TIMEOUT = int(os.getenv("COMMAND_RUN_DEVICE_TIMEOUT", "120"))  # seconds per device
+    COMMAND_RUN_MAX_DEVICES = int(os.getenv("COMMAND_RUN_MAX_DEVICES", "5000"))
+    COMMAND_RUN_ALLOWED_PREFIXES = os.getenv("COMMAND_RUN_ALLOWED_PREFIXES", "show,ping,traceroute").split(",")
+    CONFIG_BACKUP_CONCURRENCY = int(os.getenv("CONFIG_BACKUP_CONCURRENCY", "100"))  # devices backed up at once
+    CONFIG_BACKUP_DEVICE_TIMEOUT = int(os.getenv("CONFIG_BACKUP_DEVICE_TIMEOUT", "300"))  # seconds per device
+    CONFIG_BACKUP_BATCH_SIZE = int(os.getenv("CONFIG_BACKUP_BATCH_SIZE", "200"))  # configurations written per transaction
+    DEPLOY_WAVE_SIZE = int(os.getenv("DEPLOY_WAVE_SIZE", "50"))  # devices per deployment wave after the canary
+    DEPLOY_CANARY_SIZE = int(os.getenv("DEPLOY_CANARY_SIZE", "1"))  # devices in the first wave
+    DEPLOY_CONCURRENCY = int(os.getenv("DEPLOY_CONCURRENCY", "25"))  # devices configured at once within a wave
+    DEPLOY_FAILURE_THRESHOLD = float(os.getenv("DEPLOY_FAILURE_THRESHOLD", "0.05"))  # failed share that stops a rollout
+    DEPLOY_DEVICE_TIMEOUT = int(os.getenv("DEPLOY_DEVICE_TIMEOUT", "300"))  # seconds per device
+    DEPLOY_PUSH_BATCH = int(os.getenv("DEPLOY_PUSH_BATCH", "1"))  # configuration lines pipelined before checking for errors
+    DEPLOY_CHECK_COMMANDS = [
+        command for command in os.getenv("DEPLOY_CHECK_COMMANDS", "show version").split(",") if command.strip()
+    ]  # read-only commands run before and after the change
+    PARSER_TEMPLATE_DIR = os.getenv("PARSER_TEMPLATE_DIR", "")  # extra TextFSM templates, e.g. an ntc-templates checkout
+    PARSER_CACHE_SIZE = int(os.getenv("PARSER_CACHE_SIZE", "10000"))  # parse results kept in memory
+    PARSER_WORKERS = int(os.getenv("PARSER_WORKERS", "0"))  # parser processes; 0 uses every CPU
+    PARSER_PARALLEL_THRESHOLD = int(os.getenv("PARSER_PARALLEL_THRESHOLD", "32"))  # larger batches go to the parser processes
+    PARSER_CHUNK_SIZE = int(os.getenv("PARSER_CHUNK_SIZE", "16"))  # outputs sent to a parser process at once
+
+    # Configuration audit settings
+    AUDIT_RULES_FILE = os.getenv("AUDIT_RULES_FILE", "")  # JSON rule library; the built-in rules when empty
+    AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", "0"))  # 0 uses one process per CPU
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))  # configurations read from the database at once
+    AUDIT_CHUNK_SIZE = int(os.getenv("AUDIT_CHUNK_SIZE", "50"))  # configurations sent to an audit process at once
+    AUDIT_PARALLEL_THRESHOLD = int(os.getenv("AUDIT_PARALLEL_THRESHOLD", "50"))  # smaller batches are audited inline
+    CONFIG_SNAPSHOT_INTERVAL = int(os.getenv("CONFIG_SNAPSHOT_INTERVAL", "20"))  # versions between full configuration snapshots
+    CONFIG_SEARCH_MAX_QUERY_LENGTH = int(os.getenv("CONFIG_SEARCH_MAX_QUERY_LENGTH", "256"))  # characters per search query
     
     # AI settings
     DEFAULT_LLM_PROVIDER = os.getenv("DEFAULT_LLM_PROVIDER", "openai")
@@ -45,6 +117,37 @@ class Config:
     # Device settings
     DEFAULT_POLLING_INTERVAL = int(os.getenv("DEFAULT_POLLING_INTERVAL", "300"))  # 5 minutes
     MAX_CONCURRENT_CONNECTIONS = int(os.getenv("MAX_CONCURRENT_CONNECTIONS", "10"))
+    DEVICE_COUNT_ESTIMATE_CAP = int(os.getenv("DEVICE_COUNT_ESTIMATE_CAP", "10000"))
+    DEVICE_IMPORT_CHUNK_SIZE = int(os.getenv("DEVICE_IMPORT_CHUNK_SIZE", "1000"))
+    DEVICE_IMPORT_MAX_ERRORS = int(os.getenv("DEVICE_IMPORT_MAX_ERRORS", "1000"))
+    DEVICE_IMPORT_MAX_RECORD_SIZE = int(os.getenv("DEVICE_IMPORT_MAX_RECORD_SIZE", "65536"))  # characters per CSV record
+    DEVICE_CACHE_MAX_SIZE = int(os.getenv("DEVICE_CACHE_MAX_SIZE", "10000"))
+    DEVICE_CACHE_TTL = float(os.getenv("DEVICE_CACHE_TTL", "60"))  # seconds
+    POLL_DEVICE_TIMEOUT = int(os.getenv("POLL_DEVICE_TIMEOUT", "2"))  # seconds per device
+    POLL_SWEEP_DEADLINE = int(os.getenv("POLL_SWEEP_DEADLINE", "60"))  # seconds per full sweep
+    POLL_SCHEDULER_ENABLED = os.getenv("POLL_SCHEDULER_ENABLED", "True").lower() == "true"
+    POLL_SCHEDULER_JITTER = float(os.getenv("POLL_SCHEDULER_JITTER", "0.1"))  # fraction of the interval
+    POLL_SCHEDULER_MAX_IN_FLIGHT = int(os.getenv("POLL_SCHEDULER_MAX_IN_FLIGHT", "500"))
+    POLL_INVENTORY_REFRESH = int(os.getenv("POLL_INVENTORY_REFRESH", "60"))  # seconds
+    POLL_WRITEBACK_BATCH_SIZE = int(os.getenv("POLL_WRITEBACK_BATCH_SIZE", "500"))
+    POLL_WRITEBACK_FLUSH_INTERVAL = float(os.getenv("POLL_WRITEBACK_FLUSH_INTERVAL", "2"))  # seconds
+    POLL_BACKOFF_MAX = int(os.getenv("POLL_BACKOFF_MAX", "3600"))  # longest interval for a device that stays offline
+    POLL_CONFIRM_INTERVAL = int(os.getenv("POLL_CONFIRM_INTERVAL", "10"))  # seconds before re-probing a changed device
+    POLL_CONFIRM_COUNT = int(os.getenv("POLL_CONFIRM_COUNT", "2"))  # agreeing probes needed to accept a change
+    POLL_FLAP_WINDOW = int(os.getenv("POLL_FLAP_WINDOW", "900"))  # seconds
+    POLL_FLAP_THRESHOLD = int(os.getenv("POLL_FLAP_THRESHOLD", "4"))  # status changes within the window
+    POLL_SHARDING_ENABLED = os.getenv("POLL_SHARDING_ENABLED", "False").lower() == "true"
+    POLL_SHARD_COUNT = int(os.getenv("POLL_SHARD_COUNT", "64"))
+    POLL_LEASE_TTL = int(os.getenv("POLL_LEASE_TTL", "30"))  # seconds
+    POLL_WORKER_ID = os.getenv("POLL_WORKER_ID", "")  # defaults to hostname:pid
+    
+    # Poll history settings (retention per tier in hours)
+    POLL_HISTORY_RAW_RETENTION = int(os.getenv("POLL_HISTORY_RAW_RETENTION", "48"))
+    POLL_HISTORY_1M_RETENTION = int(os.getenv("POLL_HISTORY_1M_RETENTION", "336"))  # 14 days
+    POLL_HISTORY_1H_RETENTION = int(os.getenv("POLL_HISTORY_1H_RETENTION", "2160"))  # 90 days
+    POLL_HISTORY_1D_RETENTION = int(os.getenv("POLL_HISTORY_1D_RETENTION", "17520"))  # 2 years
+    POLL_HISTORY_ROLLUP_INTERVAL = int(os.getenv("POLL_HISTORY_ROLLUP_INTERVAL", "60"))  # seconds
+    POLL_HISTORY_MAX_POINTS = int(os.getenv("POLL_HISTORY_MAX_POINTS", "500"))
     
     # Logging settings
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -65,19 +168,22 @@ class Config:
                 "api_key": cls.OPENAI_API_KEY,
                 "model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
                 "temperature": float(os.getenv("OPENAI_TEMPERATURE", "0.7")),
-                "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+                "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "2000")),
+                "base_url": cls.OPENAI_BASE_URL or None
             },
             "groq": {
                 "api_key": cls.GROQ_API_KEY,
                 "model": os.getenv("GROQ_MODEL", "llama3-70b-8192"),
                 "temperature": float(os.getenv("GROQ_TEMPERATURE", "0.7")),
-                "max_tokens": int(os.getenv("GROQ_MAX_TOKENS", "2000"))
+                "max_tokens": int(os.getenv("GROQ_MAX_TOKENS", "2000")),
+                "base_url": cls.GROQ_BASE_URL or None
             },
             "openrouter": {
                 "api_key": cls.OPENROUTER_API_KEY,
                 "model": os.getenv("OPENROUTER_MODEL", "openai/gpt-3.5-turbo"),
                 "temperature": float(os.getenv("OPENROUTER_TEMPERATURE", "0.7")),
-                "max_tokens": int(os.getenv("OPENROUTER_MAX_TOKENS", "2000"))
+                "max_tokens": int(os.getenv("OPENROUTER_MAX_TOKENS", "2000")),
+                "base_url": cls.OPENROUTER_BASE_URL or None
             }
         }
         
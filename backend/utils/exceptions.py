@@ -43,6 +43,12 @@ class ConfigurationException(NetworkAutomationException):
     """
     pass
 
+class ConfigurationNotFoundException(NetworkAutomationException):
+    """
+    Exception raised when a configuration version is not found
+    """
+    pass
+
 class LLMException(NetworkAutomationException):
     """
     Exception raised for LLM-related errors
@@ -5,6 +5,20 @@ from dotenv import load_dotenv
 
 # Import AI components
 from backend.ai.llm_manager import llm_manager, LLMSettings
+from backend.ai.llm_providers import http_client_pool
+
+# Import background device polling
+from backend.devices.scheduler import poll_scheduler
+
+# Import the device CLI connection pool
+from backend.network_automation.connection_pool import connection_pool
+
+# Import the show output parser
+from backend.network_operations.parsers import output_parser
+
+# Import the configuration audit engine
+from backend.network_operations.audit import audit_engine
+from backend.utils.config import config
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,7 +41,10 @@ def startup_event():
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if openai_api_key and openai_api_key != "your_openai_api_key":
         print("Found OpenAI API key. Configuring provider...")
-        openai_settings = LLMSettings(provider="openai", api_key=openai_api_key, model="gpt-4")
+        openai_settings = LLMSettings(
+            provider="openai", api_key=openai_api_key, model="gpt-4",
+            base_url=config.OPENAI_BASE_URL or None
+        )
         llm_manager.add_provider("openai", openai_settings)
     else:
         print("OpenAI API key not found or is a placeholder. Skipping.")
@@ -36,7 +53,10 @@ def startup_event():
     groq_api_key = os.getenv("GROQ_API_KEY")
     if groq_api_key and groq_api_key != "your_groq_api_key":
         print("Found Groq API key. Configuring provider...")
-        groq_settings = LLMSettings(provider="groq", api_key=groq_api_key, model="llama3-70b-8192")
+        groq_settings = LLMSettings(
+            provider="groq", api_key=groq_api_key, model="llama3-70b-8192",
+            base_url=config.GROQ_BASE_URL or None
+        )
         llm_manager.add_provider("groq", groq_settings)
     else:
         print("Groq API key not found or is a placeholder. Skipping.")
@@ -45,11 +65,63 @@ def startup_event():
     openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
     if openrouter_api_key and openrouter_api_key != "your_openrouter_api_key":
         print("Found OpenRouter API key. Configuring provider...")
-        openrouter_settings = LLMSettings(provider="openrouter", api_key=openrouter_api_key, model="openai/gpt-4")
+        openrouter_settings = LLMSettings(
+            provider="openrouter", api_key=openrouter_api_key, model="openai/gpt-4",
+            base_url=config.OPENROUTER_BASE_URL or None
+        )
         llm_manager.add_provider("openrouter", openrouter_settings)
     else:
         print("OpenRouter API key not found or is a placeholder. Skipping.")
 
+    if config.LLM_ROUTING_ENABLED:
+        print("Routing LLM requests across all configured providers...")
+        llm_manager.enable_routing()
+
+@app.on_event("startup")
+async def start_poll_scheduler():
+    """
+    Starts the background device polling scheduler.
+    """
+    if config.POLL_SCHEDULER_ENABLED:
+        print("Starting device poll scheduler...")
+        poll_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_poll_scheduler():
+    """
+    Stops the background device polling scheduler.
+    """
+    if poll_scheduler.running:
+        await poll_scheduler.stop()
+
+@app.on_event("shutdown")
+async def close_device_connections():
+    """
+    Closes pooled SSH/Telnet sessions to devices.
+    """
+    await connection_pool.close_all()
+
+@app.on_event("shutdown")
+def stop_output_parser():
+    """
+    Stops the show output parser processes.
+    """
+    output_parser.shutdown()
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """
+    Closes the pooled HTTP connections to LLM providers.
+    """
+    await http_client_pool.aclose()
+
+@app.on_event("shutdown")
+def stop_audit_engine():
+    """
+    Stops the configuration audit processes.
+    """
+    audit_engine.shutdown()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,